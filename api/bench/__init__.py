@@ -0,0 +1,7 @@
+"""
+Benchmarks reproducibles de la API y del ETL (no forman parte del paquete `app`).
+
+Ejecutar desde `api/`:
+
+    python -m bench.api_load --sizes 10000 100000
+"""
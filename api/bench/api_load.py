@@ -0,0 +1,316 @@
+"""
+Benchmark de carga de los endpoints RUEA sobre datos sintéticos.
+
+Por cada tamaño (`--sizes`, p. ej. 10k/100k/1M filas):
+
+1. genera un libro con `bench.synth` (cacheado en `--workdir/xlsx/`);
+2. lo publica con el ETL real (`run_refresh_from_workbook`) en un DATA_DIR
+   propio;
+3. recorre los endpoints en proceso (httpx + ASGITransport, sin red) con
+   `--concurrency` requests simultáneas: una fase por endpoint y una mezcla.
+
+Cada tamaño corre en un subproceso (settings y RSS limpios). Se reporta por
+endpoint p50/p95/p99, req/s, errores y bytes, más el RSS del proceso. Con
+`--baseline` se compara contra un resultado anterior y el proceso sale con
+código 1 si p95/p99 o RSS empeoran (o req/s cae) más de `--tolerance`.
+
+    python -m bench.api_load --sizes 10000 100000 --out bench/.work/ultimo.json
+    python -m bench.api_load --sizes 10000 100000 --save-baseline bench/.work/baseline.json
+    python -m bench.api_load --sizes 10000 100000 --baseline bench/.work/baseline.json
+
+La línea base depende de la máquina: generarla y compararla en el mismo host.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+API_DIR = Path(__file__).resolve().parents[1]
+DEFAULT_WORKDIR = API_DIR / "bench" / ".work"
+RESULT_MARK = "BENCH_RESULT "
+PREFIX = "/api/v1"
+
+# valores con el ruido real de la base (tildes, prefijos, mayúsculas)
+CORREGIMIENTOS = [None, "San Cristóbal", "san cristobal", "80-CORREGIMIENTO DE SANTA ELENA", "Altavista",
+                  "san antonio de prado", "SAN SEBASTIÁN DE PALMITAS"]
+VEREDAS = [None, None, "La Loma", "VEREDA EL PATIO", "potrerito", "Mazo"]
+LINEAS = [None, "Agrícola", "Pecuaria", "agroindustrial"]
+SEXOS = [None, "F", "M"]
+DIMS = ["corregimiento", "vereda", "linea_productiva", "escolaridad", "sexo"]
+
+
+# --- métricas de proceso -----------------------------------------------------
+
+def rss_mb() -> float | None:
+    """RSS actual (Linux: /proc/self/status)."""
+    try:
+        with open("/proc/self/status", encoding="ascii") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return round(int(line.split()[1]) / 1024, 1)
+    except OSError:
+        pass
+    return None
+
+
+def peak_rss_mb() -> float | None:
+    """Pico de RSS del proceso (ru_maxrss: KiB en Linux, bytes en macOS)."""
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def percentile(sorted_values: list[float], p: float) -> float | None:
+    if not sorted_values:
+        return None
+    return sorted_values[min(len(sorted_values) - 1, int(p * len(sorted_values)))]
+
+
+# --- escenarios --------------------------------------------------------------
+
+def _filtros(r: random.Random, *, territorio: bool = True) -> dict:
+    f = {"linea_productiva": r.choice(LINEAS), "sexo": r.choice(SEXOS)}
+    if territorio:
+        f.update(corregimiento=r.choice(CORREGIMIENTOS), vereda=r.choice(VEREDAS))
+    return {k: v for k, v in f.items() if v}
+
+
+def _url(path: str, params: dict) -> tuple[str, dict]:
+    return f"{PREFIX}{path}", params
+
+
+SCENARIOS = {
+    # nombre: (peso en la mezcla, generador de (path, params))
+    "ruea": (5, lambda r: _url("/ruea", {**_filtros(r), "limit": 50,
+                                         "offset": r.choice([0, 0, 50, 500]),
+                                         "order_by": r.choice(["documento", "corregimiento", "fecha_registro"])})),
+    "ruea_facetas": (3, lambda r: _url("/ruea/facetas", _filtros(r))),
+    "ruea_stats": (3, lambda r: _url("/ruea/stats", {**_filtros(r), "by": r.choice(DIMS),
+                                                     "top": r.choice([0, 10])})),
+    "ruea_summary": (2, lambda r: _url("/ruea/summary", _filtros(r))),
+    "ruea_download_csv": (0, lambda r: _url("/ruea/download.csv", _filtros(r, territorio=False)
+                                            or {"sexo": "F"})),
+}
+# las descargas son caras: menos requests por fase
+HEAVY = {"ruea_download_csv": 10}
+
+
+async def _phase(client, pick, n: int, concurrency: int, seed: int) -> dict:
+    r = random.Random(seed)
+    urls = [pick(r) for _ in range(n)]
+    sem = asyncio.Semaphore(concurrency)
+    lat: list[float] = []
+    errors, nbytes = 0, 0
+
+    async def one(path, params):
+        nonlocal errors, nbytes
+        async with sem:
+            t0 = time.perf_counter()
+            resp = await client.get(path, params=params)
+            lat.append(time.perf_counter() - t0)
+            nbytes += len(resp.content)
+            if resp.status_code >= 400:
+                errors += 1
+
+    t0 = time.perf_counter()
+    await asyncio.gather(*(one(p, q) for p, q in urls))
+    wall = time.perf_counter() - t0
+    lat.sort()
+    ms = lambda v: None if v is None else round(v * 1000, 2)  # noqa: E731
+    return {
+        "requests": n, "errors": errors, "bytes": nbytes,
+        "p50_ms": ms(percentile(lat, 0.50)), "p95_ms": ms(percentile(lat, 0.95)),
+        "p99_ms": ms(percentile(lat, 0.99)), "max_ms": ms(lat[-1] if lat else None),
+        "rps": round(n / wall, 1) if wall else None,
+    }
+
+
+async def _drive(app, requests: int, concurrency: int, warmup: int) -> dict:
+    import httpx
+
+    transport = httpx.ASGITransport(app=app)
+    out = {}
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        for i, (name, (_, gen)) in enumerate(SCENARIOS.items()):
+            n = max(1, requests // HEAVY.get(name, 1))
+            if warmup:
+                await _phase(client, gen, min(warmup, n), concurrency, seed=10_000 + i)
+            out[name] = await _phase(client, gen, n, concurrency, seed=i)
+            out[name]["rss_mb"] = rss_mb()
+        mix = [(name, w) for name, (w, _) in SCENARIOS.items() if w]
+        names, weights = zip(*mix)
+
+        def pick(r):
+            return SCENARIOS[r.choices(names, weights)[0]][1](r)
+
+        out["mixed"] = await _phase(client, pick, requests * 2, concurrency, seed=99)
+        out["mixed"]["rss_mb"] = rss_mb()
+    return out
+
+
+# --- un tamaño (subproceso) --------------------------------------------------
+
+def _workbook(workdir: Path, rows: int, seed: int, dirtiness: float) -> Path:
+    from .synth import workbook
+
+    path = workdir / "xlsx" / f"ruea-{rows}-s{seed}-d{dirtiness}.xlsx"
+    if not path.exists():
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(".tmp")
+        tmp.write_bytes(workbook(rows, seed=seed, dirtiness=dirtiness))
+        os.replace(tmp, path)
+    return path
+
+
+def run_dataset(args) -> dict:
+    rows = args.dataset
+    xlsx = _workbook(args.workdir, rows, args.seed, args.dirtiness)
+
+    # settings se leen al importar `app`: DATA_DIR propio y limpio antes del import
+    data = args.workdir / f"data-{rows}"
+    shutil.rmtree(data, ignore_errors=True)
+    os.environ["DATA_DIR"] = str(data)
+    os.environ["DB_PATH"] = str(data / "current" / "duckdb.db")
+    if args.no_cache:
+        os.environ["RESULT_CACHE_ENTRIES"] = "1"
+    sys.path.insert(0, str(API_DIR / "src"))
+    rss_boot = rss_mb()
+
+    from app.main import app
+    from app.services.etl import run_refresh_from_workbook
+
+    rss_import = rss_mb()
+    t0 = time.perf_counter()
+    pub = run_refresh_from_workbook(xlsx.read_bytes(), {"ruea": "GENERAL"})
+    publish_s = time.perf_counter() - t0
+    rss_publish = rss_mb()
+
+    endpoints = asyncio.run(_drive(app, args.requests, args.concurrency, args.warmup))
+    return {
+        "rows": rows, "xlsx_bytes": xlsx.stat().st_size, "version": pub.get("version"),
+        "publish_seconds": round(publish_s, 3),
+        "rss_mb": {"boot": rss_boot, "after_import": rss_import, "after_publish": rss_publish,
+                   "after_load": rss_mb(), "peak": peak_rss_mb()},
+        "endpoints": endpoints,
+    }
+
+
+# --- comparación con la línea base ------------------------------------------
+
+# (métrica, True si "más alto es peor")
+CHECKS = (("p95_ms", True), ("p99_ms", True), ("rps", False))
+
+
+def compare(current: dict, baseline: dict, tolerance: float, min_ms: float = 1.0) -> list[str]:
+    """Regresiones de `current` frente a `baseline` (lista vacía = OK)."""
+    out = []
+    for size, base_ds in baseline.get("datasets", {}).items():
+        cur_ds = current.get("datasets", {}).get(size)
+        if cur_ds is None:
+            continue
+        for ep, base_ep in base_ds.get("endpoints", {}).items():
+            cur_ep = cur_ds["endpoints"].get(ep)
+            if cur_ep is None:
+                continue
+            if cur_ep.get("errors", 0) > base_ep.get("errors", 0):
+                out.append(f"{size}/{ep}: errors {base_ep.get('errors', 0)} -> {cur_ep['errors']}")
+            for metric, higher_is_worse in CHECKS:
+                b, c = base_ep.get(metric), cur_ep.get(metric)
+                if b is None or c is None:
+                    continue
+                if higher_is_worse:
+                    # latencias sub-milisegundo son puro ruido
+                    if c > max(b, min_ms) * (1 + tolerance):
+                        out.append(f"{size}/{ep}: {metric} {b} -> {c} (+{(c / b - 1) * 100:.0f}%)")
+                elif c < b * (1 - tolerance):
+                    out.append(f"{size}/{ep}: {metric} {b} -> {c} ({(c / b - 1) * 100:.0f}%)")
+        b, c = base_ds.get("rss_mb", {}).get("peak"), cur_ds.get("rss_mb", {}).get("peak")
+        if b and c and c > b * (1 + tolerance):
+            out.append(f"{size}: peak RSS {b} MB -> {c} MB")
+    return out
+
+
+# --- orquestación ------------------------------------------------------------
+
+def _spawn(args, rows: int) -> dict:
+    cmd = [sys.executable, "-m", "bench.api_load", "--dataset", str(rows),
+           "--workdir", str(args.workdir), "--seed", str(args.seed), "--dirtiness", str(args.dirtiness),
+           "--requests", str(args.requests), "--concurrency", str(args.concurrency),
+           "--warmup", str(args.warmup)] + (["--no-cache"] if args.no_cache else [])
+    proc = subprocess.run(cmd, cwd=API_DIR, capture_output=True, text=True)
+    for line in reversed(proc.stdout.splitlines()):
+        if line.startswith(RESULT_MARK):
+            return json.loads(line[len(RESULT_MARK):])
+    sys.stderr.write(proc.stderr)
+    raise RuntimeError(f"benchmark de {rows} filas falló (código {proc.returncode})")
+
+
+def _print_table(res: dict):
+    print(f"{'dataset':>9} {'endpoint':<18} {'p50':>8} {'p95':>8} {'p99':>8} {'req/s':>8} {'err':>4} {'rss':>7}")
+    for size, ds in res["datasets"].items():
+        for ep, m in ds["endpoints"].items():
+            print(f"{size:>9} {ep:<18} {m['p50_ms']:>8} {m['p95_ms']:>8} {m['p99_ms']:>8} "
+                  f"{m['rps']:>8} {m['errors']:>4} {m.get('rss_mb') or '-':>7}")
+        print(f"{size:>9} publish {ds['publish_seconds']} s, RSS pico {ds['rss_mb']['peak']} MB")
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    ap.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000])
+    ap.add_argument("--requests", type=int, default=200, help="requests por fase (las descargas usan 1/10)")
+    ap.add_argument("--concurrency", type=int, default=8)
+    ap.add_argument("--warmup", type=int, default=5, help="requests por fase que no se miden")
+    ap.add_argument("--seed", type=int, default=1)
+    ap.add_argument("--dirtiness", type=float, default=1.0)
+    ap.add_argument("--no-cache", action="store_true", help="desactiva la caché de resultados")
+    ap.add_argument("--workdir", type=Path, default=DEFAULT_WORKDIR)
+    ap.add_argument("--out", type=Path, help="escribe el resultado (JSON)")
+    ap.add_argument("--baseline", type=Path, help="compara contra este resultado y falla si hay regresión")
+    ap.add_argument("--save-baseline", type=Path, help="guarda el resultado como nueva línea base")
+    ap.add_argument("--tolerance", type=float, default=0.25, help="regresión tolerada (0.25 = 25%%)")
+    ap.add_argument("--dataset", type=int, help=argparse.SUPPRESS)  # modo subproceso
+    args = ap.parse_args(argv)
+    args.workdir = args.workdir.resolve()
+
+    if args.dataset:
+        print(RESULT_MARK + json.dumps(run_dataset(args)))
+        return 0
+
+    res = {
+        "meta": {"created_at": time.strftime("%Y-%m-%dT%H:%M:%S"), "python": platform.python_version(),
+                 "machine": platform.machine(), "cpus": os.cpu_count(),
+                 "params": {k: v for k, v in vars(args).items()
+                            if k in ("requests", "concurrency", "warmup", "seed", "dirtiness", "no_cache")}},
+        "datasets": {},
+    }
+    for rows in args.sizes:
+        res["datasets"][str(rows)] = _spawn(args, rows)
+    _print_table(res)
+
+    for path in (args.out, args.save_baseline):
+        if path:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_text(json.dumps(res, indent=2, ensure_ascii=False), encoding="utf-8")
+
+    if args.baseline:
+        regressions = compare(res, json.loads(args.baseline.read_text(encoding="utf-8")), args.tolerance)
+        for line in regressions:
+            print("REGRESIÓN", line)
+        if regressions:
+            return 1
+        print("sin regresiones frente a", args.baseline)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,149 @@
+"""
+Arranque de un worker: tiempo de import, lifespan, RSS y primera request.
+
+Cada corrida es un subproceso nuevo (como un worker de uvicorn) sobre un
+DATA_DIR ya publicado: el de `bench.api_load` para `--rows` o `--data-dir`.
+Si no existe, se publica una vez con el ETL real. Se mide:
+
+- `import_s` / `rss_import_mb`: `import app.main` (qué módulos pesados quedan
+  cargados en `heavy_modules`);
+- `lifespan_s` / `rss_ready_mb`: el lifespan de la app (carpetas + warm-up
+  del snapshot, salvo `--no-warmup`);
+- `first_ms`: latencia de la primera request a cada endpoint de `PATHS`.
+
+    python -m bench.boot --rows 10000 --repeat 5
+    python -m bench.boot --rows 10000 --repeat 5 --no-warmup
+
+Se reporta la mediana de `--repeat` corridas.
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+from .api_load import DEFAULT_WORKDIR, RESULT_MARK, _workbook, rss_mb
+
+API_DIR = Path(__file__).resolve().parents[1]
+HEAVY = ("pandas", "polars", "pandera", "pyarrow", "numpy", "openpyxl", "duckdb")
+PATHS = ("/api/v1/ruea?limit=50", "/api/v1/ruea/facetas", "/api/v1/ruea/stats")
+
+
+def _env(data: Path):
+    os.environ["DATA_DIR"] = str(data)
+    os.environ["DB_PATH"] = str(data / "current" / "duckdb.db")
+    sys.path.insert(0, str(API_DIR / "src"))
+
+
+def publish(args, data: Path):
+    """Publica el libro sintético de `--rows` filas en `data` (una sola vez)."""
+    _env(data)
+    from app.services.etl import run_refresh_from_workbook
+
+    xlsx = _workbook(args.workdir, args.rows, args.seed, 1.0)
+    run_refresh_from_workbook(xlsx.read_bytes(), {"ruea": "GENERAL"})
+
+
+async def _first_requests(app) -> dict:
+    import httpx
+
+    out = {}
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        for path in PATHS:
+            t0 = time.perf_counter()
+            r = await client.get(path)
+            out[path] = {"ms": round((time.perf_counter() - t0) * 1000, 2), "status": r.status_code}
+    return out
+
+
+async def _boot(app) -> tuple[float, dict]:
+    t0 = time.perf_counter()
+    async with app.router.lifespan_context(app):
+        lifespan_s = time.perf_counter() - t0
+        first = await _first_requests(app)
+    return lifespan_s, first
+
+
+def run_once(args, data: Path) -> dict:
+    _env(data)
+    if args.no_warmup:
+        os.environ["STARTUP_WARMUP"] = "false"
+    rss0 = rss_mb()
+    t0 = time.perf_counter()
+    from app.main import app
+
+    import_s = time.perf_counter() - t0
+    rss_import = rss_mb()
+    heavy = [m for m in HEAVY if m in sys.modules]
+    lifespan_s, first = asyncio.run(_boot(app))
+    return {
+        "import_s": round(import_s, 3), "lifespan_s": round(lifespan_s, 3),
+        "rss_start_mb": rss0, "rss_import_mb": rss_import, "rss_ready_mb": rss_mb(),
+        "heavy_modules": heavy, "first_ms": {p: v["ms"] for p, v in first.items()},
+    }
+
+
+def _spawn(args, data: Path, mode: str) -> dict:
+    cmd = [sys.executable, "-m", "bench.boot", f"--{mode}", "--rows", str(args.rows),
+           "--workdir", str(args.workdir), "--data-dir", str(data), "--seed", str(args.seed)]
+    if args.no_warmup:
+        cmd.append("--no-warmup")
+    proc = subprocess.run(cmd, cwd=API_DIR, capture_output=True, text=True)
+    for line in reversed(proc.stdout.splitlines()):
+        if line.startswith(RESULT_MARK):
+            return json.loads(line[len(RESULT_MARK):])
+    sys.stderr.write(proc.stderr)
+    raise RuntimeError(f"subproceso {mode} falló (código {proc.returncode})")
+
+
+def _median(runs: list[dict]) -> dict:
+    med = lambda k: round(statistics.median(r[k] for r in runs), 3)  # noqa: E731
+    return {
+        "repeat": len(runs),
+        **{k: med(k) for k in ("import_s", "lifespan_s", "rss_import_mb", "rss_ready_mb")},
+        "heavy_modules": runs[0]["heavy_modules"],
+        "first_ms": {p: round(statistics.median(r["first_ms"][p] for r in runs), 2) for p in PATHS},
+    }
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    ap.add_argument("--rows", type=int, default=10_000)
+    ap.add_argument("--repeat", type=int, default=3)
+    ap.add_argument("--seed", type=int, default=1)
+    ap.add_argument("--no-warmup", action="store_true", help="STARTUP_WARMUP=false")
+    ap.add_argument("--workdir", type=Path, default=DEFAULT_WORKDIR)
+    ap.add_argument("--data-dir", type=Path, help="DATA_DIR publicado (por defecto el de bench.api_load)")
+    ap.add_argument("--out", type=Path)
+    ap.add_argument("--run", action="store_true", help=argparse.SUPPRESS)  # modo subproceso
+    ap.add_argument("--publish", action="store_true", help=argparse.SUPPRESS)
+    args = ap.parse_args(argv)
+    args.workdir = args.workdir.resolve()
+    data = (args.data_dir or args.workdir / f"data-{args.rows}").resolve()
+
+    if args.publish:
+        publish(args, data)
+        print(RESULT_MARK + "{}")
+        return 0
+    if args.run:
+        print(RESULT_MARK + json.dumps(run_once(args, data)))
+        return 0
+
+    if not (data / "current").exists():
+        _spawn(args, data, "publish")
+    res = _median([_spawn(args, data, "run") for _ in range(max(1, args.repeat))])
+    res["warmup"] = not args.no_warmup
+    print(json.dumps(res, indent=2, ensure_ascii=False))
+    if args.out:
+        args.out.parent.mkdir(parents=True, exist_ok=True)
+        args.out.write_text(json.dumps(res, indent=2, ensure_ascii=False), encoding="utf-8")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
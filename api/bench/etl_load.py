@@ -0,0 +1,185 @@
+"""
+Benchmark del ETL: tiempo y memoria por etapa de un refresh completo.
+
+Por cada tamaño (`--rows`) genera un libro multi-hoja con `bench.synth`
+(suciedad `--dirtiness`, filas de título `--title-rows`, hojas extra de
+indicadores/comercialización) y corre `run_refresh_from_workbook` (o
+`run_refresh_from_files` con `--mode files`) en un subproceso con DATA_DIR
+propio. El ETL devuelve su `profile` (ver `app.services.stages`): segundos y
+pico de RSS de read, normalize, validate, parquet, duckdb_build,
+duplicates, quality_report, dedupe, prerender, warmup, swap y retention.
+
+    python -m bench.etl_load --rows 10000 100000 --repeat 3 --out bench/.work/etl.json
+    python -m bench.etl_load --rows 10000 100000 --baseline bench/.work/etl.json
+
+Con `--repeat` se toma la mediana por etapa. Con `--baseline` sale con código
+1 si el total o alguna etapa de más de `--min-seconds` empeora más de
+`--tolerance`, o si el pico de RSS crece más de lo mismo.
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+API_DIR = Path(__file__).resolve().parents[1]
+DEFAULT_WORKDIR = API_DIR / "bench" / ".work"
+RESULT_MARK = "BENCH_RESULT "
+
+
+def _workbook(args, rows: int) -> Path:
+    from .synth import workbook
+
+    name = f"etl-{rows}-s{args.seed}-d{args.dirtiness}-t{args.title_rows}-x{int(not args.single_sheet)}.xlsx"
+    path = args.workdir / "xlsx" / name
+    if not path.exists():
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(".tmp")
+        tmp.write_bytes(workbook(rows, seed=args.seed, dirtiness=args.dirtiness, title_rows=args.title_rows,
+                                 extra_sheets=not args.single_sheet))
+        os.replace(tmp, path)
+    return path
+
+
+def run_once(args) -> dict:
+    rows = args.run
+    xlsx = _workbook(args, rows)
+    data = args.workdir / f"etl-data-{rows}"
+    shutil.rmtree(data, ignore_errors=True)
+    os.environ["DATA_DIR"] = str(data)
+    os.environ["DB_PATH"] = str(data / "current" / "duckdb.db")
+    sys.path.insert(0, str(API_DIR / "src"))
+
+    from app.services import etl
+    from app.services.stages import rss_bytes
+
+    payload = xlsx.read_bytes()
+    rss0 = rss_bytes()
+    t0 = time.perf_counter()
+    if args.mode == "files":
+        res = etl.run_refresh_from_files({"ruea": payload})
+    else:
+        res = etl.run_refresh_from_workbook(payload, {"ruea": "GENERAL"}, {"ruea": args.title_rows + 1})
+    wall = time.perf_counter() - t0
+    prof = res["profile"]
+    return {
+        "rows": rows, "xlsx_bytes": len(payload), "seconds": round(wall, 4),
+        "rows_per_second": round(rows / wall, 1) if wall else None,
+        "rss_before_mb": None if rss0 is None else round(rss0 / (1024 * 1024), 1),
+        "peak_rss_mb": prof["peak_rss_mb"], "stages": prof["stages"],
+    }
+
+
+def _spawn(args, rows: int) -> dict:
+    cmd = [sys.executable, "-m", "bench.etl_load", "--run", str(rows), "--mode", args.mode,
+           "--workdir", str(args.workdir), "--seed", str(args.seed), "--dirtiness", str(args.dirtiness),
+           "--title-rows", str(args.title_rows)] + (["--single-sheet"] if args.single_sheet else [])
+    proc = subprocess.run(cmd, cwd=API_DIR, capture_output=True, text=True)
+    for line in reversed(proc.stdout.splitlines()):
+        if line.startswith(RESULT_MARK):
+            return json.loads(line[len(RESULT_MARK):])
+    sys.stderr.write(proc.stderr)
+    raise RuntimeError(f"refresh de {rows} filas falló (código {proc.returncode})")
+
+
+def _median(runs: list[dict]) -> dict:
+    """Resultado agregado: mediana de segundos, máximo de RSS por etapa."""
+    out = {k: runs[0][k] for k in ("rows", "xlsx_bytes")}
+    out["repeat"] = len(runs)
+    out["seconds"] = round(statistics.median(r["seconds"] for r in runs), 4)
+    out["rows_per_second"] = round(out["rows"] / out["seconds"], 1) if out["seconds"] else None
+    peaks = [r["peak_rss_mb"] for r in runs if r["peak_rss_mb"] is not None]
+    out["peak_rss_mb"] = max(peaks) if peaks else None
+    out["stages"] = {}
+    for name in runs[0]["stages"]:
+        vals = [r["stages"][name] for r in runs if name in r["stages"]]
+        rss = [v["rss_peak_mb"] for v in vals if v["rss_peak_mb"] is not None]
+        out["stages"][name] = {"seconds": round(statistics.median(v["seconds"] for v in vals), 4),
+                               "rss_peak_mb": max(rss) if rss else None}
+    return out
+
+
+def compare(current: dict, baseline: dict, tolerance: float, min_seconds: float) -> list[str]:
+    out = []
+    for size, base in baseline.get("results", {}).items():
+        cur = current["results"].get(size)
+        if cur is None:
+            continue
+        if cur["seconds"] > base["seconds"] * (1 + tolerance):
+            out.append(f"{size}: total {base['seconds']} s -> {cur['seconds']} s")
+        if base.get("peak_rss_mb") and cur.get("peak_rss_mb") and \
+                cur["peak_rss_mb"] > base["peak_rss_mb"] * (1 + tolerance):
+            out.append(f"{size}: peak RSS {base['peak_rss_mb']} MB -> {cur['peak_rss_mb']} MB")
+        for name, b in base["stages"].items():
+            c = cur["stages"].get(name)
+            if c and c["seconds"] > max(b["seconds"], min_seconds) * (1 + tolerance):
+                out.append(f"{size}/{name}: {b['seconds']} s -> {c['seconds']} s")
+    return out
+
+
+def _print_table(res: dict):
+    for size, r in res["results"].items():
+        print(f"{size} filas ({r['xlsx_bytes'] / 1e6:.1f} MB xlsx): {r['seconds']} s, "
+              f"{r['rows_per_second']} filas/s, RSS pico {r['peak_rss_mb']} MB")
+        for name, st in r["stages"].items():
+            print(f"  {name:<16} {st['seconds']:>9.3f} s  {st['rss_peak_mb'] or '-':>8} MB")
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    ap.add_argument("--rows", type=int, nargs="+", default=[10_000, 100_000])
+    ap.add_argument("--mode", choices=("workbook", "files"), default="workbook")
+    ap.add_argument("--repeat", type=int, default=1)
+    ap.add_argument("--seed", type=int, default=1)
+    ap.add_argument("--dirtiness", type=float, default=1.0)
+    ap.add_argument("--title-rows", type=int, default=0, help="filas de título antes del encabezado")
+    ap.add_argument("--single-sheet", action="store_true", help="solo la hoja GENERAL")
+    ap.add_argument("--workdir", type=Path, default=DEFAULT_WORKDIR)
+    ap.add_argument("--out", type=Path)
+    ap.add_argument("--baseline", type=Path)
+    ap.add_argument("--tolerance", type=float, default=0.25)
+    ap.add_argument("--min-seconds", type=float, default=0.5, help="etapas más cortas no se comparan")
+    ap.add_argument("--run", type=int, help=argparse.SUPPRESS)  # modo subproceso
+    args = ap.parse_args(argv)
+    args.workdir = args.workdir.resolve()
+    if args.mode == "files":
+        # /admin/refresh lee la primera hoja con encabezado en la fila 1
+        args.title_rows, args.single_sheet = 0, True
+
+    if args.run:
+        print(RESULT_MARK + json.dumps(run_once(args)))
+        return 0
+
+    res = {
+        "meta": {"created_at": time.strftime("%Y-%m-%dT%H:%M:%S"), "python": platform.python_version(),
+                 "machine": platform.machine(), "cpus": os.cpu_count(),
+                 "params": {k: getattr(args, k) for k in
+                            ("mode", "repeat", "seed", "dirtiness", "title_rows", "single_sheet")}},
+        "results": {},
+    }
+    for rows in args.rows:
+        runs = [_spawn(args, rows) for _ in range(max(1, args.repeat))]
+        res["results"][str(rows)] = _median(runs)
+    _print_table(res)
+
+    if args.out:
+        args.out.parent.mkdir(parents=True, exist_ok=True)
+        args.out.write_text(json.dumps(res, indent=2, ensure_ascii=False), encoding="utf-8")
+    if args.baseline:
+        regressions = compare(res, json.loads(args.baseline.read_text(encoding="utf-8")),
+                              args.tolerance, args.min_seconds)
+        for line in regressions:
+            print("REGRESIÓN", line)
+        if regressions:
+            return 1
+        print("sin regresiones frente a", args.baseline)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
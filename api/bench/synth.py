@@ -0,0 +1,110 @@
+"""
+Libros RUEA sintéticos con el ruido de las bases reales.
+
+`dirtiness` (0..1) escala la probabilidad de cada tipo de ruido:
+
+- corregimiento: prefijo numérico ("80-CORREGIMIENTO DE ..."), mayúsculas,
+  minúsculas sin tildes, vacíos;
+- vereda: prefijo "VEREDA", espacios al borde, mayúsculas/minúsculas, vacíos;
+- valores fuera de esquema (edad > 120, estrato 9, sexo desconocido) y
+  documentos vacíos, que terminan en el reporte de calidad.
+
+Con `title_rows` la hoja GENERAL trae filas de título antes del encabezado
+(como la MACRO MADRE) y `extra_sheets` agrega hojas de otros módulos. La
+escritura usa openpyxl en modo `write_only` (memoria constante).
+"""
+import datetime as dt
+import io
+import random
+
+from openpyxl import Workbook
+
+CORREGIMIENTOS = ["San Cristóbal", "San Antonio de Prado", "Santa Elena", "Altavista", "San Sebastián de Palmitas"]
+VEREDAS = ["La Loma", "El Patio", "Potrerito", "Las Playas", "La Suiza", "El Llano", "Travesías",
+           "Mazo", "Piedras Blancas", "El Plan", "Yolombo", "La Palma", "Boquerón", "El Uvito"]
+LINEAS = ["Agrícola", "Pecuaria", "Piscícola", "Agroindustrial", "Apícola", "Forestal"]
+ESCOLARIDAD = ["Primaria", "Secundaria", "Técnica", "Tecnológica", "Universitaria", "Ninguna"]
+HEADERS = ["Documento", "Nombres", "Apellidos", "Sexo", "Edad", "Estrato", "Escolaridad", "Corregimiento",
+           "Vereda", "Linea Productiva", "Fecha de registro", "Telefono", "Email"]
+
+
+def _unaccent(s: str) -> str:
+    return s.translate(str.maketrans("áéíóúÁÉÍÓÚ", "aeiouAEIOU"))
+
+
+def _corregimiento(r: random.Random, c: str, d: float) -> str | None:
+    k = r.random()
+    if k < 0.20 * d:
+        return f"{r.randint(50, 90)}-CORREGIMIENTO DE {c.upper()}"
+    if k < 0.35 * d:
+        return _unaccent(c).lower()
+    if k < 0.45 * d:
+        return c.upper()
+    if k < 0.48 * d:
+        return None
+    return c
+
+
+def _vereda(r: random.Random, v: str, d: float) -> str | None:
+    k = r.random()
+    if k < 0.20 * d:
+        return f"VEREDA {v.upper()}"
+    if k < 0.30 * d:
+        return f"  {_unaccent(v).lower()} "
+    if k < 0.35 * d:
+        return f"Vereda de {v}"
+    if k < 0.38 * d:
+        return ""
+    return v
+
+
+def ruea_rows(n: int, seed: int = 1, dirtiness: float = 1.0, start: int = 0):
+    """Genera `n` filas RUEA (listas en el orden de `HEADERS`)."""
+    r = random.Random(seed)
+    d = max(0.0, min(1.0, dirtiness))
+    base = dt.date(2023, 1, 1)
+    for i in range(start, start + n):
+        bad = r.random() < 0.02 * d
+        yield [
+            None if r.random() < 0.01 * d else str(10_000_000 + i),
+            f"Nombre{i % 9973}", f"Apellido{i % 7919}",
+            r.choice(["F", "M", "F", "M", "X"] + (["N/A"] if bad else [])),
+            (150 if bad else r.choice([r.randint(18, 90), None])),
+            (9 if bad else r.choice([1, 2, 3, 4, None])),
+            r.choice(ESCOLARIDAD),
+            _corregimiento(r, r.choice(CORREGIMIENTOS), d),
+            _vereda(r, r.choice(VEREDAS), d),
+            r.choice(LINEAS),
+            base + dt.timedelta(days=r.randint(0, 900)),
+            str(3_000_000_000 + i),
+            f"p{i}@correo.co",
+        ]
+
+
+def workbook(rows: int, seed: int = 1, dirtiness: float = 1.0, title_rows: int = 0,
+             extra_sheets: bool = False) -> bytes:
+    """xlsx con la hoja GENERAL (RUEA) y, opcionalmente, hojas de otros módulos."""
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet("GENERAL")
+    for t in range(title_rows):
+        ws.append(["ALCALDÍA - REGISTRO ÚNICO DE ASISTENCIA TÉCNICA" if t == 0 else None])
+    ws.append(HEADERS)
+    for row in ruea_rows(rows, seed, dirtiness):
+        ws.append(row)
+
+    if extra_sheets:
+        r = random.Random(seed + 1)
+        ind = wb.create_sheet("INDICADORES")
+        ind.append(["anio", "eje", "indicador", "valor", "cumplimiento"])
+        for i in range(max(10, rows // 100)):
+            ind.append([r.choice([2023, 2024, 2025]), r.choice(["Productividad", "Mercados", "Asociatividad"]),
+                        f"IND-{i}", r.randint(0, 1000), round(r.random(), 3)])
+        com = wb.create_sheet("COMERCIALIZACION")
+        com.append(["anio", "estrategia", "monto", "corregimiento"])
+        for _ in range(max(10, rows // 50)):
+            com.append([r.choice([2023, 2024, 2025]), r.choice(["Mercado campesino", "Compras públicas", "Tienda"]),
+                        r.randint(10_000, 5_000_000), _corregimiento(r, r.choice(CORREGIMIENTOS), dirtiness)])
+
+    buf = io.BytesIO()
+    wb.save(buf)
+    return buf.getvalue()
@@ -0,0 +1,174 @@
+"""
+Memoria y latencia con varios workers de uvicorn: cada uno con su snapshot
+(`local`) o todos contra el motor de consultas compartido (`engine`,
+`QUERY_ENGINE_SOCKET`).
+
+Por cada modo levanta `uvicorn app.main:app --workers N` (y en `engine`,
+`python -m app.services.engine`) sobre el DATA_DIR que `bench.api_load`
+publica para `--rows` (si no existe se publica una vez), corre por HTTP real
+dos pasadas de la mezcla de `bench.api_load.SCENARIOS` (`cold`: cachés
+vacías; `warm`: las mismas requests otra vez) y suma la memoria del árbol de
+procesos. Además del RSS se reporta el PSS (Linux): las páginas compartidas,
+como las del archivo DuckDB mapeado, se reparten entre los procesos que las
+mapean y la suma no las cuenta dos veces.
+
+    python -m bench.workers --rows 100000 --workers 2
+    python -m bench.workers --rows 100000 --workers 4 --modes engine
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+from .api_load import DEFAULT_WORKDIR, SCENARIOS, _phase
+from .boot import _spawn as _boot_spawn
+
+API_DIR = Path(__file__).resolve().parents[1]
+
+
+def _children(pid: int) -> list[int]:
+    out = []
+    try:
+        for task in os.listdir(f"/proc/{pid}/task"):
+            with open(f"/proc/{pid}/task/{task}/children", encoding="ascii") as f:
+                out += [int(c) for c in f.read().split()]
+    except OSError:
+        pass
+    return out
+
+
+def _memory(pid: int) -> dict:
+    """RSS/PSS en MB de `pid` (smaps_rollup; sin PSS si el kernel no lo expone)."""
+    mem = {}
+    try:
+        with open(f"/proc/{pid}/smaps_rollup", encoding="ascii") as f:
+            for line in f:
+                key, _, rest = line.partition(":")
+                if key in ("Rss", "Pss"):
+                    mem[key.lower() + "_mb"] = round(int(rest.split()[0]) / 1024, 1)
+    except OSError:
+        pass
+    return mem
+
+
+def _tree(roles: dict[int, str]) -> list[dict]:
+    """Memoria de cada proceso: los raíz de `roles` y sus hijos (workers de uvicorn)."""
+    out = []
+    for pid, role in roles.items():
+        out.append({"role": role, "pid": pid, **_memory(pid)})
+        for child in _children(pid):
+            out.append({"role": f"{role}_worker", "pid": child, **_memory(child)})
+    return out
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _wait(cond, timeout: float, what: str):
+    t0 = time.monotonic()
+    while not cond():
+        if time.monotonic() - t0 > timeout:
+            raise RuntimeError(f"timeout esperando {what}")
+        time.sleep(0.1)
+
+
+async def _load(base: str, requests: int, concurrency: int) -> dict:
+    import httpx
+
+    mix = [(name, w) for name, (w, _) in SCENARIOS.items() if w]
+    names, weights = zip(*mix)
+
+    def pick(r: random.Random):
+        return SCENARIOS[r.choices(names, weights)[0]][1](r)
+
+    async with httpx.AsyncClient(base_url=base, timeout=None) as client:
+        cold = await _phase(client, pick, requests, concurrency, seed=99)
+        warm = await _phase(client, pick, requests, concurrency, seed=99)
+    return {"cold": cold, "warm": warm}
+
+
+def run_mode(args, data: Path, mode: str) -> dict:
+    env = dict(os.environ, DATA_DIR=str(data), DB_PATH=str(data / "current" / "duckdb.db"),
+               METRICS_ENABLED="false", PYTHONPATH=str(API_DIR / "src"))
+    env.pop("QUERY_ENGINE_SOCKET", None)
+    procs, roles = [], {}
+    try:
+        if mode == "engine":
+            sock = args.workdir / f"engine-{os.getpid()}.sock"
+            env["QUERY_ENGINE_SOCKET"] = str(sock)
+            eng = subprocess.Popen([sys.executable, "-m", "app.services.engine"], cwd=API_DIR, env=env)
+            procs.append(eng)
+            roles[eng.pid] = "engine"
+            _wait(sock.exists, 120, "el socket del motor")
+        port = _free_port()
+        api = subprocess.Popen([sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1",
+                                "--port", str(port), "--workers", str(args.workers), "--log-level", "warning"],
+                               cwd=API_DIR, env=env)
+        procs.append(api)
+        roles[api.pid] = "uvicorn"
+
+        def ready() -> bool:
+            with socket.socket() as s:
+                return s.connect_ex(("127.0.0.1", port)) == 0
+
+        _wait(ready, 120, "uvicorn")
+        time.sleep(1.0)  # el resto de los workers termina su lifespan
+        idle = _tree(roles)
+        res = asyncio.run(_load(f"http://127.0.0.1:{port}", args.requests, args.concurrency))
+        loaded = _tree(roles)
+    finally:
+        for p in reversed(procs):
+            p.terminate()
+            try:
+                p.wait(30)
+            except subprocess.TimeoutExpired:
+                p.kill()
+    total = lambda tree, k: round(sum(p.get(k, 0) for p in tree), 1)  # noqa: E731
+    return {
+        "mode": mode, "workers": args.workers, **res,
+        "idle": {"rss_mb": total(idle, "rss_mb"), "pss_mb": total(idle, "pss_mb")},
+        "loaded": {"rss_mb": total(loaded, "rss_mb"), "pss_mb": total(loaded, "pss_mb")},
+        "processes": loaded,
+    }
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    ap.add_argument("--rows", type=int, default=100_000)
+    ap.add_argument("--workers", type=int, default=2)
+    ap.add_argument("--modes", nargs="+", choices=("local", "engine"), default=["local", "engine"])
+    ap.add_argument("--requests", type=int, default=400, help="requests por pasada (cold y warm)")
+    ap.add_argument("--concurrency", type=int, default=8)
+    ap.add_argument("--seed", type=int, default=1)
+    ap.add_argument("--workdir", type=Path, default=DEFAULT_WORKDIR)
+    ap.add_argument("--data-dir", type=Path, help="DATA_DIR publicado (por defecto el de bench.api_load)")
+    ap.add_argument("--out", type=Path)
+    args = ap.parse_args(argv)
+    args.workdir = args.workdir.resolve()
+    args.no_warmup = False  # lo lee `bench.boot` al publicar
+    data = (args.data_dir or args.workdir / f"data-{args.rows}").resolve()
+
+    if not (data / "current").exists():
+        _boot_spawn(args, data, "publish")
+    res = {m: run_mode(args, data, m) for m in args.modes}
+    for r in res.values():
+        print(f"{r['mode']:>6} x{r['workers']}: PSS {r['loaded']['pss_mb']} MB (RSS {r['loaded']['rss_mb']}) | "
+              f"cold p95 {r['cold']['p95_ms']} ms {r['cold']['rps']} req/s | "
+              f"warm p95 {r['warm']['p95_ms']} ms {r['warm']['rps']} req/s")
+    if args.out:
+        args.out.parent.mkdir(parents=True, exist_ok=True)
+        args.out.write_text(json.dumps(res, indent=2, ensure_ascii=False), encoding="utf-8")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -10,5 +10,46 @@ class Settings(BaseSettings):
     DB_PATH: str = Field(default=os.getenv("DB_PATH", "./data/current/duckdb.db"))
     ADMIN_TOKEN: str = "change_me"
     LOG_LEVEL: str = "INFO"
+    # GET /metrics (formato Prometheus) + middleware de latencia por ruta
+    METRICS_ENABLED: bool = True
+    # slow-query log (JSON por línea, rotativo): umbral en segundos (0 = apagado); ruta vacía = DATA_DIR/logs/slow_queries.log
+    SLOW_QUERY_SECONDS: float = 0.5
+    SLOW_QUERY_LOG: str = ""
+    SLOW_QUERY_LOG_MAX_BYTES: int = 10_000_000
+    SLOW_QUERY_LOG_BACKUPS: int = 5
+    # retención de data/archive: se conservan las N más recientes o las de menos de X días
+    # (0 desactiva el criterio); la versión publicada y las fijadas nunca se borran
+    ARCHIVE_KEEP_VERSIONS: int = 10
+    ARCHIVE_KEEP_DAYS: int = 0
+    # consultas ?version=: LRU de conexiones read-only a versiones archivadas
+    ARCHIVE_MAX_CONNECTIONS: int = 4
+    ARCHIVE_CONN_IDLE_SECONDS: int = 300
+    # caché de resultados (facetas/stats) y warm-up post-publicación con las consultas más frecuentes
+    RESULT_CACHE_ENTRIES: int = 512
+    WARMUP_TOP_N: int = 50
+    WARMUP_SKETCH_SIZE: int = 256
+    # al arrancar cada worker: abrir el snapshot publicado y leer sus tablas (buffers de DuckDB calientes)
+    STARTUP_WARMUP: bool = True
+    # ?approx=true en stats/facetas: filas de la muestra uniforme que se guarda al publicar (0 = sin muestra)
+    APPROX_SAMPLE_ROWS: int = 100_000
+    # al publicar: documentos repetidos y cambios de identidad contra la versión anterior (tabla dup_ruea)
+    DUPLICATE_CHECK: bool = True
+    # exports asíncronos (POST /ruea/exports): hilos del pool de exportación
+    EXPORT_WORKERS: int = 2
+    # control de admisión: cupos (hilos) y colas por clase (interactive: listados/stats; bulk: descargas/exports/ETL)
+    SCHED_INTERACTIVE_SLOTS: int = 8
+    SCHED_INTERACTIVE_QUEUE: int = 64
+    SCHED_BULK_SLOTS: int = 2
+    SCHED_BULK_QUEUE: int = 16
+    SCHED_QUEUE_TIMEOUT: float = 30.0
+    # timeout de ejecución por clase y por endpoint (nombre de la función, p. ej. {"ruea_bundle": 30}); 0 = sin límite
+    QUERY_TIMEOUT_INTERACTIVE: float = 15.0
+    QUERY_TIMEOUT_BULK: float = 300.0
+    QUERY_TIMEOUTS: dict[str, float] = {}
+    # hilos DuckDB por clase (0 = los que DuckDB elija: uno por núcleo)
+    DUCK_THREADS_INTERACTIVE: int = 0
+    DUCK_THREADS_BULK: int = 2
+    # socket Unix del motor de consultas compartido (python -m app.services.engine); vacío = cada worker abre el snapshot
+    QUERY_ENGINE_SOCKET: str = ""
 
 settings = Settings()
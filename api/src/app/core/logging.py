@@ -0,0 +1,27 @@
+import logging
+import os
+from functools import lru_cache
+from logging.handlers import RotatingFileHandler
+
+from .config import settings
+
+
+def setup_logging():
+    """Nivel global desde `LOG_LEVEL` (uvicorn agrega sus propios handlers)."""
+    logging.basicConfig(level=settings.LOG_LEVEL.upper(),
+                        format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+
+
+@lru_cache(maxsize=1)
+def slow_query_logger() -> logging.Logger:
+    """Logger del slow-query log: una línea JSON por consulta, archivo rotativo propio."""
+    log = logging.getLogger("app.slow_query")
+    log.setLevel(logging.INFO)
+    log.propagate = False
+    path = settings.SLOW_QUERY_LOG or os.path.join(settings.DATA_DIR, "logs", "slow_queries.log")
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    handler = RotatingFileHandler(path, maxBytes=settings.SLOW_QUERY_LOG_MAX_BYTES,
+                                  backupCount=settings.SLOW_QUERY_LOG_BACKUPS, encoding="utf-8")
+    handler.setFormatter(logging.Formatter('{"ts": "%(asctime)s", "entry": %(message)s}'))
+    log.addHandler(handler)
+    return log
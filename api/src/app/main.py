@@ -1,11 +1,29 @@
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import ORJSONResponse
+from fastapi.responses import ORJSONResponse, PlainTextResponse
 from .core.config import settings
+from .core.logging import setup_logging
 from .routers import public, admin
+from .services import engine, metrics, paths, warmup
 from fastapi.middleware.cors import CORSMiddleware
 
-app = FastAPI(title=settings.APP_NAME, default_response_class=ORJSONResponse)
+setup_logging()
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # cada worker abre el snapshot y lo calienta antes de aceptar requests
+    # (con motor compartido el snapshot lo abre y calienta el motor)
+    paths.ensure_dirs()
+    if settings.STARTUP_WARMUP and not engine.enabled():
+        await run_in_threadpool(warmup.startup)
+    yield
+
+
+app = FastAPI(title=settings.APP_NAME, default_response_class=ORJSONResponse, lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -22,6 +40,14 @@ app.add_middleware(
     allow_methods=["GET","POST","OPTIONS"], allow_headers=["*"]
 )
 
+if settings.METRICS_ENABLED:
+    # el más externo: mide también CORS y los errores
+    app.add_middleware(metrics.MetricsMiddleware)
+
+    @app.get("/metrics", include_in_schema=False)
+    def prometheus_metrics():
+        return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
 @app.get("/health", tags=["meta"])
 def health():
     return {"status": "ok"}
@@ -0,0 +1,15 @@
+from typing import Literal
+
+from pydantic import BaseModel
+
+
+class ExportRequest(BaseModel):
+    """Cuerpo de POST /api/v1/ruea/exports: mismos filtros que /ruea/download.*"""
+    format: Literal["csv", "xlsx"] = "csv"
+    version: str | None = None
+    corregimiento: str | None = None
+    vereda: str | None = None
+    linea_productiva: str | None = None
+    escolaridad: str | None = None
+    sexo: str | None = None
+    campos: str | None = None
@@ -1,13 +1,28 @@
-from fastapi import APIRouter, File, UploadFile, Depends, BackgroundTasks, HTTPException, Form
+from fastapi import APIRouter, File, UploadFile, Depends, HTTPException, Form
 from ..core.security import require_admin
-from ..services.etl import run_refresh_from_files, run_refresh_from_workbook
+from ..services import archive, engine, paths, scheduler
+from ..services.meta import read_profile
+from ..services.xlsx_inspect import inspect_workbook
+import functools
 import json
+import logging
+import os
+import tempfile
+import zipfile
 
 router = APIRouter(prefix="/api/v1/admin", tags=["admin"])
+log = logging.getLogger(__name__)
+
+
+def _log_refresh(fut):
+    """El refresco corre sin nadie esperando su resultado: un fallo del ETL queda en el log."""
+    if fut.cancelled():
+        log.warning("refresh cancelado antes de empezar")
+    elif (exc := fut.exception()) is not None:
+        log.error("refresh falló", exc_info=exc)
 
 @router.post("/refresh")
-async def refresh(background: BackgroundTasks,
-                  ruea: UploadFile | None = File(None),
+async def refresh(ruea: UploadFile | None = File(None),
                   comercializacion: UploadFile | None = File(None),
                   indicadores: UploadFile | None = File(None),
                   nodos: UploadFile | None = File(None),
@@ -24,10 +39,15 @@ async def refresh(background: BackgroundTasks,
 
     result = {"status": "scheduled"}
 
-    def job():
-        run_refresh_from_files(bin_files)
+    # el ETL (pandas, polars, pandera) se importa recién al publicar, no al arrancar el worker
+    from ..services.etl import run_refresh_from_files
 
-    background.add_task(job)
+    # el refresco corre en el executor `bulk` (comparte cupo con descargas y exports)
+    try:
+        fut, _ = scheduler.submit("bulk", run_refresh_from_files, bin_files)
+    except scheduler.Overloaded as e:
+        raise HTTPException(503, str(e), headers={"Retry-After": "5"})
+    fut.add_done_callback(_log_refresh)
     return result
 
 @router.post("/refresh-xlsx")
@@ -51,11 +71,92 @@ async def refresh_xlsx(
     if "ruea" not in sheet_map_dict:
         raise HTTPException(400, "sheet_map debe incluir 'ruea' → nombre de la hoja (p. ej. GENERAL)")
 
+    from ..services.etl import run_refresh_from_workbook
+
     file_bytes = await file.read()
-    result = run_refresh_from_workbook(
+    # el ETL corre en el executor `bulk` (sin timeout) y no bloquea el event loop
+    job = functools.partial(
+        run_refresh_from_workbook,
         file_bytes=file_bytes,
         sheet_map=sheet_map_dict,
         header_rows=header_rows_dict,
         modules_to_process=["ruea"]  # por ahora sólo GENERAL→ruea
     )
+    try:
+        result = await scheduler.run("bulk", job, timeout=0)
+    except scheduler.Overloaded as e:
+        raise HTTPException(503, str(e), headers={"Retry-After": "5"})
     return result
+
+def _inspect_bytes(data: bytes, exact: bool) -> dict:
+    # el perfil lee el zip por partes (una apertura por hoja): necesita un archivo
+    paths.ensure_dirs()
+    fd, tmp = tempfile.mkstemp(suffix=".xlsx", dir=paths.UPLOADS)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        return inspect_workbook(tmp, exact=exact)
+    finally:
+        os.remove(tmp)
+
+@router.post("/inspect")
+async def inspect_xlsx(file: UploadFile, exact: bool = Form(False), _=Depends(require_admin)):
+    """
+    Hojas del libro (fila de encabezado, filas, columnas, módulo probable) y el
+    `sheet_map`/`header_rows` sugeridos para `/refresh-xlsx`.
+    """
+    data = await file.read()
+    try:
+        return await scheduler.run("bulk", functools.partial(_inspect_bytes, data, exact), timeout=0)
+    except scheduler.Overloaded as e:
+        raise HTTPException(503, str(e), headers={"Retry-After": "5"})
+    except (zipfile.BadZipFile, KeyError):
+        raise HTTPException(400, "El archivo no es un libro .xlsx válido")
+
+@router.get("/scheduler")
+def scheduler_stats(_=Depends(require_admin)):
+    """Cupos, colas y tiempos de espera por clase (interactive / bulk)."""
+    return scheduler.stats()
+
+@router.get("/engine")
+def engine_stats(_=Depends(require_admin)):
+    """Sesiones, consultas, caché y RSS del motor compartido (solo con QUERY_ENGINE_SOCKET)."""
+    if not engine.enabled():
+        raise HTTPException(404, "query_engine_disabled")
+    try:
+        return engine.stats()
+    except scheduler.Overloaded as e:
+        raise HTTPException(503, str(e), headers={"Retry-After": "1"})
+
+@router.get("/versions")
+def versions(_=Depends(require_admin)):
+    return {"items": archive.describe_versions()}
+
+@router.get("/profiles")
+def refresh_profiles(_=Depends(require_admin)):
+    """Perfil de cada refresh (meta.json → profile + profiles/<versión>.json) por versión archivada, de la más reciente a la más antigua."""
+    cur = archive.current_version()
+    items = []
+    for v in reversed(archive.list_versions()):
+        try:
+            profile = read_profile(v)
+        except ValueError:  # meta.json ilegible
+            profile = None
+        items.append({"version": v, "current": v == cur, "profile": profile})
+    return {"items": items}
+
+@router.post("/versions/{version}/pin")
+def pin_version(version: str, _=Depends(require_admin)):
+    if not archive.set_pinned(version, True):
+        raise HTTPException(404, f"Versión no encontrada: {version}")
+    return {"version": version, "pinned": True}
+
+@router.delete("/versions/{version}/pin")
+def unpin_version(version: str, _=Depends(require_admin)):
+    if not archive.set_pinned(version, False):
+        raise HTTPException(404, f"Versión no encontrada: {version}")
+    return {"version": version, "pinned": False}
+
+@router.post("/archive/prune")
+def prune_archive(keep_versions: int | None = None, keep_days: int | None = None, _=Depends(require_admin)):
+    return archive.apply_retention(keep_versions=keep_versions, keep_days=keep_days)
@@ -1,74 +1,95 @@
-from fastapi import APIRouter, Response, Query, HTTPException
-from fastapi.responses import StreamingResponse
-from typing import Literal, Any, List, Set, Dict
-import pandas as pd
+from fastapi import APIRouter, Request, Response, Query, HTTPException
+from fastapi.responses import FileResponse, StreamingResponse
+from typing import Literal, Any, List
 import io
-import re
+import os
 import logging
 from ..services.duck import Duck
 from ..services.meta import read_meta
+from ..services import archive, diff, engine, exports, metrics, paths, prerender, querylog, scheduler, views
 from ..services.cache import set_cache_headers
-from ..services.textnorm import norm_corregimiento_py, norm_vereda_py
+from ..services.ruea_query import (
+    VIEW, FILTROS, safe_columns as _safe_columns, public_columns, select_list, quote_ident,
+    predicados_ruea, where_ruea, where_clause, page_sql, is_coded, key_sql, conteo_por, distintos, pivot,
+)
+from ..services.gazetteer import code_col
+from ..services.sort_index import POS_COLS
+from ..services.rollups import TS_TABLE, timeseries
 from ..core.config import settings
 from ..models.responses import Meta
+from ..models.types import ExportRequest
 
-def _safe_columns(con, view_name: str = "v_ruea") -> List[str]:
-    # 1) Ruta nativa: relación de DuckDB (sirve para tablas/vistas existentes)
-    try:
-        return list(con.table(view_name).columns)
-    except Exception:
-        pass
 
-    # 2) information_schema: incluye vistas y tablas (orden en posición)
-    try:
-        rows = con.execute(
-            """
-            SELECT column_name
-            FROM information_schema.columns
-            WHERE table_name = ?
-            ORDER BY ordinal_position
-            """,
-            [view_name],
-        ).fetchall()
-        if rows:
-            return [r[0] for r in rows]
-    except Exception:
-        pass
+router = APIRouter(prefix="/api/v1", tags=["public"])
+log = logging.getLogger(__name__)
 
-    # 3) Fallback con DESCRIBE (cubre casos donde info_schema no listó la vista)
-    try:
-        safe_ident = view_name.replace('"', '""')
-        rows = con.execute(f'DESCRIBE SELECT * FROM "{safe_ident}"').fetchall()
-        # en DuckDB, la 1ª columna del DESCRIBE es el nombre de columna
-        if rows:
-            return [r[0] for r in rows]
-    except Exception:
-        pass
-
-    # 4) Si no existe la vista o aún no se ha publicado nada
-    return []
-
-def _unaccent_sql(expr: str) -> str:
-    # Quita tildes/diacríticos más comunes en es-ES/es-CO tras LOWER()
-    # REPLACE(REPLACE(...)) anidado porque DuckDB no trae unaccent nativo
-    return (
-        "REPLACE(REPLACE(REPLACE(REPLACE(REPLACE(REPLACE(REPLACE("
-        f"{expr}"
-        ",'á','a'),'é','e'),'í','i'),'ó','o'),'ú','u'),'ü','u'),'ñ','n')"
-    )
+_VERSION_DOC = "versión archivada (data/archive/<ts>); por defecto la publicada"
+_APPROX_DOC = "respuesta aproximada desde la muestra uniforme de la versión, con cotas al 95 % en `_approx`/`low`/`high`"
 
+def _version_or_404(version: str) -> str:
+    if archive.version_dir(version) is None:
+        raise HTTPException(status_code=404, detail=f"version_not_found: {version}")
+    return version
+
+
+def _cursor(version: str | None, kind: str = "interactive"):
+    # con QUERY_ENGINE_SOCKET el cursor vive en el motor compartido (services/engine.py)
+    return engine.cursor(version, kind) if engine.enabled() else Duck.cursor(version, kind)
+
+
+def _con(version: str | None = None):
+    # sin `version` (o con la publicada): conexión del snapshot actual;
+    # si no, conexión read-only del LRU de versiones archivadas
+    # cursor propio de la request: se puede interrumpir sin afectar a las demás
+    if not version or version == archive.current_version():
+        return scheduler.track(_cursor(None))
+    return scheduler.track(_cursor(_version_or_404(version)))
+
+
+def _data_version(version: str | None) -> str:
+    return views.data_version(version)
+
+
+def _prerendered(request: Request, version: str | None, name: str) -> FileResponse | None:
+    # vista sin filtros ya serializada/comprimida al publicar (services/prerender.py)
+    if querylog.profiles.get() is not None:
+        return None  # con ?profile=true se ejecutan las consultas
+    vdir = archive.version_dir(version) if version else paths.current_dir()
+    hit = prerender.find(vdir, name, request.headers.get("accept-encoding", ""))
+    if hit is None:
+        return None
+    path, encoding = hit
+    metrics.prerender_hits.inc(name)
+    resp = FileResponse(path, media_type="application/json", headers={"Vary": "Accept-Encoding"})
+    if encoding:
+        resp.headers["Content-Encoding"] = encoding
+    set_cache_headers(resp, version=_data_version(version), etag_source=os.path.basename(path))
+    return resp
+
+
+def _bulk_con(version: str | None = None):
+    # instancia DuckDB de la clase bulk (hilos limitados) sobre la misma versión
+    if not version or version == archive.current_version():
+        return scheduler.track(_cursor(None, "bulk"))
+    return scheduler.track(_cursor(_version_or_404(version), "bulk"))
+
+
+def _cached(endpoint: str, version: str | None, params: dict, run):
+    if engine.enabled() and querylog.profiles.get() is None:
+        return engine.cached(endpoint, version, params)  # caché y sketch del motor compartido
+    return views.cached(endpoint, version, params, run)
 
-router = APIRouter(prefix="/api/v1", tags=["public"])
 
 @router.get("/meta", response_model=Meta)
-def meta(resp: Response):
-    m = read_meta()
-    set_cache_headers(resp, etag_source=(m.get("version") or "none"))
+def meta(resp: Response, version: str | None = Query(None, description=_VERSION_DOC)):
+    m = read_meta(_version_or_404(version)) if version else read_meta()
+    set_cache_headers(resp, version=version, etag_source=(m.get("version") or "none"))
     return m
 
 @router.get("/indicadores")
-def indicadores(resp: Response, anio: int | None = Query(None), eje: str | None = Query(None)):
-    con = Duck.ro()
+@scheduler.offload("interactive")
+def indicadores(resp: Response, version: str | None = Query(None, description=_VERSION_DOC), anio: int | None = Query(None), eje: str | None = Query(None)):
+    con = _con(version)
     base = "SELECT anio, eje, total, cumplimiento FROM mv_indicadores"
     where, params = [], []
     if anio is not None:
@@ -79,12 +100,13 @@ def indicadores(resp: Response, anio: int | None = Query(None), eje: str | None
         base += " WHERE " + " AND ".join(where)
     base += " ORDER BY anio, eje"
     out = con.execute(base, params).fetch_df().to_dict("records")
-    set_cache_headers(resp, etag_source=str(out.__hash__()))
+    set_cache_headers(resp, version=version, etag_source=str(out.__hash__()))
     return out
 
 @router.get("/comercializacion")
-def comercializacion(resp: Response, anio: int | None = Query(None), estrategia: str | None = Query(None)):
-    con = Duck.ro()
+@scheduler.offload("interactive")
+def comercializacion(resp: Response, version: str | None = Query(None, description=_VERSION_DOC), anio: int | None = Query(None), estrategia: str | None = Query(None)):
+    con = _con(version)
     base = "SELECT anio, estrategia, total, operaciones FROM mv_comercializacion"
     where, params = [], []
     if anio is not None:
@@ -95,12 +117,45 @@ def comercializacion(resp: Response, anio: int | None = Query(None), estrategia:
         base += " WHERE " + " AND ".join(where)
     base += " ORDER BY anio, estrategia"
     out = con.execute(base, params).fetch_df().to_dict("records")
-    set_cache_headers(resp, etag_source=str(out.__hash__()))
+    set_cache_headers(resp, version=version, etag_source=str(out.__hash__()))
     return out
 
+def _resolve_order(cols: List[str], order_by: str | None, order_dir: str | None) -> tuple[str, str]:
+    order_dir_norm = (order_dir or "asc").strip().lower()
+    if order_dir_norm not in ("asc", "desc"):
+        order_dir_norm = "asc"
+
+    order_by_norm = (order_by or "").strip()
+    if order_by_norm.lower() in ("corregimiento_norm", "vereda_norm"):
+        order_by_norm = order_by_norm.lower()[: -len("_norm")]
+    if order_by_norm not in cols:
+        order_by_norm = "documento" if "documento" in cols else cols[0]
+    return order_by_norm, order_dir_norm
+
+
+def _rows_to_items(rows: list[tuple], cols: List[str], campos: str | None) -> list[dict[str, Any]]:
+    # subconjunto de columnas (campos)
+    selected_cols = cols
+    if campos:
+        keep = [c.strip() for c in campos.split(",") if c.strip() in cols]
+        if keep:
+            selected_cols = keep
+
+    # mapeo manual fila→dict (evita fetch_df/pyarrow)
+    col_index = {c: i for i, c in enumerate(cols)}
+    items: list[dict[str, Any]] = []
+    for tup in rows:
+        obj = {c: (tup[col_index[c]] if c in col_index and col_index[c] < len(tup) else None)
+               for c in selected_cols}
+        items.append(obj)
+    return items
+
+
 @router.get("/ruea")
+@scheduler.offload("interactive")
 def ruea(
     resp: Response,
+    version: str | None = Query(None, description=_VERSION_DOC),
     corregimiento: str | None = Query(None),
     vereda: str | None = Query(None),
     linea_productiva: str | None = Query(None),
@@ -113,148 +168,37 @@ def ruea(
     offset: int = Query(0, ge=0),
     debug: bool = Query(False),
 ):
-    con = Duck.ro()
-    view = "v_ruea"
+    con = _con(version)
+    view = VIEW
 
     # columnas disponibles
-    cols = _safe_columns(con, view)
+    all_cols = _safe_columns(con, view)
+    cols = public_columns(all_cols)
     if not cols:
         return {"total": 0, "limit": limit, "offset": offset, "items": []}
-    cols_set = set(cols)
-    has = cols_set.__contains__
-
-    # helper local para quitar tildes en SQL
-    def _unaccent_sql(expr: str) -> str:
-        return (
-            "REPLACE(REPLACE(REPLACE(REPLACE(REPLACE(REPLACE(REPLACE("
-            f"{expr}"
-            ",'á','a'),'é','e'),'í','i'),'ó','o'),'ú','u'),'ü','u'),'ñ','n')"
-        )
-
-    # normalizadores simétricos (Python/SQL) para filtros de igualdad/LIKE
-    def _norm_py(s: str) -> str:
-        s = unicodedata.normalize("NFD", s)
-        s = "".join(ch for ch in s if unicodedata.category(ch) != "Mn")
-        s = re.sub(r"\s+", " ", s.lower()).strip()
-        return s
-
-    def _norm_sql_col(col: str) -> str:
-        # lower + unaccent + trim + colapso de espacios
-        return (
-            "REGEXP_REPLACE("
-            + _unaccent_sql(f"LOWER(TRIM(COALESCE({col},'')))")
-            + ",'\\s+',' '"
-            + ")"
-        )
-
-    # expresiones normalizadas para corregimiento y vereda
-    _corr_base = _unaccent_sql("LOWER(COALESCE(corregimiento,''))")
-    corr_sql = (
-        "REGEXP_REPLACE("
-        "REGEXP_REPLACE("
-        f"REGEXP_REPLACE({_corr_base},'^\\s*\\d+\\s*-\\s*',''),"
-        "'^\\s*corregimiento(\\s+de)?\\s+',''),"
-        "'\\s+',' '"
-        ")"
-    )
-    _ver_base = _unaccent_sql("LOWER(COALESCE(vereda,''))")
-    ver_sql = (
-        "REGEXP_REPLACE("
-        "REGEXP_REPLACE("
-        "REGEXP_REPLACE("
-        f"REGEXP_REPLACE({_ver_base},'^\\s*\\d+\\s*-\\s*',''),"
-        "'^\\s*veredas?(\\s+de)?\\s+',''),"
-        "'^\\s*area\\s+de\\s+expansion\\s+',''),"
-        "'\\s+',' '"
-        ")"
-    )
 
     # WHERE (solo si existen las columnas)
-    from ..services.textnorm import norm_corregimiento_py, norm_vereda_py
-
-    where: list[str] = []
-    binds: list[Any] = []
-
-    if corregimiento and has("corregimiento"):
-        val = norm_corregimiento_py(corregimiento)
-        where.append(f"({corr_sql} = ? OR {corr_sql} LIKE ?)")
-        binds += [val, f"%{val}%"]
-
-    if vereda and has("vereda"):
-        val = norm_vereda_py(vereda)
-        where.append(f"({ver_sql} = ? OR {ver_sql} LIKE ?)")
-        binds += [val, f"%{val}%"]
-
-    if linea_productiva and has("linea_productiva"):
-        where.append(f"{_norm_sql_col('linea_productiva')} LIKE ?")
-        binds.append(f"%{_norm_py(linea_productiva)}%")
-
-    if escolaridad and has("escolaridad"):
-        where.append(f"{_norm_sql_col('escolaridad')} LIKE ?")
-        binds.append(f"%{_norm_py(escolaridad)}%")
-
-    if sexo and has("sexo"):
-        where.append(f"{_norm_sql_col('sexo')} LIKE ?")
-        binds.append(f"%{_norm_py(sexo)}%")
-
-    base = f"SELECT * FROM {view}"
-    if where:
-        base += " WHERE " + " AND ".join(where)
+    filtros = dict(corregimiento=corregimiento, vereda=vereda, linea_productiva=linea_productiva,
+                   escolaridad=escolaridad, sexo=sexo)
+    where, binds = where_ruea(all_cols, filtros)
 
     # TOTAL robusto (sin ORDER/LIMIT)
-    count_sql = f"SELECT COUNT(*) FROM ({base}) AS t"
+    count_sql = f"SELECT COUNT(*) FROM {view}" + where_clause(where)
     row = con.execute(count_sql, binds).fetchone()
     total = int(row[0]) if row else 0
 
     # === ORDEN ===
-    order_dir_norm = (order_dir or "asc").strip().lower()
-    dir_sql = "ASC" if order_dir_norm == "asc" else "DESC"
-
-    order_by_norm = (order_by or "").strip()
-    if order_by_norm not in cols:
-        order_by_norm = "documento" if "documento" in cols else cols[0]
+    order_by_norm, order_dir_norm = _resolve_order(cols, order_by, order_dir)
 
-    if order_by_norm.lower() in ("corregimiento", "corregimiento_norm") and has("corregimiento"):
-        order_expr = corr_sql
-    elif order_by_norm.lower() in ("vereda", "vereda_norm") and has("vereda"):
-        order_expr = ver_sql
-    else:
-        safe = order_by_norm.replace('"', '""')
-        order_expr = f'"{safe}"'
+    # posiciones precalculadas si el snapshot las trae; si no, sort clásico
+    select = f"SELECT {select_list(cols)} FROM {view}"
+    sql, page_binds = page_sql(all_cols, select, where, order_by_norm, order_dir_norm, limit, offset)
+    rows = con.execute(sql, binds + page_binds).fetchall() or []
 
-    # clave para mandar nulos/vacíos al final sin romper tipos numéricos
-    ord_cast  = f"NULLIF(TRIM(CAST({order_expr} AS VARCHAR)), '')"
-    nulls_key = f"CASE WHEN {ord_cast} IS NULL THEN 1 ELSE 0 END"
-
-    # consulta final (sin NULLS LAST) + ejecución segura
-    sql = f"{base} ORDER BY {nulls_key} ASC, {order_expr} {dir_sql} LIMIT ? OFFSET ?"
-    try:
-        res = con.execute(sql, binds + [int(limit), int(offset)])
-        rows = res.fetchall() or []
-    except Exception as e:
-        # Si prefieres, devuelve 500 JSON en vez de tumbar conexión:
-        # from fastapi import HTTPException
-        # raise HTTPException(status_code=500, detail=f"ruea_query_failed: {e}")
-        raise
-
-    # subconjunto de columnas (campos)
-    selected_cols = cols
-    if campos:
-        keep = [c.strip() for c in campos.split(",") if c.strip() in cols]
-        if keep:
-            selected_cols = keep
-
-    # mapeo manual fila→dict (evita fetch_df/pyarrow)
-    col_index = {c: i for i, c in enumerate(cols)}
-    items: list[dict[str, Any]] = []
-    for tup in rows:
-        obj = {c: (tup[col_index[c]] if c in col_index and col_index[c] < len(tup) else None)
-               for c in selected_cols}
-        items.append(obj)
+    items = _rows_to_items(rows, cols, campos)
 
     # cache/etag
-    set_cache_headers(
-        resp,
+    set_cache_headers(resp, version=version,
         etag_source=str(
             hash(
                 (
@@ -275,61 +219,32 @@ def ruea(
     if debug:
         payload["_debug"] = {
             "sql": sql,
-            "binds": binds + [int(limit), int(offset)],
+            "binds": binds + page_binds,
         }
     return payload
 
 
 def _build_ruea_query_and_params(
+    con,
     corregimiento: str | None,
     vereda: str | None,
     linea_productiva: str | None,
     escolaridad: str | None,
     sexo: str | None,
 ):
-    # mismas expr. SQL de normalización que ya tienes:
-    corr_sql = (
-        "REGEXP_REPLACE("
-        "REGEXP_REPLACE("
-        "REGEXP_REPLACE(LOWER(COALESCE(corregimiento,'')),'^\\s*\\d+\\s*-\\s*',''),"
-        "'^\\s*corregimiento(\\s+de)?\\s+',''),"
-        "'\\s+',' '"
-        ")"
-    )
-    ver_sql = (
-        "REGEXP_REPLACE("
-        "REGEXP_REPLACE("
-        "REGEXP_REPLACE("
-        "REGEXP_REPLACE(LOWER(COALESCE(vereda,'')),'^\\s*\\d+\\s*-\\s*',''),"
-        "'^\\s*veredas?(\\s+de)?\\s+',''),"
-        "'^\\s*area\\s+de\\s+expansion\\s+',''),"
-        "'\\s+',' '"
-        ")"
-    )
-
-    base = "SELECT * FROM v_ruea"
-    where, params = [], []
-    from ..services.textnorm import norm_corregimiento_py, norm_vereda_py
-    if corregimiento:
-        val = norm_corregimiento_py(corregimiento)
-        where.append(f"({corr_sql} = ? OR {corr_sql} LIKE ?)"); params += [val, f"%{val}%"]
-    if vereda:
-        val = norm_vereda_py(vereda)
-        where.append(f"({ver_sql} = ? OR {ver_sql} LIKE ?)"); params += [val, f"%{val}%"]
-    if linea_productiva:
-        where.append("LOWER(linea_productiva)=LOWER(?)"); params.append(linea_productiva)
-    if escolaridad:
-        where.append("LOWER(escolaridad)=LOWER(?)"); params.append(escolaridad)
-    if sexo:
-        where.append("LOWER(sexo)=LOWER(?)"); params.append(sexo)
-
-    if where:
-        base += " WHERE " + " AND ".join(where)
+    all_cols = _safe_columns(con, VIEW)
+    cols = public_columns(all_cols)
+    filtros = dict(corregimiento=corregimiento, vereda=vereda, linea_productiva=linea_productiva,
+                   escolaridad=escolaridad, sexo=sexo)
+    where, params = where_ruea(all_cols, filtros)
+    base = f"SELECT {select_list(cols) if cols else '*'} FROM {VIEW}" + where_clause(where)
     base += " ORDER BY 1"
     return base, params
 
 @router.get("/ruea/download.csv")
+@scheduler.offload("bulk")
 def ruea_download_csv(
+    version: str | None = Query(None, description=_VERSION_DOC),
     corregimiento: str | None = Query(None),
     vereda: str | None = Query(None),
     linea_productiva: str | None = Query(None),
@@ -337,8 +252,8 @@ def ruea_download_csv(
     sexo: str | None = Query(None),
     campos: str | None = Query(None),
 ):
-    con = Duck.ro()
-    sql, params = _build_ruea_query_and_params(corregimiento, vereda, linea_productiva, escolaridad, sexo)
+    con = _bulk_con(version)
+    sql, params = _build_ruea_query_and_params(con, corregimiento, vereda, linea_productiva, escolaridad, sexo)
     df = con.execute(sql, params).fetch_df()
     if campos:
         keep = [c.strip() for c in campos.split(",") if c.strip() in df.columns]
@@ -350,7 +265,9 @@ def ruea_download_csv(
                              headers={"Content-Disposition": "attachment; filename=ruea.csv"})
 
 @router.get("/ruea/download.xlsx")
+@scheduler.offload("bulk")
 def ruea_download_xlsx(
+    version: str | None = Query(None, description=_VERSION_DOC),
     corregimiento: str | None = Query(None),
     vereda: str | None = Query(None),
     linea_productiva: str | None = Query(None),
@@ -358,8 +275,10 @@ def ruea_download_xlsx(
     sexo: str | None = Query(None),
     campos: str | None = Query(None),
 ):
-    con = Duck.ro()
-    sql, params = _build_ruea_query_and_params(corregimiento, vereda, linea_productiva, escolaridad, sexo)
+    import pandas as pd  # solo para el xlsx: pandas no se carga al arrancar el worker
+
+    con = _bulk_con(version)
+    sql, params = _build_ruea_query_and_params(con, corregimiento, vereda, linea_productiva, escolaridad, sexo)
     df = con.execute(sql, params).fetch_df()
     if campos:
         keep = [c.strip() for c in campos.split(",") if c.strip() in df.columns]
@@ -371,195 +290,103 @@ def ruea_download_xlsx(
     return StreamingResponse(buf, media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
                              headers={"Content-Disposition": "attachment; filename=ruea.xlsx"})
 
+@router.post("/ruea/exports")
+@scheduler.offload("bulk")
+def ruea_export_submit(body: ExportRequest, resp: Response):
+    """Encola un export CSV/XLSX; uno idéntico ya generado para la versión queda `done` al instante."""
+    # versión fija desde ahora: si se publica otra antes de que corra, el export sigue siendo de esta
+    version = _version_or_404(body.version) if body.version else archive.current_version()
+    filtros = dict(corregimiento=body.corregimiento, vereda=body.vereda, linea_productiva=body.linea_productiva,
+                   escolaridad=body.escolaridad, sexo=body.sexo)
+    campos = list(dict.fromkeys(c.strip() for c in (body.campos or "").split(",") if c.strip()))
+
+    def prepare():
+        # solo si el export no existe: corre en el hilo del export, dentro del cupo `bulk`
+        con = _bulk_con(version)
+        try:
+            sql, params = _build_ruea_query_and_params(con, **filtros)
+            if campos:
+                cols = public_columns(_safe_columns(con, VIEW))
+                keep = [c for c in campos if c in cols]
+                if keep:
+                    sql = f"SELECT {select_list(keep)} FROM ({sql}) t"
+        except BaseException:
+            con.close()
+            raise
+        return con, sql, params
+
+    job = exports.submit(_data_version(version), body.format, dict(filtros, campos=",".join(campos)), prepare)
+    resp.status_code = 200 if job.status == "done" else 202
+    return {**job.as_dict(), "download_url": f"{router.prefix}/ruea/exports/{job.id}/download"}
+
+@router.get("/ruea/exports/{job_id}")
+def ruea_export_status(job_id: str):
+    job = exports.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="export_not_found")
+    return {**job.as_dict(), "download_url": f"{router.prefix}/ruea/exports/{job.id}/download"}
+
+@router.get("/ruea/exports/{job_id}/download")
+def ruea_export_download(job_id: str):
+    """Artefacto del export; FileResponse atiende `Range`/`If-Range` para descargas reanudables."""
+    job = exports.get(job_id)
+    if job is None or (job.status == "done" and not os.path.exists(job.path)):
+        raise HTTPException(status_code=404, detail="export_not_found")
+    if job.status != "done":
+        raise HTTPException(status_code=409, detail=f"export_{job.status}")
+    return FileResponse(job.path, media_type=exports.MEDIA_TYPES[job.format], filename=f"ruea.{job.format}",
+                        headers={"Cache-Control": "private, max-age=86400"})
+
 @router.get("/ruea/facetas")
+@scheduler.offload("interactive")
 def ruea_facetas(
+    request: Request,
+    version: str | None = Query(None, description=_VERSION_DOC),
     corregimiento: str | None = Query(None),
     vereda: str | None = Query(None),
     linea_productiva: str | None = Query(None),
     escolaridad: str | None = Query(None),
     sexo: str | None = Query(None),
     debug: bool = Query(False),
+    approx: bool = Query(False, description=_APPROX_DOC),
 ):
-    con = Duck.ro()
-    view = "v_ruea"
-
-    cols: List[str] = _safe_columns(con, view)
-    if not cols:
-        return {"corregimiento": [], "vereda": [], "linea_productiva": [], "escolaridad": [], "sexo": []}
-    has = set(cols).__contains__
-
-    # ===== Helpers iguales a /ruea =====
-    def _unaccent_sql(expr: str) -> str:
-        return (
-            "REPLACE(REPLACE(REPLACE(REPLACE(REPLACE(REPLACE(REPLACE("
-            f"{expr}"
-            ",'á','a'),'é','e'),'í','i'),'ó','o'),'ú','u'),'ü','u'),'ñ','n')"
-        )
-
-    def _norm_sql_col(col: str) -> str:
-        # lower + unaccent + trim + colapso de espacios
-        return (
-            "REGEXP_REPLACE("
-            + _unaccent_sql(f"LOWER(TRIM(COALESCE({col},'')))")
-            + ",'\\s+',' '"
-            + ")"
-        )
-
-    # Normalizadores de corregimiento/vereda (idénticos a /ruea)
-    _corr_base = _unaccent_sql("LOWER(COALESCE(corregimiento,''))")
-    corr_sql = (
-        "REGEXP_REPLACE("
-        "REGEXP_REPLACE("
-        f"REGEXP_REPLACE({_corr_base},'^\\s*\\d+\\s*-\\s*',''),"
-        "'^\\s*corregimiento(\\s+de)?\\s+',''),"
-        "'\\s+',' '"
-        ")"
-    )
-
-    _ver_base = _unaccent_sql("LOWER(COALESCE(vereda,''))")
-    ver_sql = (
-        "REGEXP_REPLACE("
-        "REGEXP_REPLACE("
-        "REGEXP_REPLACE("
-        f"REGEXP_REPLACE({_ver_base},'^\\s*\\d+\\s*-\\s*',''),"
-        "'^\\s*veredas?(\\s+de)?\\s+',''),"
-        "'^\\s*area\\s+de\\s+expansion\\s+',''),"
-        "'\\s+',' '"
-        ")"
-    )
+    con = _con(version)
+    filtros = dict(corregimiento=corregimiento, vereda=vereda, linea_productiva=linea_productiva,
+                   escolaridad=escolaridad, sexo=sexo)
+    if not debug and not approx and not any(filtros.values()):
+        pre = _prerendered(request, version, "facetas")
+        if pre is not None:
+            return pre
+    params = dict(filtros, debug=debug, **({"approx": True} if approx else {}))
+    return _cached("facetas", version, params, lambda: views.facetas(con, filtros, debug, approx))
 
-    # Normalizadores python iguales a los usados en /ruea
-    from ..services.textnorm import norm_corregimiento_py, norm_vereda_py
-
-    def build_filters(skip: str | None = None) -> tuple[list[str], list[Any]]:
-        where: list[str] = []
-        binds: list[Any] = []
-        if skip != "corregimiento" and corregimiento and has("corregimiento"):
-            val = norm_corregimiento_py(corregimiento)
-            where.append(f"({corr_sql} = ? OR {corr_sql} LIKE ?)")
-            binds += [val, f"%{val}%"]
-        if skip != "vereda" and vereda and has("vereda"):
-            val = norm_vereda_py(vereda)
-            where.append(f"({ver_sql} = ? OR {ver_sql} LIKE ?)")
-            binds += [val, f"%{val}%"]
-        if skip != "linea_productiva" and linea_productiva and has("linea_productiva"):
-            where.append(f"{_norm_sql_col('linea_productiva')} LIKE ?")
-            binds.append(f"%{linea_productiva.lower().strip()}%")
-        if skip != "escolaridad" and escolaridad and has("escolaridad"):
-            where.append(f"{_norm_sql_col('escolaridad')} LIKE ?")
-            binds.append(f"%{escolaridad.lower().strip()}%")
-        if skip != "sexo" and sexo and has("sexo"):
-            where.append(f"{_norm_sql_col('sexo')} LIKE ?")
-            binds.append(f"%{sexo.lower().strip()}%")
-        return where, binds
-
-    def distinct_for(expr_sql: str, required_col: str, skip: str | None) -> list[str]:
-        if not has(required_col):
-            return []
-        where, binds = build_filters(skip)
-        sql = f"SELECT DISTINCT TRIM({expr_sql}) AS v FROM {view}"
-        if where:
-            sql += " WHERE " + " AND ".join(where)
-        sql += (" AND " if where else " WHERE ") + f"TRIM(COALESCE({expr_sql},''))<>''"
-        sql += " ORDER BY 1"
-        try:
-            rows = con.execute(sql, binds).fetchall()
-        except Exception as e:
-            raise HTTPException(status_code=500, detail=f"facetas_query_failed: {e}")
-        return [r[0] for r in rows] if rows else []
-
-    out = {
-        "corregimiento":   distinct_for(corr_sql, "corregimiento", "corregimiento"),
-        "vereda":          distinct_for(ver_sql, "vereda", "vereda"),
-        "linea_productiva":distinct_for(_norm_sql_col("linea_productiva"), "linea_productiva", "linea_productiva"),
-        "escolaridad":     distinct_for(_norm_sql_col("escolaridad"), "escolaridad", "escolaridad"),
-        "sexo":            distinct_for(_norm_sql_col("sexo"), "sexo", "sexo"),
-    }
-    if debug:
-        out["_debug"] = {"cols": cols}
-    return out
 
 @router.get("/ruea/summary")
+@scheduler.offload("interactive")
 def ruea_summary(
+    request: Request,
+    version: str | None = Query(None, description=_VERSION_DOC),
     corregimiento: str | None = Query(None),
     vereda: str | None = Query(None),
     linea_productiva: str | None = Query(None),
     escolaridad: str | None = Query(None),
     sexo: str | None = Query(None),
 ):
-    con = Duck.ro()
-
-    corr_sql = (
-        "REGEXP_REPLACE("
-        "REGEXP_REPLACE("
-        "REGEXP_REPLACE(LOWER(COALESCE(corregimiento,'')),'^\\s*\\d+\\s*-\\s*',''),"
-        "'^\\s*corregimiento(\\s+de)?\\s+',''),"
-        "'\\s+',' '"
-        ")"
-    )
-    ver_sql = (
-        "REGEXP_REPLACE("
-        "REGEXP_REPLACE("
-        "REGEXP_REPLACE("
-        "REGEXP_REPLACE(LOWER(COALESCE(vereda,'')),'^\\s*\\d+\\s*-\\s*',''),"
-        "'^\\s*veredas?(\\s+de)?\\s+',''),"
-        "'^\\s*area\\s+de\\s+expansion\\s+',''),"
-        "'\\s+',' '"
-        ")"
-    )
-
-    base = "SELECT * FROM v_ruea"
-    where, params = [], []
-    from ..services.textnorm import norm_corregimiento_py, norm_vereda_py
-    if corregimiento:
-        val = norm_corregimiento_py(corregimiento)
-        where.append(f"({corr_sql} = ? OR {corr_sql} LIKE ?)"); params += [val, f"%{val}%"]
-    if vereda:
-        val = norm_vereda_py(vereda)
-        where.append(f"({ver_sql} = ? OR {ver_sql} LIKE ?)"); params += [val, f"%{val}%"]
-    if linea_productiva:
-        where.append("LOWER(linea_productiva) = LOWER(?)"); params.append(linea_productiva)
-    if escolaridad:
-        where.append("LOWER(escolaridad) = LOWER(?)"); params.append(escolaridad)
-    if sexo:
-        where.append("LOWER(sexo) = LOWER(?)"); params.append(sexo)
-    if where:
-        base += " WHERE " + " AND ".join(where)
-
-    # total
-    base_no_paging = re.sub(r"\s+ORDER\s+BY\s+.+$", "", base, flags=re.IGNORECASE)
-    base_no_paging = re.sub(r"\s+LIMIT\s+\S+(?:\s+OFFSET\s+\S+)?", "", base_no_paging, flags=re.IGNORECASE)
-    count_sql = f"SELECT COUNT(*) FROM ({base_no_paging}) AS t"
-    row = con.execute(count_sql, params).fetchone()
-    total = int(row[0]) if row else 0
+    con = _con(version)
+    filtros = dict(corregimiento=corregimiento, vereda=vereda, linea_productiva=linea_productiva,
+                   escolaridad=escolaridad, sexo=sexo)
+    if not any(filtros.values()):
+        pre = _prerendered(request, version, "summary")
+        if pre is not None:
+            return pre
+    return views.summary(con, filtros)
 
 
-    # top-5 corregimientos normalizados
-    q_top_corr = f"""
-    WITH base AS ({base})
-    SELECT {corr_sql} AS nombre, COUNT(*) AS total
-    FROM base
-    GROUP BY 1
-    ORDER BY 2 DESC
-    LIMIT 5
-    """
-    top_corr = [{"name": r[0] or "", "total": r[1]} for r in con.execute(q_top_corr, params).fetchall()]
-
-    # top-5 veredas normalizadas
-    q_top_ver = f"""
-    WITH base AS ({base})
-    SELECT {ver_sql} AS nombre, COUNT(*) AS total
-    FROM base
-    GROUP BY 1
-    ORDER BY 2 DESC
-    LIMIT 5
-    """
-    top_ver = [{"name": r[0] or "", "total": r[1]} for r in con.execute(q_top_ver, params).fetchall()]
-
-    return {"total": int(total), "top_corregimiento": top_corr, "top_vereda": top_ver}
-
 @router.get("/ruea/stats")
+@scheduler.offload("interactive")
 def ruea_stats(
+    request: Request,
+    version: str | None = Query(None, description=_VERSION_DOC),
     by: Literal["corregimiento","vereda","linea_productiva","escolaridad","sexo"] = Query(...),
     top: int = Query(0, ge=0, le=1000),
     corregimiento: str | None = None,
@@ -567,101 +394,246 @@ def ruea_stats(
     linea_productiva: str | None = None,
     escolaridad: str | None = None,
     sexo: str | None = None,
+    approx: bool = Query(False, description=_APPROX_DOC),
 ):
-    con = Duck.ro()
-    view = "v_ruea"
-    cols = _safe_columns(con, view)
-    if not cols:
-        return {"items": []}
-    has = set(cols).__contains__
-
-    # === helpers SQL locales (evita NameError) ===
-    def _unaccent_sql(expr: str) -> str:
-        return (
-            "REPLACE(REPLACE(REPLACE(REPLACE(REPLACE(REPLACE(REPLACE("
-            f"{expr}"
-            ",'á','a'),'é','e'),'í','i'),'ó','o'),'ú','u'),'ü','u'),'ñ','n')"
-        )
-
-    def _norm_sql_col(col: str) -> str:
-        return (
-            "REGEXP_REPLACE("
-            + _unaccent_sql(f"LOWER(TRIM(COALESCE({col},'')))")
-            + ",'\\s+',' '"
-            + ")"
-        )
-
-    _corr_base = _unaccent_sql("LOWER(COALESCE(corregimiento,''))")
-    corr_sql = (
-        "REGEXP_REPLACE("
-        "REGEXP_REPLACE("
-        f"REGEXP_REPLACE({_corr_base},'^\\s*\\d+\\s*-\\s*',''),"
-        "'^\\s*corregimiento(\\s+de)?\\s+',''),"
-        "'\\s+',' '"
-        ")"
-    )
-
-    _ver_base = _unaccent_sql("LOWER(COALESCE(vereda,''))")
-    ver_sql = (
-        "REGEXP_REPLACE("
-        "REGEXP_REPLACE("
-        "REGEXP_REPLACE("
-        f"REGEXP_REPLACE({_ver_base},'^\\s*\\d+\\s*-\\s*',''),"
-        "'^\\s*veredas?(\\s+de)?\\s+',''),"
-        "'^\\s*area\\s+de\\s+expansion\\s+',''),"
-        "'\\s+',' '"
-        ")"
-    )
-
-    expr_map = {
-        "corregimiento": corr_sql if has("corregimiento") else None,
-        "vereda": ver_sql if has("vereda") else None,
-        "linea_productiva": _norm_sql_col("linea_productiva") if has("linea_productiva") else None,
-        "escolaridad": _norm_sql_col("escolaridad") if has("escolaridad") else None,
-        "sexo": _norm_sql_col("sexo") if has("sexo") else None,
-    }
-    expr = expr_map.get(by)
-    if not expr:
-        return {"items": []}
-
+    con = _con(version)
     # filtros (idénticos a /ruea)
-    from ..services.textnorm import norm_corregimiento_py, norm_vereda_py
-    where, binds = [], []
-
-    if corregimiento and has("corregimiento"):
-        val = norm_corregimiento_py(corregimiento)
-        where.append(f"({corr_sql} = ? OR {corr_sql} LIKE ?)")
-        binds += [val, f"%{val}%"]
-
-    if vereda and has("vereda"):
-        val = norm_vereda_py(vereda)
-        where.append(f"({ver_sql} = ? OR {ver_sql} LIKE ?)")
-        binds += [val, f"%{val}%"]
-
-    if linea_productiva and has("linea_productiva"):
-        where.append(f"{_norm_sql_col('linea_productiva')} LIKE ?")
-        binds.append(f"%{linea_productiva.lower().strip()}%")
-
-    if escolaridad and has("escolaridad"):
-        where.append(f"{_norm_sql_col('escolaridad')} LIKE ?")
-        binds.append(f"%{escolaridad.lower().strip()}%")
-
-    if sexo and has("sexo"):
-        where.append(f"{_norm_sql_col('sexo')} LIKE ?")
-        binds.append(f"%{sexo.lower().strip()}%")
-
-    sql = f"SELECT {expr} AS name, COUNT(*) AS value FROM {view}"
-    if where:
-        sql += " WHERE " + " AND ".join(where)
-    sql += " GROUP BY 1 ORDER BY 2 DESC"
-    if top and top > 0:
-        sql += f" LIMIT {int(top)}"
+    filtros = dict(corregimiento=corregimiento, vereda=vereda, linea_productiva=linea_productiva,
+                   escolaridad=escolaridad, sexo=sexo)
+    if top == 0 and not approx and not any(filtros.values()):
+        pre = _prerendered(request, version, f"stats-{by}")
+        if pre is not None:
+            return pre
+    params = dict(filtros, by=by, top=top, **({"approx": True} if approx else {}))
+    run = (lambda: views.stats_approx(con, by, top, filtros)) if approx else (lambda: views.stats(con, by, top, filtros))
+    return _cached("stats", version, params, run)
+
+
+def _parse_stats_spec(stats: str | None) -> list[tuple[str, int]]:
+    # "vereda:10,linea_productiva" → [("vereda", 10), ("linea_productiva", 0)]
+    out: list[tuple[str, int]] = []
+    for part in (stats or "").split(","):
+        name, _, top = part.strip().partition(":")
+        if name not in FILTROS:
+            continue
+        try:
+            n = max(0, min(int(top or 0), 1000))
+        except ValueError:
+            n = 0
+        out.append((name, n))
+    return out
 
+@router.get("/ruea/bundle")
+@scheduler.offload("interactive")
+def ruea_bundle(
+    resp: Response,
+    version: str | None = Query(None, description=_VERSION_DOC),
+    corregimiento: str | None = Query(None),
+    vereda: str | None = Query(None),
+    linea_productiva: str | None = Query(None),
+    escolaridad: str | None = Query(None),
+    sexo: str | None = Query(None),
+    campos: str | None = Query(None),
+    order_by: str = Query("documento"),
+    order_dir: Literal["asc", "desc"] = Query("asc"),
+    limit: int = Query(50, ge=0, le=1000),
+    offset: int = Query(0, ge=0),
+    stats: str | None = Query(None, description="dimensiones para stats, p. ej. 'vereda:10,linea_productiva,corregimiento'"),
+):
+    """
+    /ruea + /ruea/facetas + /ruea/summary + N×/ruea/stats en una sola ida.
+    Los predicados se evalúan una vez: las filas que fallan a lo sumo un filtro
+    se materializan en una tabla temporal con un flag por filtro; el listado,
+    el total y los top usan todos los flags y cada faceta ignora el suyo.
+    """
+    stats_spec = _parse_stats_spec(stats)
+    empty_fac = {d: [] for d in FILTROS}
+    con = _con(version)  # cursor propio de la request: la tabla temporal es privada
     try:
-        rows = con.execute(sql, binds).fetchall() or []
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"stats_query_failed: {e}")
+        all_cols = _safe_columns(con, VIEW)
+        cols = public_columns(all_cols)
+        if not cols:
+            return {"ruea": {"total": 0, "limit": limit, "offset": offset, "items": []},
+                    "facetas": empty_fac,
+                    "summary": {"total": 0, "top_corregimiento": [], "top_vereda": []},
+                    "stats": {by: [] for by, _ in stats_spec}}
+
+        filtros = dict(corregimiento=corregimiento, vereda=vereda, linea_productiva=linea_productiva,
+                       escolaridad=escolaridad, sexo=sexo)
+        preds = predicados_ruea(all_cols, filtros)
+        dims = [d for d in FILTROS if d in all_cols]
+        order_by_norm, order_dir_norm = _resolve_order(cols, order_by, order_dir)
+
+        # clave de fila: cualquier posición precalculada es un entero único por fila
+        row_key = next((c for c in POS_COLS if c.endswith("_asc") and c in all_cols), None)
+
+        if preds:
+            keep = [row_key] if row_key else list(cols)
+            keep += [c for c in POS_COLS if c in all_cols and c not in keep]
+            if row_key and f"pos_{order_by_norm}_{order_dir_norm}" not in all_cols:
+                keep.append(order_by_norm)  # orden sin posición: se materializa la columna
+            select = [quote_ident(c) for c in keep]
+            exprs: dict[str, str | None] = {}
+            for d in dims:
+                if is_coded(all_cols, d):
+                    exprs[d] = None
+                    select.append(code_col(d))
+                else:
+                    # valor normalizado calculado una sola vez por fila
+                    exprs[d] = f"k_{d}"
+                    select.append(f"{key_sql(all_cols, d)} AS k_{d}")
+            select += [f"COALESCE(({sql}), FALSE) AS m_{name}" for name, (sql, _) in preds.items()]
+            binds = [b for _, bs in preds.values() for b in bs]
+
+            src = "bundle_sel"
+            inner = f"SELECT {', '.join(select)} FROM {VIEW}"
+            fails = " + ".join(f"CAST(NOT m_{name} AS INTEGER)" for name in preds)
+            con.execute(f"CREATE TEMP TABLE {src} AS SELECT * FROM ({inner}) WHERE {fails} <= 1", binds)
+            src_cols = _safe_columns(con, src)
+        else:
+            src, src_cols = VIEW, all_cols
+            exprs = {d: None for d in dims}
+
+        def flags(skip: str | None = None) -> list[str]:
+            return [f"m_{name}" for name in preds if name != skip]
+
+        row = con.execute(f"SELECT COUNT(*) FROM {src}" + where_clause(flags())).fetchone()
+        total = int(row[0]) if row else 0
+
+        # listado
+        rows: list[tuple] = []
+        if limit > 0:
+            if preds and row_key:
+                key_sql_, pb = page_sql(src_cols, f"SELECT {row_key} FROM {src}", flags(),
+                                        order_by_norm, order_dir_norm, limit, offset)
+                keys = [r[0] for r in con.execute(key_sql_, pb).fetchall()]
+                if keys:
+                    fetched = con.execute(
+                        f"SELECT {select_list(cols)}, {row_key} FROM {VIEW} "
+                        f"WHERE {row_key} IN ({', '.join('?' * len(keys))})", keys
+                    ).fetchall()
+                    by_key = {r[-1]: r[:-1] for r in fetched}
+                    rows = [by_key[k] for k in keys if k in by_key]
+            else:
+                sel = f"SELECT {select_list(cols)} FROM {src}"
+                page, pb = page_sql(src_cols, sel, flags(), order_by_norm, order_dir_norm, limit, offset)
+                rows = con.execute(page, pb).fetchall() or []
+
+        facetas = {
+            d: (distintos(con, src_cols, d, flags(skip=d), [], source=src, expr=exprs[d]) if d in dims else [])
+            for d in FILTROS
+        }
 
-    return {"items": [{"name": r[0], "value": r[1]} for r in rows if r and r[0] is not None]}
+        def top(by: str, n: int) -> list[tuple]:
+            if by not in dims:
+                return []
+            return conteo_por(con, src_cols, by, flags(), [], top=n, source=src, expr=exprs[by])
 
+        summary = {
+            "total": total,
+            "top_corregimiento": [{"name": r[0] or "", "total": r[1]} for r in top("corregimiento", 5)],
+            "top_vereda": [{"name": r[0] or "", "total": r[1]} for r in top("vereda", 5)],
+        }
+        out_stats = {
+            by: [{"name": r[0], "value": r[1]} for r in top(by, n) if r and r[0] is not None]
+            for by, n in stats_spec
+        }
+    except (HTTPException, scheduler.Overloaded, scheduler.Cancelled):
+        raise  # 4xx propios, 503 y 504/499 (ver scheduler.offload)
+    except Exception:
+        log.exception("bundle_query_failed")
+        raise HTTPException(status_code=500, detail="bundle_query_failed")
+    finally:
+        con.close()
+
+    set_cache_headers(resp, version=version,
+        etag_source=str(hash((total, tuple(sorted((k, v) for k, v in filtros.items() if v)),
+                              order_by_norm, order_dir_norm, limit, offset, tuple(stats_spec)))),
+    )
+    return {
+        "ruea": {"total": total, "limit": limit, "offset": offset, "items": _rows_to_items(rows, cols, campos)},
+        "facetas": facetas,
+        "summary": summary,
+        "stats": out_stats,
+    }
 
+@router.get("/ruea/pivot")
+@scheduler.offload("interactive")
+def ruea_pivot(
+    resp: Response,
+    version: str | None = Query(None, description=_VERSION_DOC),
+    rows: Literal["corregimiento","vereda","linea_productiva","escolaridad","sexo","estrato"] = Query(...),
+    cols: Literal["corregimiento","vereda","linea_productiva","escolaridad","sexo","estrato"] | None = Query(None),
+    top: int = Query(0, ge=0, le=5000),
+    corregimiento: str | None = Query(None),
+    vereda: str | None = Query(None),
+    linea_productiva: str | None = Query(None),
+    escolaridad: str | None = Query(None),
+    sexo: str | None = Query(None),
+):
+    """Crosstab rows×cols (cols opcional) con conteo, edad avg/min/max y distribución de estrato."""
+    con = _con(version)
+    all_cols = _safe_columns(con, VIEW)
+    dims = [rows] + ([cols] if cols and cols != rows else [])
+    if not all_cols or any(d not in all_cols for d in dims):
+        return {"dims": dims, "items": []}
+
+    filtros = dict(corregimiento=corregimiento, vereda=vereda, linea_productiva=linea_productiva,
+                   escolaridad=escolaridad, sexo=sexo)
+    where, binds = where_ruea(all_cols, filtros)
+    with scheduler.query_errors("pivot"):
+        items = pivot(con, all_cols, dims, where, binds, top=top)
+
+    set_cache_headers(resp, version=version, etag_source=str(hash((tuple(dims), top, tuple(sorted((k, v) for k, v in filtros.items() if v)),
+                                                  len(items)))))
+    return {"dims": dims, "items": items}
+
+@router.get("/ruea/timeseries")
+@scheduler.offload("interactive")
+def ruea_timeseries(
+    resp: Response,
+    version: str | None = Query(None, description=_VERSION_DOC),
+    bucket: Literal["month", "week"] = Query("month"),
+    por: Literal["corregimiento", "linea_productiva"] | None = Query(None, description="desagregación de las series"),
+    corregimiento: str | None = Query(None),
+    linea_productiva: str | None = Query(None),
+):
+    """Registros por periodo (fecha_registro) y acumulado, servidos desde el rollup de publicación."""
+    con = _con(version)
+    if not _safe_columns(con, TS_TABLE):
+        return {"bucket": bucket, "por": por, "series": []}
+
+    filtros = dict(corregimiento=corregimiento, linea_productiva=linea_productiva)
+    with scheduler.query_errors("timeseries"):
+        series = timeseries(con, bucket, por, filtros)
+
+    set_cache_headers(resp, version=version, etag_source=str(hash((bucket, por, corregimiento, linea_productiva,
+                                                  sum(s["total"] for s in series)))))
+    return {"bucket": bucket, "por": por, "series": series}
+
+@router.get("/ruea/diff")
+@scheduler.offload("bulk")
+def ruea_diff(
+    resp: Response,
+    desde: str = Query(..., alias="from", description="versión base (data/archive/<ts>)"),
+    hasta: str = Query(..., alias="to", description="versión a comparar"),
+    estado: Literal["added", "removed", "changed"] | None = Query(None),
+    limit: int = Query(50, ge=1, le=1000),
+    offset: int = Query(0, ge=0),
+):
+    """Productores agregados/eliminados/cambiados (por documento) entre dos versiones publicadas."""
+    for v in (desde, hasta):
+        _version_or_404(v)
+        if not os.path.exists(diff.parquet_path(v)):
+            raise HTTPException(status_code=404, detail=f"parquet_not_found: {v}")
+    with scheduler.query_errors("diff"):
+        try:
+            resumen = diff.resumen(desde, hasta)
+            total, items = diff.detalle(desde, hasta, estado, limit, offset)
+        except ValueError as e:  # versión sin columna `documento`
+            raise HTTPException(status_code=422, detail=str(e))
+
+    # ambas versiones son inmutables: la respuesta se puede cachear por más tiempo
+    set_cache_headers(resp, version=f"{desde}..{hasta}", etag_source=f"{estado}:{limit}:{offset}",
+                      public_seconds=3600, shared_seconds=86400)
+    return {**resumen, "estado": estado, "total": total, "limit": limit, "offset": offset, "items": items}
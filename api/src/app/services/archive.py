@@ -0,0 +1,230 @@
+"""
+Almacén de versiones publicadas (data/archive/<ts>): deduplicación y retención.
+
+- Parquet y reportes de calidad se guardan por contenido en
+  `archive/.objects/<sha[:2]>/<sha256>` y cada versión tiene un hardlink, así
+  un archivo sin cambios entre versiones ocupa disco una sola vez.
+- Retención: se conservan las `ARCHIVE_KEEP_VERSIONS` más recientes o las de
+  menos de `ARCHIVE_KEEP_DAYS` días; la versión publicada y las fijadas
+  (archivo `.pinned` dentro de la versión) nunca se borran. Los objetos que
+  ya no enlaza ninguna versión se eliminan, y también los exports
+  (`DATA_DIR/exports/<versión>`) y perfiles (`DATA_DIR/profiles/<versión>.json`)
+  de versiones que ya no están.
+"""
+import hashlib
+import json
+import os
+import shutil
+from datetime import datetime, timezone
+
+from . import metrics, paths
+from ..core.config import settings
+
+OBJECTS = os.path.join(paths.ARCHIVE, ".objects")
+PIN_FILE = ".pinned"
+DEDUP_EXT = (".parquet", ".xlsx")
+
+
+def _sha256(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def dedupe_artifacts(version_dir: str) -> dict:
+    """Reemplaza Parquet/reportes de `version_dir` por hardlinks al almacén por contenido."""
+    stats = {"files": 0, "reused": 0, "bytes_reused": 0}
+    for root, _, files in os.walk(version_dir):
+        for name in files:
+            if not name.endswith(DEDUP_EXT):
+                continue
+            path = os.path.join(root, name)
+            digest = _sha256(path)
+            obj = os.path.join(OBJECTS, digest[:2], digest)
+            os.makedirs(os.path.dirname(obj), exist_ok=True)
+            stats["files"] += 1
+            try:
+                if os.path.exists(obj):
+                    tmp = path + ".lnk"
+                    os.link(obj, tmp)
+                    os.replace(tmp, path)
+                    stats["reused"] += 1
+                    stats["bytes_reused"] += os.path.getsize(obj)
+                else:
+                    os.link(path, obj)
+            except OSError:
+                # FS sin hardlinks: la versión conserva su copia
+                continue
+    return stats
+
+
+def list_versions() -> list[str]:
+    """Versiones archivadas de la más antigua a la más reciente (por fecha, no por nombre)."""
+    if not os.path.isdir(paths.ARCHIVE):
+        return []
+    names = [
+        n for n in os.listdir(paths.ARCHIVE)
+        if not n.startswith(".") and os.path.isdir(os.path.join(paths.ARCHIVE, n))
+    ]
+    # `legacy-*` y otros nombres sin fecha no deben quedar como "las más recientes"
+    return sorted(names, key=lambda v: (_version_time(v), v))
+
+
+def version_dir(version: str) -> str | None:
+    if not version or version.startswith(".") or os.sep in version or "/" in version:
+        return None
+    d = os.path.join(paths.ARCHIVE, version)
+    return d if os.path.isdir(d) else None
+
+
+def current_version() -> str | None:
+    cur = paths.current_dir()
+    if os.path.dirname(os.path.abspath(cur)) == os.path.abspath(paths.ARCHIVE):
+        return os.path.basename(cur)
+    return None
+
+
+def is_pinned(version: str) -> bool:
+    return os.path.exists(os.path.join(paths.ARCHIVE, version, PIN_FILE))
+
+
+def set_pinned(version: str, pinned: bool) -> bool:
+    d = version_dir(version)
+    if d is None:
+        return False
+    marker = os.path.join(d, PIN_FILE)
+    if pinned:
+        open(marker, "a").close()
+    elif os.path.exists(marker):
+        os.remove(marker)
+    return True
+
+
+def _parse_ts(ts) -> datetime | None:
+    try:
+        return datetime.strptime(str(ts)[:20], "%Y-%m-%dT%H-%M-%SZ").replace(tzinfo=timezone.utc)
+    except ValueError:
+        return None
+
+
+def _version_time(version: str) -> datetime:
+    """Fecha de la versión: su nombre (<ts>), si no `created_at` de su meta.json, si no el mtime de la carpeta."""
+    when = _parse_ts(version)
+    if when is not None:
+        return when
+    vdir = os.path.join(paths.ARCHIVE, version)
+    try:
+        with open(os.path.join(vdir, "meta.json"), "r", encoding="utf-8") as f:
+            when = _parse_ts(json.load(f).get("created_at"))
+    except (OSError, ValueError, AttributeError):
+        when = None
+    return when or datetime.fromtimestamp(os.path.getmtime(vdir), tz=timezone.utc)
+
+
+def _dir_size(path: str) -> int:
+    # bytes propios de la versión (hardlinks compartidos cuentan en cada una)
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                pass
+    return total
+
+
+def describe_versions() -> list[dict]:
+    cur = current_version()
+    return [
+        {
+            "version": v,
+            "current": v == cur,
+            "pinned": is_pinned(v),
+            "created_at": _version_time(v).isoformat(),
+            "bytes": _dir_size(os.path.join(paths.ARCHIVE, v)),
+        }
+        for v in reversed(list_versions())
+    ]
+
+
+def gc_objects() -> int:
+    """Borra objetos que sólo enlaza el almacén (ninguna versión los usa)."""
+    removed = 0
+    if not os.path.isdir(OBJECTS):
+        return 0
+    for root, _, files in os.walk(OBJECTS):
+        for name in files:
+            path = os.path.join(root, name)
+            try:
+                if os.stat(path).st_nlink <= 1:
+                    os.remove(path)
+                    removed += 1
+            except OSError:
+                pass
+    return removed
+
+
+def gc_exports() -> int:
+    """Borra las carpetas de exports de versiones que ya no están en el archivo."""
+    try:
+        dirs = os.listdir(paths.EXPORTS)
+    except OSError:
+        return 0
+    keep = set(list_versions())
+    removed = 0
+    for d in dirs:
+        if d not in keep:
+            shutil.rmtree(os.path.join(paths.EXPORTS, d), ignore_errors=True)
+            removed += 1
+    return removed
+
+
+def gc_profiles() -> int:
+    """Borra los perfiles posteriores al swap de versiones que ya no están en el archivo."""
+    try:
+        names = os.listdir(paths.PROFILES)
+    except OSError:
+        return 0
+    keep = set(list_versions())
+    removed = 0
+    for name in names:
+        if name.endswith(".json") and not name.startswith(".") and name[:-len(".json")] not in keep:
+            try:
+                os.remove(os.path.join(paths.PROFILES, name))
+                removed += 1
+            except OSError:
+                pass
+    return removed
+
+
+def apply_retention(keep_versions: int | None = None, keep_days: int | None = None) -> dict:
+    keep_versions = settings.ARCHIVE_KEEP_VERSIONS if keep_versions is None else keep_versions
+    keep_days = settings.ARCHIVE_KEEP_DAYS if keep_days is None else keep_days
+    now = datetime.now(timezone.utc)
+    cur = current_version()
+
+    versions = list_versions()
+    newest = set(versions[-keep_versions:]) if keep_versions > 0 else set()
+    removed = []
+    for v in versions:
+        if v == cur or v in newest or is_pinned(v):
+            continue
+        if keep_days > 0 and (now - _version_time(v)).days < keep_days:
+            continue
+        shutil.rmtree(os.path.join(paths.ARCHIVE, v), ignore_errors=True)
+        removed.append(v)
+    return {"removed": removed, "objects_removed": gc_objects(), "exports_removed": gc_exports(),
+            "profiles_removed": gc_profiles()}
+
+
+@metrics.collector
+def _families():
+    cur = current_version()
+    if cur is None:
+        return
+    yield ("data_version_info", "gauge", "Versión de datos publicada (valor constante 1).", [({"version": cur}, 1)])
+    age = (datetime.now(timezone.utc) - _version_time(cur)).total_seconds()
+    yield ("data_version_age_seconds", "gauge", "Antigüedad de la versión publicada.", [({}, round(age, 1))])
+    yield ("data_versions_archived", "gauge", "Versiones en data/archive.", [({}, len(list_versions()))])
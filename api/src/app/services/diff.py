@@ -0,0 +1,194 @@
+"""
+Diferencias RUEA entre dos versiones publicadas (data/archive/<ts>).
+
+Se leen los Parquet de ambas versiones en una conexión DuckDB en memoria y se
+comparan por `documento`:
+
+- agregados / eliminados: anti-join por `documento`;
+- cambiados: hash-join por `documento` con hash de fila distinto; la lista de
+  columnas cambiadas se calcula en la misma consulta (`IS DISTINCT FROM`).
+
+Solo se comparan las columnas presentes en ambas versiones. Filas sin
+documento se ignoran; si un documento se repite se toma una fila por hash
+(determinístico). Las versiones son inmutables, así que el diff de cada par
+queda materializado en un LRU de `MAX_PAIRS` conexiones. El candado del LRU
+solo cubre la búsqueda y la inserción: pares distintos se construyen en
+paralelo y requests simultáneas por el mismo par esperan una sola construcción.
+Un par que sale del LRU se cierra cuando termina la última página que lo lee.
+"""
+import contextlib
+import os
+import threading
+from collections import OrderedDict
+
+import duckdb
+
+from . import paths, scheduler
+from ..core.config import settings
+from .ruea_query import public_columns, quote_ident
+from .singleflight import SingleFlight
+
+KEY = "documento"
+ESTADOS = ("added", "removed", "changed")
+MAX_PAIRS = 8
+
+
+class _Pair:
+    """Diff materializado de un par: conexión con la tabla `diff`, resumen y SQL de cada lado."""
+    __slots__ = ("con", "resumen", "sides", "readers", "evicted")
+
+    def __init__(self, con: duckdb.DuckDBPyConnection, resumen: dict, sides: tuple):
+        self.con = con
+        self.resumen = resumen
+        self.sides = sides
+        self.readers = 0  # páginas leyendo de `con` (bajo `_lock`)
+        self.evicted = False
+
+
+# (from, to) → par materializado
+_pairs: "OrderedDict[tuple[str, str], _Pair]" = OrderedDict()
+_lock = threading.Lock()
+_building = SingleFlight(wait=scheduler.wait, abandoned=scheduler.cancelled)
+
+
+def parquet_path(version: str) -> str:
+    return os.path.join(paths.ARCHIVE, version, "parquet", "ruea.parquet")
+
+
+def _side_sql(path: str, cols: list[str], extra: str = "") -> str:
+    sel = ", ".join(quote_ident(c) for c in [KEY] + cols)
+    h = f"hash({', '.join(quote_ident(c) for c in cols)})" if cols else "0"
+    return f"""
+        SELECT {sel}, {h} AS _h
+        FROM read_parquet('{path}')
+        WHERE NULLIF(TRIM(CAST({KEY} AS VARCHAR)), '') IS NOT NULL {extra}
+        QUALIFY ROW_NUMBER() OVER (PARTITION BY {KEY} ORDER BY _h) = 1
+    """
+
+
+def _build(desde: str, hasta: str) -> _Pair:
+    pa, pb = (parquet_path(v).replace("\\", "/").replace("'", "''") for v in (desde, hasta))
+    # trabajo masivo: mismos hilos que la clase `bulk`
+    threads = settings.DUCK_THREADS_BULK
+    con = scheduler.track(duckdb.connect(config={"threads": threads} if threads > 0 else {}))
+    ca = public_columns(con.sql(f"SELECT * FROM read_parquet('{pa}')").columns)
+    cb = public_columns(con.sql(f"SELECT * FROM read_parquet('{pb}')").columns)
+    if KEY not in ca or KEY not in cb:
+        raise ValueError(f"missing_column: {KEY}")
+    comunes = [c for c in ca if c in cb and c != KEY]
+
+    con.execute(f"CREATE TEMP VIEW a AS {_side_sql(pa, comunes)}")
+    con.execute(f"CREATE TEMP VIEW b AS {_side_sql(pb, comunes)}")
+    cambios = ", ".join(
+        f"CASE WHEN a.{quote_ident(c)} IS DISTINCT FROM b.{quote_ident(c)} THEN '{c}' END" for c in comunes
+    ) or "NULL"
+    con.execute(f"""
+        CREATE TABLE diff AS
+        SELECT {KEY}, 'added' AS estado, []::VARCHAR[] AS cambios, NULL::UBIGINT AS h_from, _h AS h_to
+        FROM b ANTI JOIN a USING ({KEY})
+        UNION ALL
+        SELECT {KEY}, 'removed', []::VARCHAR[], _h, NULL::UBIGINT
+        FROM a ANTI JOIN b USING ({KEY})
+        UNION ALL
+        SELECT a.{KEY}, 'changed', list_filter([{cambios}], x -> x IS NOT NULL), a._h, b._h
+        FROM a JOIN b USING ({KEY})
+        WHERE a._h <> b._h
+        ORDER BY 1
+    """)
+
+    totales = dict(con.execute("SELECT estado, COUNT(*) FROM diff GROUP BY 1").fetchall())
+    por_columna = dict(con.execute("""
+        SELECT c, COUNT(*) FROM (SELECT unnest(cambios) AS c FROM diff WHERE estado = 'changed')
+        GROUP BY 1 ORDER BY 2 DESC, 1
+    """).fetchall())
+    total_to = con.execute("SELECT COUNT(*) FROM b").fetchone()[0]
+    resumen = {
+        "from": desde,
+        "to": hasta,
+        **{e: int(totales.get(e, 0)) for e in ESTADOS},
+        "unchanged": int(total_to - totales.get("added", 0) - totales.get("changed", 0)),
+        "columnas": {c: int(n) for c, n in por_columna.items()},
+        "columnas_agregadas": [c for c in cb if c not in ca],
+        "columnas_eliminadas": [c for c in ca if c not in cb],
+    }
+    return _Pair(con, resumen, (pa, pb, comunes))
+
+
+def _insert(key: tuple[str, str], entry: _Pair) -> _Pair:
+    closing = []
+    with _lock:
+        _pairs[key] = entry
+        while len(_pairs) > MAX_PAIRS:
+            old = _pairs.popitem(last=False)[1]
+            old.evicted = True
+            if old.readers == 0:  # si no, la cierra la última página que la lee
+                closing.append(old)
+    for old in closing:
+        old.con.close()
+    return entry
+
+
+def _pair(desde: str, hasta: str) -> _Pair:
+    key = (desde, hasta)
+    with _lock:
+        if key in _pairs:
+            _pairs.move_to_end(key)
+            return _pairs[key]
+    return _building.do(key, lambda: _insert(key, _build(desde, hasta)))
+
+
+@contextlib.contextmanager
+def _reading(desde: str, hasta: str):
+    """Par materializado que no se cierra mientras dure el bloque aunque salga del LRU."""
+    while True:
+        entry = _pair(desde, hasta)
+        with _lock:
+            if not entry.evicted:
+                entry.readers += 1
+                break
+        # salió del LRU (y pudo cerrarse) entre la construcción y la lectura: otra vuelta
+    try:
+        yield entry
+    finally:
+        with _lock:
+            entry.readers -= 1
+            close = entry.evicted and entry.readers == 0
+        if close:
+            entry.con.close()
+
+
+def resumen(desde: str, hasta: str) -> dict:
+    return _pair(desde, hasta).resumen
+
+
+def detalle(desde: str, hasta: str, estado: str | None = None, limit: int = 50, offset: int = 0) -> tuple[int, list[dict]]:
+    """Página de documentos con cambios; `antes`/`despues` traen la fila (o solo las columnas cambiadas)."""
+    # solo se releen del Parquet los documentos de la página
+    en_pagina = f"AND {KEY} IN (SELECT {KEY} FROM page)"
+    where, binds = ("WHERE estado = ?", [estado]) if estado else ("", [])
+    with _reading(desde, hasta) as pair:
+        pa, pb, comunes = pair.sides
+        cur = scheduler.track(pair.con.cursor())
+        try:
+            total = cur.execute(f"SELECT COUNT(*) FROM diff {where}", binds).fetchone()[0]
+            rows = cur.execute(f"""
+                WITH page AS (SELECT * FROM diff {where} ORDER BY {KEY}, estado LIMIT ? OFFSET ?)
+                SELECT p.{KEY}, p.estado, p.cambios, a AS antes, b AS despues
+                FROM page p
+                LEFT JOIN ({_side_sql(pa, comunes, en_pagina)}) a ON a.{KEY} = p.{KEY} AND a._h = p.h_from
+                LEFT JOIN ({_side_sql(pb, comunes, en_pagina)}) b ON b.{KEY} = p.{KEY} AND b._h = p.h_to
+                ORDER BY p.{KEY}, p.estado
+            """, binds + [limit, offset]).fetchall()
+        finally:
+            cur.close()
+
+    items = []
+    for doc, est, cambios, antes, despues in rows:
+        # el lado sin fila llega como struct de nulos
+        antes = None if est == "added" else {k: v for k, v in antes.items() if k != "_h"}
+        despues = None if est == "removed" else {k: v for k, v in despues.items() if k != "_h"}
+        if est == "changed":
+            antes = {c: antes[c] for c in cambios}
+            despues = {c: despues[c] for c in cambios}
+        items.append({KEY: doc, "estado": est, "cambios": list(cambios), "antes": antes, "despues": despues})
+    return int(total), items
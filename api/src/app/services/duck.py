@@ -1,17 +1,160 @@
+import os
+import threading
+import time
+import weakref
+from collections import OrderedDict
 import duckdb
 from . import paths
 from ..core.config import settings
 
+class _VersionConn:
+    """Conexión a una versión (archivada o instancia `bulk`), con su último uso y los cursores que entregó."""
+    __slots__ = ("con", "used", "cursors")
+
+    def __init__(self, con):
+        self.con = con
+        self.used = time.monotonic()
+        self.cursors = weakref.WeakSet()  # vivos mientras alguna request los use
+
+    def idle(self) -> bool:
+        return not self.cursors
+
+
 class Duck:
     _rw = None
     _ro = None
+    _ro_path = None
+    _lock = threading.Lock()
+    # versiones archivadas: version → conexión; LRU con expiración por inactividad. Al
+    # salir del LRU se cierran, o pasan a `_retired` hasta que terminen sus cursores
+    _versions: "OrderedDict[str, _VersionConn]" = OrderedDict()
+    _retired: "list[_VersionConn]" = []
+    _versions_lock = threading.Lock()
+    _sweeper: threading.Thread | None = None
+    # instancias DuckDB de la clase `bulk` (hilos propios): ruta de la base → conexión con ATTACH;
+    # las que salen del LRU se retiran igual que las de `_versions`
+    _bulk: "OrderedDict[str, _VersionConn]" = OrderedDict()
+    _bulk_lock = threading.Lock()
+
+    @staticmethod
+    def connect_ro(path: str):
+        """Conexión read-only de la clase `interactive`.
+
+        DuckDB no admite abrir el mismo archivo con configuraciones distintas en un
+        proceso: toda apertura read-only de un snapshot debe pasar por aquí.
+        """
+        threads = settings.DUCK_THREADS_INTERACTIVE
+        return duckdb.connect(path, read_only=True, config={"threads": threads} if threads > 0 else {})
 
     @classmethod
     def ro(cls):
-        if cls._ro is None:
-            cls._ro = duckdb.connect(settings.DB_PATH, read_only=True)
+        # el puntero `current` se resuelve en cada llamada; si cambió de versión
+        # se abre una conexión nueva (las requests en curso conservan la anterior)
+        path = paths.current_db_path()
+        if cls._ro is None or cls._ro_path != path:
+            with cls._lock:
+                if cls._ro is None or cls._ro_path != path:
+                    cls._ro = cls.connect_ro(path)
+                    cls._ro_path = path
         return cls._ro
 
+    @classmethod
+    def adopt(cls, con, path: str | None = None):
+        """Usa `con` (ya abierta y caliente, p.ej. la del warm-up) como conexión del snapshot actual."""
+        with cls._lock:
+            cls._ro = con
+            cls._ro_path = path or paths.current_db_path()
+
+    @classmethod
+    def for_version(cls, version: str):
+        """Cursor read-only sobre data/archive/<version>; la conexión se abre bajo demanda."""
+        with cls._versions_lock:
+            entry = cls._versions.pop(version, None)
+            if entry is None:
+                path = os.path.join(paths.ARCHIVE, version, "duckdb.db")
+                entry = _VersionConn(cls.connect_ro(path))
+            entry.used = time.monotonic()
+            cls._versions[version] = entry
+            cur = entry.con.cursor()
+            entry.cursors.add(cur)
+            while len(cls._versions) > max(1, settings.ARCHIVE_MAX_CONNECTIONS):
+                cls._retire(cls._versions.popitem(last=False)[1])  # la menos usada
+            cls._start_sweeper()
+        return cur
+
+    @classmethod
+    def bulk(cls, version: str | None = None):
+        """
+        Cursor para trabajo `bulk` (descargas, exports): instancia DuckDB separada,
+        limitada a `DUCK_THREADS_BULK` hilos, que adjunta el snapshot en read-only.
+        """
+        path = os.path.join(paths.ARCHIVE, version, "duckdb.db") if version else paths.current_db_path()
+        evicted = []
+        with cls._bulk_lock:
+            entry = cls._bulk.pop(path, None)
+            if entry is None:
+                threads = settings.DUCK_THREADS_BULK
+                con = duckdb.connect(config={"threads": threads} if threads > 0 else {})
+                con.execute(f"ATTACH '{path.replace(chr(39), chr(39) * 2)}' AS snap (READ_ONLY)")
+                entry = _VersionConn(con)
+            entry.used = time.monotonic()
+            cls._bulk[path] = entry
+            cur = entry.con.cursor()
+            entry.cursors.add(cur)
+            while len(cls._bulk) > 2:
+                evicted.append(cls._bulk.popitem(last=False)[1])
+        if evicted:
+            with cls._versions_lock:
+                for e in evicted:
+                    cls._retire(e)
+                cls._start_sweeper()
+        cur.execute("USE snap")
+        return cur
+
+    @classmethod
+    def cursor(cls, version: str | None = None, kind: str = "interactive"):
+        """Cursor propio (interrumpible) sobre `version` (None = la publicada) de la clase `kind`."""
+        if kind == "bulk":
+            return cls.bulk(version)
+        return cls.for_version(version) if version else cls.ro().cursor()
+
+    @classmethod
+    def _retire(cls, entry: _VersionConn):
+        # cerrar la conexión rompe sus cursores: si alguno sigue en uso, se cierra después
+        if entry.idle():
+            entry.con.close()
+        else:
+            cls._retired.append(entry)
+
+    @classmethod
+    def sweep(cls, now: float | None = None) -> int:
+        """Cierra las conexiones sin uso hace `ARCHIVE_CONN_IDLE_SECONDS` y las retiradas ya libres."""
+        now = time.monotonic() if now is None else now
+        ttl = settings.ARCHIVE_CONN_IDLE_SECONDS
+        with cls._versions_lock:
+            for v in [v for v, e in cls._versions.items() if now - e.used > ttl and e.idle()]:
+                cls._retire(cls._versions.pop(v))
+            closed = [e for e in cls._retired if e.idle()]
+            cls._retired = [e for e in cls._retired if not e.idle()]
+        for e in closed:
+            e.con.close()
+        return len(closed)
+
+    @classmethod
+    def _start_sweeper(cls):
+        # hilo daemon: la expiración no depende de que llegue otra request a una versión archivada
+        if cls._sweeper is not None:
+            return
+        interval = max(1.0, settings.ARCHIVE_CONN_IDLE_SECONDS / 4)
+
+        def loop():
+            while True:
+                time.sleep(interval)
+                cls.sweep()
+
+        cls._sweeper = threading.Thread(target=loop, name="duck-sweeper", daemon=True)
+        cls._sweeper.start()
+
     @classmethod
     def rw(cls, db_path: str | None = None):
         if cls._rw is None:
@@ -0,0 +1,212 @@
+"""
+Controles de identidad RUEA al publicar: duplicados en la hoja y cambios de
+identidad respecto de la versión publicada anterior.
+
+Todo corre en DuckDB sobre los Parquet (el de staging y el de la versión
+anterior), sin pasar por pandas. Cada fila se reduce a dos claves hash
+(`UBIGINT`):
+
+- `kdoc`: `documento` normalizado (minúsculas, sin puntos/guiones/espacios ni
+  el `.0` que deja Excel en los números);
+- `kid`: nombre normalizado (`nombres` + `apellidos` sin tildes ni
+  puntuación) + corregimiento + vereda canónicos del gazetteer.
+
+y los controles son group-by y hash-joins sobre esas claves:
+
+- `documento_repetido`: el mismo documento en más de una fila de la hoja
+  (`campos`: qué datos de identidad difieren entre esas filas);
+- `misma_persona`: mismo nombre y territorio con documentos distintos;
+- `identidad_cambiada`: documento que ya estaba publicado con otro nombre o
+  territorio (`detalle`: antes → ahora);
+- `documento_cambiado`: productor nuevo cuyo nombre y territorio coinciden con
+  un único documento de la versión anterior que ya no aparece.
+
+El resultado queda en la tabla `dup_ruea` de la versión (una fila por fila
+de la hoja implicada; `fila` es la posición 0-based en la hoja, como `index`
+en la hoja `errores` del reporte de calidad) y en el reporte de calidad.
+"""
+import os
+
+from .gazetteer import GAZ_TABLE, TERRITORIOS
+from .textnorm import NORMALIZADORES
+
+DUP_TABLE = "dup_ruea"
+TIPOS = ("documento_repetido", "misma_persona", "identidad_cambiada", "documento_cambiado")
+REPORT_MAX_ROWS = 100_000      # filas de `dup_ruea` que se copian al reporte Excel
+_EMPTY = "('', 'nan', 'none', 'null', 'nat')"   # lo que deja `astype(str)` de pandas en celdas vacías
+
+
+def _side_sql(pq: str, cols: set[str]) -> str:
+    """Fila → (fila, documento, doc, nom, corregimiento, vereda) normalizados."""
+    def txt(c: str) -> str:
+        if c not in cols:
+            return "NULL::VARCHAR"
+        return f"trim(regexp_replace(strip_accents(lower(CAST(s.\"{c}\" AS VARCHAR))), '[^a-z0-9]+', ' ', 'g'))"
+
+    terr = ", ".join(
+        f"CASE WHEN t_{t}.nombre IN {_EMPTY} THEN NULL ELSE t_{t}.nombre END AS {t}" if t in cols
+        else f"NULL::VARCHAR AS {t}"
+        for t in TERRITORIOS
+    )
+    joins = " ".join(
+        f"LEFT JOIN _terr t_{t} ON t_{t}.tipo = '{t}' AND t_{t}.raw = COALESCE(CAST(s.\"{t}\" AS VARCHAR), '')"
+        for t in TERRITORIOS if t in cols
+    )
+    return f"""
+        SELECT fila, documento,
+               CASE WHEN doc IN {_EMPTY} THEN NULL ELSE doc END AS doc,
+               NULLIF(concat_ws(' ', CASE WHEN n1 IN {_EMPTY} THEN NULL ELSE n1 END,
+                                     CASE WHEN n2 IN {_EMPTY} THEN NULL ELSE n2 END), '') AS nom,
+               {', '.join(TERRITORIOS)}
+        FROM (
+            SELECT fila, documento, regexp_replace(CASE WHEN suffix(d, '.0') THEN d[:-3] ELSE d END,
+                                                   '[^0-9a-z]+', '', 'g') AS doc,
+                   n1, n2, {', '.join(TERRITORIOS)}
+            FROM (
+                SELECT s.file_row_number AS fila, CAST(s.documento AS VARCHAR) AS documento,
+                       lower(trim(CAST(s.documento AS VARCHAR))) AS d,
+                       {txt("nombres")} AS n1, {txt("apellidos")} AS n2, {terr}
+                FROM read_parquet('{pq}', file_row_number = true) s {joins}
+            )
+        )
+    """
+
+
+def _load_side(con, name: str, pq: str):
+    """Tabla temporal `name` (filas con sus claves) y `name_rep` (documentos repetidos y cuántas veces)."""
+    cols = set(con.sql(f"SELECT * FROM read_parquet('{pq}')").columns)
+    con.execute(f"""
+        CREATE OR REPLACE TEMP TABLE {name} AS
+        SELECT *, CASE WHEN doc IS NOT NULL THEN hash(doc) END AS kdoc,
+               CASE WHEN nom IS NOT NULL THEN hash(nom, {', '.join(TERRITORIOS)}) END AS kid
+        FROM ({_side_sql(pq, cols)});
+
+        -- hash-aggregate sobre el entero (sin ventanas ni ordenar): casi todos los grupos son de 1
+        CREATE OR REPLACE TEMP TABLE {name}_rep AS
+        SELECT kdoc, COUNT(*) AS n FROM {name} WHERE kdoc IS NOT NULL GROUP BY kdoc HAVING COUNT(*) > 1;
+    """)
+
+
+def _territory_map(con, prev_pq: str | None):
+    """
+    `_terr` (tipo, raw, nombre): el gazetteer de la versión nueva más las
+    escrituras que solo tiene la anterior, normalizadas con el mismo `textnorm`.
+    """
+    con.execute(f"CREATE OR REPLACE TEMP TABLE _terr AS SELECT tipo, raw, nombre FROM {GAZ_TABLE};")
+    if prev_pq is None:
+        return
+    cols = set(con.sql(f"SELECT * FROM read_parquet('{prev_pq}')").columns)
+    for tipo in (t for t in TERRITORIOS if t in cols):
+        raws = [r[0] for r in con.execute(f"""
+            SELECT DISTINCT COALESCE(CAST("{tipo}" AS VARCHAR), '') AS raw FROM read_parquet('{prev_pq}')
+            EXCEPT SELECT raw FROM _terr WHERE tipo = '{tipo}'
+        """).fetchall()]
+        if raws:
+            norm = NORMALIZADORES[tipo]
+            con.executemany("INSERT INTO _terr VALUES (?, ?, ?)", [[tipo, raw, norm(raw)] for raw in raws])
+
+
+def _diff_terms(a: str, b: str) -> tuple[str, str]:
+    """(lista de campos distintos, texto `campo: antes → ahora`) entre los alias `a` y `b`."""
+    fields = [("nombre", "nom")] + [(t, t) for t in TERRITORIOS]
+    campos = ", ".join(f"CASE WHEN {a}.{c} IS DISTINCT FROM {b}.{c} THEN '{f}' END" for f, c in fields)
+    detalle = ", ".join(
+        f"CASE WHEN {a}.{c} IS DISTINCT FROM {b}.{c} "
+        f"THEN '{f}: ' || COALESCE({a}.{c}, '∅') || ' → ' || COALESCE({b}.{c}, '∅') END"
+        for f, c in fields
+    )
+    return f"list_filter([{campos}], x -> x IS NOT NULL)", f"concat_ws('; ', {detalle})"
+
+
+def build_duplicates(con, pq_path: str, prev_pq: str | None = None) -> dict:
+    """
+    Crea `dup_ruea` con los controles de la hoja `pq_path` (y contra `prev_pq`,
+    el Parquet de la versión anterior, si se da). Requiere `gaz_territorio`.
+    Devuelve filas por tipo.
+    """
+    con.execute(f"""
+        CREATE OR REPLACE TABLE {DUP_TABLE} (
+            tipo VARCHAR, grupo UBIGINT, fila BIGINT, documento VARCHAR,
+            documento_previo VARCHAR, campos VARCHAR[], detalle VARCHAR
+        );
+    """)
+    pq = pq_path.replace("\\", "/").replace("'", "''")
+    if "documento" not in con.sql(f"SELECT * FROM read_parquet('{pq}')").columns:
+        return {t: 0 for t in TIPOS}
+    prev = None
+    if prev_pq and os.path.exists(prev_pq):
+        prev = prev_pq.replace("\\", "/").replace("'", "''")
+        if "documento" not in con.sql(f"SELECT * FROM read_parquet('{prev}')").columns:
+            prev = None
+
+    _territory_map(con, prev)
+    _load_side(con, "_cur", pq)
+    campos_g = ", ".join(
+        f"CASE WHEN COUNT(DISTINCT COALESCE(c.{c}, '')) > 1 THEN '{f}' END"
+        for f, c in [("nombre", "nom")] + [(t, t) for t in TERRITORIOS]
+    )
+    territorio = ", ".join(f"c.{t}" for t in TERRITORIOS)
+    con.execute(f"""
+        INSERT INTO {DUP_TABLE}
+        WITH g AS (
+            SELECT kdoc, list_filter([{campos_g}], x -> x IS NOT NULL) AS campos
+            FROM _cur c SEMI JOIN _cur_rep USING (kdoc) GROUP BY kdoc
+        )
+        SELECT 'documento_repetido', c.kdoc, c.fila, c.documento, NULL, g.campos, r.n || ' filas'
+        FROM _cur c JOIN _cur_rep r USING (kdoc) JOIN g USING (kdoc);
+
+        INSERT INTO {DUP_TABLE}
+        WITH g AS (
+            SELECT kid FROM _cur WHERE kid IS NOT NULL AND kdoc IS NOT NULL
+            GROUP BY kid HAVING MIN(kdoc) <> MAX(kdoc)
+        )
+        SELECT 'misma_persona', c.kid, c.fila, c.documento, NULL, []::VARCHAR[],
+               concat_ws(' | ', c.nom, {territorio})
+        FROM _cur c JOIN g USING (kid) WHERE c.kdoc IS NOT NULL;
+    """)
+
+    if prev is not None:
+        _load_side(con, "_prev", prev)
+        campos, detalle = _diff_terms("p", "c")
+        con.execute(f"""
+            -- documentos únicos en cada versión (los repetidos ya salen como documento_repetido)
+            CREATE OR REPLACE TEMP VIEW _cur1 AS
+            SELECT * FROM _cur WHERE kdoc IS NOT NULL AND kdoc NOT IN (SELECT kdoc FROM _cur_rep);
+            CREATE OR REPLACE TEMP VIEW _prev1 AS
+            SELECT * FROM _prev WHERE kdoc IS NOT NULL AND kdoc NOT IN (SELECT kdoc FROM _prev_rep);
+
+            INSERT INTO {DUP_TABLE}
+            SELECT 'identidad_cambiada', c.kdoc, c.fila, c.documento, NULL, {campos}, {detalle}
+            FROM _cur1 c JOIN _prev1 p USING (kdoc)
+            WHERE c.kid IS DISTINCT FROM p.kid;
+
+            -- altas y bajas con la misma identidad: un único candidato de cada lado
+            INSERT INTO {DUP_TABLE}
+            WITH altas AS (
+                SELECT c.* FROM _cur1 c ANTI JOIN _prev p USING (kdoc) WHERE c.kid IS NOT NULL
+            ), bajas AS (
+                SELECT p.* FROM _prev1 p ANTI JOIN _cur c USING (kdoc) WHERE p.kid IS NOT NULL
+            ), unicos AS (
+                SELECT kid FROM altas GROUP BY kid HAVING COUNT(*) = 1
+                INTERSECT
+                SELECT kid FROM bajas GROUP BY kid HAVING COUNT(*) = 1
+            )
+            SELECT 'documento_cambiado', c.kid, c.fila, c.documento, b.documento, ['documento'],
+                   concat_ws(' | ', c.nom, {territorio})
+            FROM altas c JOIN unicos USING (kid) JOIN bajas b USING (kid);
+
+            DROP VIEW _cur1; DROP VIEW _prev1; DROP TABLE _prev; DROP TABLE _prev_rep;
+        """)
+    con.execute("DROP TABLE _cur; DROP TABLE _cur_rep; DROP TABLE _terr;")
+    counts = dict(con.execute(f"SELECT tipo, COUNT(*) FROM {DUP_TABLE} GROUP BY 1").fetchall())
+    return {t: int(counts.get(t, 0)) for t in TIPOS}
+
+
+def report_df(con, limit: int = REPORT_MAX_ROWS):
+    """Filas de `dup_ruea` para el reporte de calidad (las primeras `limit`, por tipo y grupo)."""
+    return con.execute(f"""
+        SELECT tipo, fila, documento, documento_previo, array_to_string(campos, ', ') AS campos, detalle
+        FROM {DUP_TABLE}
+        ORDER BY array_position({list(TIPOS)}, tipo), grupo, fila
+        LIMIT {int(limit)}
+    """).df()
@@ -0,0 +1,501 @@
+"""
+Motor de consultas compartido entre workers (opcional: `QUERY_ENGINE_SOCKET`).
+
+Con `uvicorn --workers=N` cada worker abre su propia conexión DuckDB al
+snapshot: N buffer pools, N cachés de resultados y N warm-ups (y al publicar
+solo se calienta el worker que ejecutó el refresh). En modo motor un único
+proceso (`python -m app.services.engine`) es dueño del snapshot, de las
+conexiones a versiones archivadas, de la instancia `bulk` y de la caché de
+resultados; los workers solo atienden HTTP y le hablan por un socket Unix.
+
+Protocolo: una conexión al socket es una sesión con un cursor DuckDB propio
+en el motor. Cada pedido es una línea JSON `{"op": ...}` y cada respuesta otra
+(`{"ok": true, ...}` o `{"ok": false, "error", "message"}`), seguida, si trae
+`"arrow": true`, del resultado como stream Arrow IPC (schema, batches y marca
+de fin: se autodelimita). Operaciones:
+
+- `open {version, kind}`: abre el cursor de la sesión (`interactive`/`bulk`);
+- `execute {sql, params}`: ejecuta y devuelve las filas en Arrow;
+- `profile`: perfil JSON de DuckDB de la última consulta de la sesión;
+- `cached {endpoint, version, params, timeout}`: facetas/stats con la caché y
+  el single-flight del motor (el resultado ya armado viaja como JSON), dentro
+  del plazo que le queda a la request;
+- `interrupt {session}`: interrumpe la consulta (o la espera) en curso de otra sesión;
+- `warm {db_path, version}` / `adopt {version}`: warm-up de la versión en
+  staging antes del swap y adopción de esa conexión después (ETL);
+- `stats`: sesiones, consultas, caché y RSS del motor.
+
+Del lado del worker, `cursor()` devuelve un `RemoteCursor` con la parte de la
+interfaz de cursor DuckDB que usan los routers (`execute`, `fetch*`,
+`description`, `table`, `interrupt`...); también `cached()` pasa por una
+sesión registrada con `scheduler.track`, así un timeout o una desconexión
+interrumpen la consulta en el motor. Cada pedido espera la respuesta a lo
+sumo el plazo que le queda a la request (más `GRACE_SECONDS`). El ETL (staging, prerender) y
+`/diff` siguen corriendo en el worker. Si el motor no responde, las requests
+fallan con 503 (`query_engine_unavailable`): no se vuelve a conexiones
+locales, que duplicarían otra vez la memoria.
+"""
+import itertools
+import logging
+import os
+import signal
+import socket
+import socketserver
+import threading
+import time
+from types import SimpleNamespace
+from typing import Any
+
+import duckdb
+import orjson
+from fastapi import HTTPException
+from fastapi.encoders import jsonable_encoder
+
+from ..core.config import settings
+from . import paths, scheduler, views, warmup
+from .duck import Duck
+from .result_cache import results
+from .stages import rss_bytes
+
+log = logging.getLogger(__name__)
+
+BATCH_ROWS = 64 * 1024   # filas por record batch del stream Arrow
+# margen sobre el plazo de la request al esperar al motor: deja llegar la respuesta del `interrupt`
+GRACE_SECONDS = 1.0
+
+_serving = False         # True dentro del proceso motor
+_arrow_con = None
+_arrow_lock = threading.Lock()
+
+
+class EngineError(RuntimeError):
+    """Error de una consulta ejecutada en el motor (tipo y mensaje de la excepción original)."""
+
+
+def enabled() -> bool:
+    """Este proceso delega las consultas al motor (hay socket y no es el motor)."""
+    return bool(settings.QUERY_ENGINE_SOCKET) and not _serving
+
+
+def _dumps(obj) -> bytes:
+    return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS) + b"\n"
+
+
+# --- cliente (workers) ---------------------------------------------------------
+
+class _Conn:
+    """Conexión al socket del motor: pedido JSON → respuesta JSON (+ tabla Arrow)."""
+
+    def __init__(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            self.sock.connect(settings.QUERY_ENGINE_SOCKET)
+        except OSError as e:
+            self.sock.close()
+            log.warning("query engine unavailable (%s): %s", settings.QUERY_ENGINE_SOCKET, e)
+            raise scheduler.Overloaded("query_engine", "unavailable") from e
+        self.rfile = self.sock.makefile("rb")
+        self.wfile = self.sock.makefile("wb")
+
+    def call(self, op: str, **kw) -> tuple[dict, Any]:
+        import pyarrow as pa
+
+        budget = scheduler.remaining()
+        try:
+            self.sock.settimeout(None if budget is None else budget + GRACE_SECONDS)
+            self.wfile.write(_dumps({"op": op, **kw}))
+            self.wfile.flush()
+            line = self.rfile.readline()
+            if not line:
+                raise ConnectionResetError("el motor cerró la conexión")
+            head = orjson.loads(line)
+            table = pa.ipc.open_stream(self.rfile).read_all() if head.get("arrow") else None
+        except TimeoutError as e:
+            # el motor no contestó dentro del plazo de la request
+            self.close()
+            raise scheduler.Cancelled("query_timeout") from e
+        except (OSError, ValueError, pa.ArrowInvalid) as e:
+            # motor reiniciado o consulta cortada a mitad del stream: la sesión no sirve más
+            self.close()
+            raise scheduler.Overloaded("query_engine", "unavailable") from e
+        if not head["ok"]:
+            if "cancelled" in head:
+                raise scheduler.Cancelled(head["cancelled"])
+            if "status" in head:
+                raise HTTPException(status_code=head["status"], detail=head["detail"])
+            raise EngineError(f"{head['error']}: {head['message']}")
+        return head, table
+
+    def close(self):
+        for f in (self.rfile, self.wfile, self.sock):
+            try:
+                f.close()
+            except OSError:
+                pass
+
+
+def _local():
+    """Instancia DuckDB en memoria del worker, solo para convertir resultados Arrow a pandas."""
+    global _arrow_con
+    if _arrow_con is None:
+        with _arrow_lock:
+            if _arrow_con is None:
+                _arrow_con = duckdb.connect(config={"threads": 1})
+    return _arrow_con
+
+
+def _rows(tbl) -> list[tuple]:
+    """Filas de una tabla Arrow con los tipos Python que da `fetchall` de DuckDB."""
+    import pyarrow as pa
+
+    cols = []
+    for col in tbl.columns:
+        vals = col.to_pylist()
+        if pa.types.is_map(col.type):  # Arrow: lista de pares; DuckDB: dict
+            vals = [None if v is None else dict(v) for v in vals]
+        elif pa.types.is_decimal(col.type) and col.type.precision == 38 and col.type.scale == 0:
+            vals = [None if v is None else int(v) for v in vals]  # HUGEINT (p. ej. SUM de enteros)
+        cols.append(vals)
+    return list(zip(*cols))
+
+
+def _oneshot(op: str, **kw) -> dict:
+    conn = _Conn()
+    try:
+        return conn.call(op, **kw)[0]
+    finally:
+        conn.close()
+
+
+class RemoteCursor:
+    """
+    Cursor DuckDB que vive en el motor (una sesión del socket, abierta con el
+    primer `execute`). El resultado llega entero en Arrow; `fetch*` lo recorren.
+    """
+
+    def __init__(self, version: str | None = None, kind: str = "interactive"):
+        self._version = version
+        self._kind = kind
+        self._conn: _Conn | None = None
+        self._session: int | None = None
+        self._result = None  # pa.Table de la última consulta
+        self._pos = 0
+        self._interrupted = False
+
+    def _call(self, op: str, **kw) -> tuple[dict, Any]:
+        if self._interrupted:  # interrumpido antes de abrir la sesión
+            raise scheduler.Cancelled("interrupted")
+        if self._conn is None:
+            conn = _Conn()
+            head, _ = conn.call("open", version=self._version, kind=self._kind)
+            self._conn, self._session = conn, head["session"]
+        return self._conn.call(op, **kw)
+
+    def execute(self, query: str, parameters=None):
+        _, self._result = self._call("execute", sql=query, params=parameters)
+        self._pos = 0
+        return self
+
+    def _rest(self):
+        if self._result is None:
+            raise EngineError("InvalidInputException: no hay una consulta ejecutada")
+        part = self._result.slice(self._pos)
+        self._pos = self._result.num_rows
+        return part
+
+    def _take(self, n: int) -> list[tuple]:
+        if self._result is None:
+            raise EngineError("InvalidInputException: no hay una consulta ejecutada")
+        part = self._result.slice(self._pos, n)
+        self._pos += part.num_rows
+        return _rows(part)
+
+    def fetchall(self) -> list[tuple]:
+        return _rows(self._rest())
+
+    def fetchmany(self, size: int = 1) -> list[tuple]:
+        return self._take(size)
+
+    def fetchone(self) -> tuple | None:
+        rows = self._take(1)
+        return rows[0] if rows else None
+
+    def fetch_df(self, *args, **kwargs):
+        # con la conversión de DuckDB (enteros con nulos como Int32, DECIMAL → float64...), no la de pyarrow
+        return _local().cursor().from_arrow(self._rest()).df()
+
+    df = fetchdf = fetch_df
+
+    def fetch_arrow_table(self, *args, **kwargs):
+        return self._rest()
+
+    @property
+    def description(self) -> list[tuple] | None:
+        if self._result is None:
+            return None
+        return [(f.name, str(f.type), None, None, None, None, None) for f in self._result.schema]
+
+    def table(self, name: str) -> SimpleNamespace:
+        """Solo `.columns` (lo que usan `safe_columns` y compañía)."""
+        _, tbl = self._call("execute", sql=f"SELECT * FROM {name} LIMIT 0")
+        return SimpleNamespace(columns=tbl.schema.names)
+
+    def get_profiling_information(self, format: str = "json") -> str:
+        return self._call("profile")[0]["value"]
+
+    def cached(self, endpoint: str, params: dict) -> Any:
+        return self._call("cached", endpoint=endpoint, version=self._version, params=params,
+                          timeout=scheduler.remaining())[0]["value"]
+
+    def cursor(self) -> "RemoteCursor":
+        return RemoteCursor(self._version, self._kind)
+
+    def interrupt(self):
+        self._interrupted = True
+        # por una conexión aparte: la de la sesión está esperando la respuesta
+        if self._session is not None:
+            try:
+                _oneshot("interrupt", session=self._session)
+            except Exception as e:
+                log.warning("query engine interrupt failed: %s", e)
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    def __del__(self):
+        self.close()
+
+
+def cursor(version: str | None = None, kind: str = "interactive") -> RemoteCursor:
+    """Cursor del motor sobre `version` (None = la publicada), de la clase `kind`."""
+    return RemoteCursor(version, kind)
+
+
+def cached(endpoint: str, version: str | None, params: dict) -> Any:
+    """
+    Resultado de `endpoint` desde la caché compartida del motor (lo ejecuta si
+    falta), en una sesión que el scheduler interrumpe si la request se cancela.
+    """
+    cur = scheduler.track(RemoteCursor(version))
+    try:
+        return cur.cached(endpoint, params)
+    finally:
+        cur.close()
+
+
+def warm(db_path: str, version: str) -> dict:
+    """Warm-up de la versión en staging en el motor (antes del swap); no falla el publish."""
+    try:
+        return _oneshot("warm", db_path=db_path, version=version)["value"]
+    except Exception as e:
+        log.warning("query engine warm-up failed: %s", e)
+        return {"replayed": 0, "failed": 0, "seconds": 0.0, "error": str(e)}
+
+
+def adopt(version: str):
+    """Después del swap: el motor sirve la versión publicada con la conexión del warm-up."""
+    try:
+        _oneshot("adopt", version=version)
+    except Exception as e:
+        log.warning("query engine adopt failed: %s", e)
+
+
+def stats() -> dict:
+    return _oneshot("stats")["value"]
+
+
+# --- servidor (proceso motor) --------------------------------------------------
+
+_sessions: dict[int, Any] = {}
+_staged: dict[str, Any] = {}   # versión en staging → conexión del warm-up, hasta el `adopt`
+_lock = threading.Lock()
+_ids = itertools.count(1)
+_counts = {"sessions_total": 0, "queries_total": 0, "errors_total": 0}
+_started = time.monotonic()
+
+
+class _Broken(Exception):
+    """La respuesta quedó a medias (error durante el stream Arrow): se corta la sesión."""
+
+
+class _Session(socketserver.StreamRequestHandler):
+    def setup(self):
+        super().setup()
+        self.sid = next(_ids)
+        self.cur = None
+        self.ticket = None  # plazo/cancelación del `cached` en curso
+
+    def handle(self):
+        while line := self.rfile.readline():
+            req = orjson.loads(line)
+            try:
+                getattr(self, f"op_{req.pop('op')}")(**req)
+            except _Broken:
+                return
+            except scheduler.Cancelled as e:
+                self.reply(ok=False, cancelled=e.reason)
+            except HTTPException as e:
+                self.reply(ok=False, status=e.status_code, detail=e.detail)
+            except Exception as e:
+                with _lock:
+                    _counts["errors_total"] += 1
+                self.reply(ok=False, error=type(e).__name__, message=str(e))
+
+    def finish(self):
+        with _lock:
+            _sessions.pop(self.sid, None)
+        if self.cur is not None:
+            self.cur.close()
+        super().finish()
+
+    def reply(self, ok: bool = True, **head):
+        self.wfile.write(_dumps({"ok": ok, **head}))
+        self.wfile.flush()
+
+    def _cursor(self, version: str | None = None, kind: str = "interactive"):
+        if self.cur is None:
+            self.cur = Duck.cursor(version, kind)
+            with _lock:
+                _sessions[self.sid] = self
+                _counts["sessions_total"] += 1
+        return self.cur
+
+    def interrupt(self):
+        if self.ticket is not None:  # corta también la espera a otra sesión (single-flight)
+            self.ticket.cancel("interrupted")
+        if self.cur is not None:
+            self.cur.interrupt()
+
+    def op_open(self, version: str | None = None, kind: str = "interactive"):
+        self._cursor(version, kind)
+        self.reply(session=self.sid)
+
+    def op_execute(self, sql: str, params=None):
+        import pyarrow as pa
+
+        cur = self._cursor()
+        with _lock:
+            _counts["queries_total"] += 1
+        cur.execute(sql, params)
+        # `fetch_record_batch` quedó obsoleto en DuckDB 1.4 (reemplazado por `to_arrow_reader`)
+        reader = cur.to_arrow_reader(BATCH_ROWS) if hasattr(cur, "to_arrow_reader") \
+            else cur.fetch_record_batch(BATCH_ROWS)
+        self.reply(arrow=True)
+        try:
+            with pa.ipc.new_stream(self.wfile, reader.schema) as w:
+                for batch in reader:
+                    w.write_batch(batch)
+            self.wfile.flush()
+        except Exception as e:
+            log.warning("query engine session %d: stream cut: %s", self.sid, e)
+            raise _Broken from e
+
+    def op_profile(self):
+        self.reply(value=self._cursor().get_profiling_information(format="json"))
+
+    def op_cached(self, endpoint: str, version: str | None = None, params: dict | None = None,
+                  timeout: float | None = None):
+        params = params or {}
+        cur = self._cursor(version)
+        with scheduler.scope(timeout) as self.ticket:
+            try:
+                value = views.cached(endpoint, version, params, lambda: views.run(endpoint, cur, params))
+            finally:
+                self.ticket = None
+        # lo mismo que haría FastAPI con el valor en el worker
+        self.reply(value=jsonable_encoder(value))
+
+    def op_interrupt(self, session: int):
+        with _lock:
+            other = _sessions.get(session)
+        if other is not None:
+            other.interrupt()
+        self.reply()
+
+    def op_warm(self, db_path: str, version: str):
+        con = Duck.connect_ro(db_path)
+        value = views.replay(con, version)
+        with _lock:
+            _staged.clear()  # un staging a la vez: uno abandonado (publish fallido) se descarta
+            _staged[version] = con
+        self.reply(value=value)
+
+    def op_adopt(self, version: str):
+        with _lock:
+            con = _staged.pop(version, None)
+        if con is not None:
+            Duck.adopt(con)
+        self.reply()
+
+    def op_stats(self):
+        rss = rss_bytes()
+        with _lock:
+            value = {**_counts, "sessions_open": len(_sessions)}
+        value.update(
+            pid=os.getpid(),
+            uptime_seconds=round(time.monotonic() - _started, 1),
+            rss_mb=None if rss is None else round(rss / (1024 * 1024), 1),
+            result_cache={"entries": len(results), "hits": results.hits, "misses": results.misses},
+        )
+        self.reply(value=value)
+
+
+class _Server(socketserver.ThreadingUnixStreamServer):
+    daemon_threads = True
+    block_on_close = False
+
+
+def _listening(path: str) -> bool:
+    s = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        s.connect(path)
+        return True
+    except OSError:
+        return False
+    finally:
+        s.close()
+
+
+def serve(path: str | None = None):
+    """Arranca el motor en `path` (por defecto `QUERY_ENGINE_SOCKET`) hasta SIGTERM/SIGINT."""
+    global _serving
+    _serving = True
+    path = path or settings.QUERY_ENGINE_SOCKET
+    if not path:
+        raise SystemExit("QUERY_ENGINE_SOCKET vacío: no hay dónde escuchar")
+    paths.ensure_dirs()
+    if settings.STARTUP_WARMUP:
+        warmup.startup()
+    if os.path.exists(path):
+        if _listening(path):
+            raise SystemExit(f"ya hay un motor escuchando en {path}")
+        os.unlink(path)  # socket de una corrida anterior que no se limpió
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    server = _Server(path, _Session)
+
+    def stop(*_):
+        threading.Thread(target=server.shutdown, daemon=True).start()
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    log.info("query engine listening on %s (pid %d)", path, os.getpid())
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+        try:
+            os.unlink(path)
+        except OSError:
+            pass
+
+
+if __name__ == "__main__":
+    # con `-m` este archivo corre como `__main__`: el estado (`_serving`, las sesiones)
+    # tiene que vivir en el módulo que importan los routers
+    from ..core.logging import setup_logging
+    from . import engine
+
+    setup_logging()
+    engine.serve()
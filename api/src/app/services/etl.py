@@ -11,11 +11,20 @@ import re
 from . import paths
 from ..core.config import settings
 from .validators import validate_df
+from .gazetteer import encode_territorios
+from .sort_index import build_sort_positions
+from .rollups import build_timeseries
+from .sampling import build_sample
+from .duplicates import DUP_TABLE, build_duplicates, report_df as dup_report_df
+from . import archive, engine, prerender, views
+from .stages import StageProfile
+from .duck import Duck
 
 def _ts():
     return datetime.utcnow().strftime("%Y-%m-%dT%H-%M-%SZ")
 
-def _write_staging(uploaded: Dict[str, bytes]) -> str:
+def _write_staging(uploaded: Dict[str, bytes], prof: StageProfile) -> str:
+    paths.ensure_dirs()
     ts = _ts()
     stg = os.path.join(paths.STAGING, ts)
     pq_dir = os.path.join(stg, "parquet")
@@ -23,23 +32,47 @@ def _write_staging(uploaded: Dict[str, bytes]) -> str:
 
     # 1) leer excels → pandas → validar → polars → parquet
     written_modules = []
+    prof.info.update(input_bytes=sum(len(b) for b in uploaded.values() if isinstance(b, (bytes, bytearray))),
+                     rows={}, validation_errors={})
     for module, filelike in uploaded.items():
         # pandas lee xlsx fiable; luego convertimos a polars
-        df_pd = pd.read_excel(filelike)  # engine=openpyxl por defecto
-        df_pd = validate_df(module, df_pd)
-        df_pl = pl.from_pandas(df_pd)
-        # normalizaciones simples
-        df_pl = df_pl.rename({c: c.strip().lower().replace(" ", "_") for c in df_pl.columns})
-        df_pl.write_parquet(os.path.join(pq_dir, f"{module}.parquet"))
+        with prof.stage("read"):
+            if isinstance(filelike, (bytes, bytearray)):
+                filelike = io.BytesIO(filelike)
+            df_pd = pd.read_excel(filelike)  # engine=openpyxl por defecto
+        with prof.stage("validate"):
+            df_pd, errors = validate_df(module, df_pd)
+        prof.info["rows"][module] = len(df_pd)
+        prof.info["validation_errors"][module] = _error_counts(errors)
+        with prof.stage("normalize"):
+            df_pl = pl.from_pandas(df_pd)
+            # normalizaciones simples
+            df_pl = df_pl.rename({c: c.strip().lower().replace(" ", "_") for c in df_pl.columns})
+        with prof.stage("parquet"):
+            df_pl.write_parquet(os.path.join(pq_dir, f"{module}.parquet"))
         written_modules.append(module)
 
     # 2) duckdb materializado
     db_path = os.path.join(stg, "duckdb.db")
+    with prof.stage("duckdb_build"):
+        _build_modules_db(db_path, written_modules)
+
+    # 3) meta.json
+    meta = {"version": ts, "created_at": ts, "modules": written_modules}
+    with open(os.path.join(stg, "meta.json"), "w", encoding="utf-8") as f:
+        json.dump(meta, f, ensure_ascii=False, indent=2)
+
+    return stg
+
+def _build_modules_db(db_path: str, written_modules: list[str]):
     con = duckdb.connect(db_path)
-    con.execute("SET threads TO 4;")
+    con.execute(f"SET threads TO {max(1, settings.DUCK_THREADS_BULK)};")
     # cargar cada parquet como tabla base
+    # (ruta absoluta y copia a tabla interna: la vista no depende del cwd ni del rename staging → archive)
     for module in written_modules:
-        con.execute(f"CREATE OR REPLACE VIEW v_{module} AS SELECT * FROM read_parquet('parquet/{module}.parquet');")
+        pq = os.path.join(os.path.dirname(db_path), "parquet", f"{module}.parquet").replace("\\", "/")
+        con.execute(f"CREATE OR REPLACE TABLE base_{module} AS SELECT * FROM read_parquet(?);", [pq])
+        con.execute(f"CREATE OR REPLACE VIEW v_{module} AS SELECT * FROM base_{module};")
     # ejemplos de MVs mínimas si existen módulos
     if "indicadores" in written_modules:
         con.execute("""
@@ -58,25 +91,161 @@ def _write_staging(uploaded: Dict[str, bytes]) -> str:
         """)
     con.close()
 
-    # 3) meta.json
-    meta = {"version": ts, "created_at": ts, "modules": written_modules}
-    with open(os.path.join(stg, "meta.json"), "w", encoding="utf-8") as f:
-        json.dump(meta, f, ensure_ascii=False, indent=2)
-
-    return stg
+def _retire_legacy_current():
+    # `current` como carpeta real (layout anterior): se archiva una sola vez
+    cur = paths.CURRENT
+    if os.path.islink(cur) or not os.path.isdir(cur):
+        return
+    if not os.listdir(cur):
+        os.rmdir(cur)
+        return
+    name = None
+    try:
+        with open(os.path.join(cur, "meta.json"), "r", encoding="utf-8") as f:
+            name = json.load(f).get("version")
+    except Exception:
+        pass
+    name = name or f"legacy-{_ts()}"
+    dest = os.path.join(paths.ARCHIVE, name)
+    if os.path.exists(dest):
+        dest = os.path.join(paths.ARCHIVE, f"{name}-legacy")
+    os.rename(cur, dest)
 
 def _atomic_swap(stg_dir: str):
-    cur = paths.CURRENT
-    arc = os.path.join(paths.ARCHIVE, os.path.basename(stg_dir))
-    # mueve current a archive (si existe) y staging→current
-    if os.path.exists(cur):
-        shutil.move(cur, arc)
-    shutil.move(stg_dir, cur)
+    """
+    Publica staging/<ts> como versión inmutable archive/<ts> y mueve el puntero
+    `current` con un único rename atómico (O(1), sin copiar la base).
+    """
+    version = os.path.basename(stg_dir)
+    dest = os.path.join(paths.ARCHIVE, version)
+    os.rename(stg_dir, dest)  # misma partición (DATA_DIR): rename, no copia
+    _retire_legacy_current()
+
+    tmp = os.path.join(paths.DATA, f".current-{version}")
+    try:
+        # symlink relativo: sigue válido si DATA_DIR se monta en otra ruta (docker)
+        os.symlink(os.path.join("archive", version), tmp, target_is_directory=True)
+        os.replace(tmp, paths.CURRENT)
+        if paths.is_pointer_file(paths.POINTER):  # puntero en archivo de un publish anterior
+            os.remove(paths.POINTER)
+    except OSError:
+        # sin permiso para symlinks (Windows): puntero en archivo, mismo rename atómico
+        if os.path.lexists(tmp):
+            os.remove(tmp)
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(version)
+        os.replace(tmp, paths.POINTER)
+
+def _warm_and_swap(stg_dir: str, prof: StageProfile) -> dict:
+    """
+    Prerenderiza las vistas sin filtros y re-ejecuta las consultas más frecuentes
+    contra la versión en staging (caché de resultados + buffers de DuckDB); luego
+    la publica. Devuelve las stats de ambos pasos.
+    """
+    db_path = os.path.join(stg_dir, "duckdb.db")
+    if not os.path.exists(db_path):
+        _record_profile(stg_dir, prof)
+        with prof.stage("swap"):
+            _atomic_swap(stg_dir)
+        return {}
+    con = Duck.connect_ro(db_path)
+    with prof.stage("prerender"):
+        out = {"prerender": prerender.render(con, stg_dir)}
+    version = os.path.basename(stg_dir)
+    if engine.enabled():
+        # la caché y los buffers que sirven son los del motor compartido: calienta él
+        con.close()
+        con = None
+        with prof.stage("warmup"):
+            out["warmup"] = engine.warm(db_path, version)
+    else:
+        with prof.stage("warmup"):
+            out["warmup"] = views.replay(con, version)
+    if os.name == "nt" and con is not None:
+        # Windows no permite renombrar un directorio con archivos abiertos
+        con.close()
+        con = None
+    _record_profile(stg_dir, prof)
+    with prof.stage("swap"):
+        _atomic_swap(stg_dir)
+    if engine.enabled():
+        engine.adopt(version)
+    elif con is not None:
+        # el rename conserva el archivo: la conexión caliente sirve a la versión publicada
+        Duck.adopt(con)
+    return out
+
+def _error_counts(errors_df: pd.DataFrame | None) -> dict:
+    """Conteo de fallas de validación (pandera failure_cases): total y por columna."""
+    if errors_df is None or errors_df.empty:
+        return {"total": 0, "by_column": {}}
+    col = errors_df["column"].fillna("(tabla)").astype(str) if "column" in errors_df else None
+    return {"total": int(len(errors_df)),
+            "by_column": {k: int(v) for k, v in col.value_counts().items()} if col is not None else {}}
+
+
+def _output_sizes(version_dir: str) -> dict:
+    """Bytes de los artefactos de la versión (ruta relativa → bytes)."""
+    out = {}
+    for root, _, files in os.walk(version_dir):
+        for name in files:
+            p = os.path.join(root, name)
+            try:
+                out[os.path.relpath(p, version_dir).replace("\\", "/")] = os.path.getsize(p)
+            except OSError:
+                pass
+    return dict(sorted(out.items()))
+
+
+# etapas medidas con la versión ya publicada: van a profiles/<versión>.json, no al meta.json
+POST_SWAP_STAGES = ("swap", "retention")
+
+
+def _write_json(path: str, data: dict):
+    tmp = os.path.join(os.path.dirname(path), f".{os.path.basename(path)}.tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, indent=2, default=str)
+    os.replace(tmp, path)
+
+
+def _record_profile(stg_dir: str, prof: StageProfile) -> dict:
+    """
+    Agrega el perfil del refresh (etapas hasta ahora, filas, errores, tamaños) al
+    meta.json de staging, antes del swap: la versión publicada no se modifica.
+    """
+    version = os.path.basename(stg_dir)
+    prof.info["outputs"] = _output_sizes(stg_dir)
+    meta_path = os.path.join(stg_dir, "meta.json")
+    try:
+        with open(meta_path, "r", encoding="utf-8") as f:
+            meta = json.load(f)
+    except (OSError, ValueError):
+        meta = {"version": version, "created_at": version}
+    meta["profile"] = prof.as_dict()
+    _write_json(meta_path, meta)
+    return meta["profile"]
+
+
+def _record_post_swap(version: str, prof: StageProfile) -> dict:
+    """Guarda las etapas posteriores al swap en profiles/<versión>.json; devuelve el perfil completo."""
+    profile = prof.as_dict()
+    post = {k: v for k, v in profile["stages"].items() if k in POST_SWAP_STAGES}
+    os.makedirs(paths.PROFILES, exist_ok=True)
+    _write_json(os.path.join(paths.PROFILES, f"{version}.json"),
+                {"total_seconds": profile["total_seconds"], "stages": post})
+    return profile
+
 
 def run_refresh_from_files(files_dict: Dict[str, bytes]) -> dict:
-    stg = _write_staging(files_dict)
-    _atomic_swap(stg)
-    return {"status": "ok", "version": os.path.basename(stg)}
+    prof = StageProfile()
+    stg = _write_staging(files_dict, prof)
+    with prof.stage("dedupe"):
+        archive.dedupe_artifacts(stg)
+    warm = _warm_and_swap(stg, prof)
+    with prof.stage("retention"):
+        archive.apply_retention()
+    version = os.path.basename(stg)
+    return {"status": "ok", "version": version, **warm, "profile": _record_post_swap(version, prof)}
 
 
 def _slugify(name: str) -> str:
@@ -157,49 +326,45 @@ def run_refresh_from_workbook(
     """
     modules_to_process = modules_to_process or ["ruea"]
     header_rows = header_rows or {"ruea": 1}
+    prof = StageProfile()
+    prof.info.update(input_bytes=len(file_bytes), rows={}, validation_errors={})
 
+    paths.ensure_dirs()
     ts = _ts()
     stg = os.path.join(paths.STAGING, ts)
     pq_dir = os.path.join(stg, "parquet")
     os.makedirs(pq_dir, exist_ok=True)
 
-    xl = pd.ExcelFile(io.BytesIO(file_bytes))  # openpyxl por defecto
-
     written_modules = []
     # --- RUEA (GENERAL) ---
     if "ruea" in modules_to_process:
         sheet_ruea = sheet_map.get("ruea", "GENERAL")
         hdr = int(header_rows.get("ruea", 1)) - 1
-        try:
-            df_pd = pd.read_excel(xl, sheet_name=sheet_ruea, header=hdr)
-        except Exception as e:
-            raise ValueError(f"No pude leer la hoja '{sheet_ruea}' para RUEA: {e}")
+        with prof.stage("read"):
+            xl = pd.ExcelFile(io.BytesIO(file_bytes))  # openpyxl por defecto
+            try:
+                df_pd = pd.read_excel(xl, sheet_name=sheet_ruea, header=hdr)
+            except Exception as e:
+                raise ValueError(f"No pude leer la hoja '{sheet_ruea}' para RUEA: {e}")
+
+        prof.info["rows"][sheet_ruea] = len(df_pd)
 
         # Normalización en pandas (igual que ya tenías)
-        df_pd = _normalize_df_ruea(df_pd)
+        with prof.stage("normalize"):
+            df_pd = _normalize_df_ruea(df_pd)
 
         # --- VALIDACIÓN ---
-        df_valid, errors_df = validate_df("ruea", df_pd)  # <= nuevo
-
-        # Si hay errores, generamos reporte Excel en staging
-        quality_path = os.path.join(stg, "quality_report_ruea.xlsx")
-        if errors_df is not None and not errors_df.empty:
-            with pd.ExcelWriter(quality_path, engine="openpyxl") as xw:
-                # Hoja de errores
-                errors_df.to_excel(xw, sheet_name="errores", index=False)
-                # Muestra de datos
-                df_valid.head(1000).to_excel(xw, sheet_name="muestra_datos", index=False)
-        else:
-            # Creamos un reporte mínimo para constancia
-            with pd.ExcelWriter(quality_path, engine="openpyxl") as xw:
-                pd.DataFrame([{"estado": "sin_errores_detectados"}]).to_excel(xw, sheet_name="resumen", index=False)
+        with prof.stage("validate"):
+            df_valid, errors_df = validate_df("ruea", df_pd)  # <= nuevo
+        prof.info["validation_errors"]["ruea"] = _error_counts(errors_df)
 
         # Escribir Parquet con DuckDB desde df_valid (no polars)
         pq_path = os.path.join(pq_dir, "ruea.parquet")
-        con_tmp = duckdb.connect()
-        con_tmp.register("df_ruea", df_valid)
-        con_tmp.execute(f"COPY (SELECT * FROM df_ruea) TO '{pq_path}' (FORMAT PARQUET);")
-        con_tmp.close()
+        with prof.stage("parquet"):
+            con_tmp = duckdb.connect()
+            con_tmp.register("df_ruea", df_valid)
+            con_tmp.execute(f"COPY (SELECT * FROM df_ruea) TO '{pq_path}' (FORMAT PARQUET);")
+            con_tmp.close()
 
         written_modules.append("ruea")
 
@@ -207,12 +372,92 @@ def run_refresh_from_workbook(
 
     # --- construir duckdb con lo disponible ---
     db_path = os.path.join(stg, "duckdb.db")
+    with prof.stage("duckdb_build"):
+        _build_ruea_db(stg, db_path, written_modules)
+
+    if "ruea" in written_modules:
+        # duplicados en la hoja y cambios de identidad contra la versión publicada (dup_ruea)
+        dups = None
+        if settings.DUPLICATE_CHECK:
+            with prof.stage("duplicates"):
+                dups = _check_duplicates(stg, db_path)
+            prof.info["duplicates"] = dups
+
+        # reporte de calidad en staging: errores de validación + duplicados
+        with prof.stage("quality_report"):
+            _write_quality_report(os.path.join(stg, "quality_report_ruea.xlsx"), errors_df, df_valid,
+                                  db_path if dups and any(dups["rows"].values()) else None)
+
+    # meta.json
+    meta = {"version": ts, "created_at": ts, "modules": written_modules}
+    with open(os.path.join(stg, "meta.json"), "w", encoding="utf-8") as f:
+        json.dump(meta, f, ensure_ascii=False, indent=2)
+
+    # Parquet/reportes por contenido (hardlinks) → publicar → retención del archivo
+    with prof.stage("dedupe"):
+        archive.dedupe_artifacts(stg)
+    warm = _warm_and_swap(stg, prof)
+    with prof.stage("retention"):
+        archive.apply_retention()
+    return {"status": "ok", "version": ts, "modules": written_modules, **warm,
+        "reports": {"ruea_quality": os.path.join(paths.current_dir(), "quality_report_ruea.xlsx")},
+        "profile": _record_post_swap(ts, prof)}
+
+
+def _check_duplicates(stg: str, db_path: str) -> dict:
+    """Crea `dup_ruea` en la base de staging; compara con el Parquet de la versión publicada."""
+    prev_version, prev_pq = None, None
+    prev_dir = paths.current_dir()  # el puntero todavía apunta a la versión publicada
+    if os.path.exists(os.path.join(prev_dir, "parquet", "ruea.parquet")):
+        prev_version, prev_pq = os.path.basename(prev_dir), os.path.join(prev_dir, "parquet", "ruea.parquet")
     con = duckdb.connect(db_path)
-    con.execute("SET threads TO 4;")
+    try:
+        con.execute(f"SET threads TO {max(1, settings.DUCK_THREADS_BULK)};")
+        rows = build_duplicates(con, os.path.join(stg, "parquet", "ruea.parquet"), prev_pq)
+    finally:
+        con.close()
+    return {"previous_version": prev_version, "rows": rows}
+
+
+def _write_quality_report(path: str, errors_df: pd.DataFrame | None, df_valid: pd.DataFrame,
+                          dup_db: str | None = None):
+    """Hojas `errores`/`muestra_datos` si hubo errores, `duplicados` si `dup_db` tiene hallazgos y `resumen`."""
+    resumen = [{"control": "validacion", "filas": 0 if errors_df is None else len(errors_df)}]
+    with pd.ExcelWriter(path, engine="openpyxl") as xw:
+        if errors_df is not None and not errors_df.empty:
+            # Hoja de errores
+            errors_df.to_excel(xw, sheet_name="errores", index=False)
+            # Muestra de datos
+            df_valid.head(1000).to_excel(xw, sheet_name="muestra_datos", index=False)
+        if dup_db is not None:
+            con = duckdb.connect(dup_db, read_only=True)
+            try:
+                resumen += [{"control": t, "filas": n} for t, n in con.execute(
+                    f"SELECT tipo, COUNT(*) FROM {DUP_TABLE} GROUP BY 1 ORDER BY 1").fetchall()]
+                dup_report_df(con).to_excel(xw, sheet_name="duplicados", index=False)
+            finally:
+                con.close()
+        if not any(r["filas"] for r in resumen):
+            # reporte mínimo para constancia
+            resumen = [{"estado": "sin_errores_detectados"}]
+        pd.DataFrame(resumen).to_excel(xw, sheet_name="resumen", index=False)
+
+
+def _build_ruea_db(stg: str, db_path: str, written_modules: list[str]):
+    con = duckdb.connect(db_path)
+    con.execute(f"SET threads TO {max(1, settings.DUCK_THREADS_BULK)};")
     if "ruea" in written_modules:
         # usa la ruta ABSOLUTA del parquet y copia los datos a una tabla interna
         pq_path_abs = os.path.join(stg, "parquet", "ruea.parquet").replace("\\", "/")
         con.execute("CREATE OR REPLACE TABLE base_ruea AS SELECT * FROM read_parquet(?);", [pq_path_abs])
+        # gazetteer territorial: escrituras crudas → id entero + nombre canónico
+        encode_territorios(con, "base_ruea")
+        # posiciones de orden precalculadas para /ruea (documento, territorio, fecha)
+        build_sort_positions(con, "base_ruea")
+        # rollups mensual/semanal de fecha_registro para /ruea/timeseries
+        build_timeseries(con, "base_ruea")
+        # muestra uniforme de tamaño fijo para /ruea/stats y /ruea/facetas con ?approx=true
+        build_sample(con, settings.APPROX_SAMPLE_ROWS, "base_ruea")
         con.execute("CREATE OR REPLACE VIEW v_ruea AS SELECT * FROM base_ruea;")
 
         # ejemplo de vista materializada ligera (conteos por corregimiento)
@@ -223,12 +468,3 @@ def run_refresh_from_workbook(
         """)
     con.close()
 
-    # meta.json
-    meta = {"version": ts, "created_at": ts, "modules": written_modules}
-    with open(os.path.join(stg, "meta.json"), "w", encoding="utf-8") as f:
-        json.dump(meta, f, ensure_ascii=False, indent=2)
-
-    _atomic_swap(stg)
-    return {"status": "ok", "version": ts, "modules": written_modules,
-        "reports": {"ruea_quality": os.path.join(paths.CURRENT, "quality_report_ruea.xlsx")}}
-
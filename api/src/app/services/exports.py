@@ -0,0 +1,136 @@
+"""
+Exportaciones RUEA asíncronas (CSV / XLSX) con artefactos reutilizables.
+
+Un export se identifica por `sha256(versión de datos, formato, filtros y
+campos canónicos)`: el archivo queda en `DATA_DIR/exports/<versión>/<id>.<fmt>`
+(fuera de `archive/<versión>`, que no se toca después de publicar) y, como la
+versión es inmutable, un export idéntico posterior se responde al instante con
+el artefacto ya escrito. La retención borra los exports junto con su versión. Las exportaciones nuevas corren en un pool de
+`EXPORT_WORKERS` hilos (cada una con su cursor DuckDB); el archivo se escribe
+en un temporal y se publica con `os.replace`, así nunca se sirve a medias.
+
+El estado de los jobs vive en memoria; tras un reinicio basta re-enviar el
+export: el id es el mismo y, si el artefacto existe, queda `done` de inmediato.
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+
+from ..core.config import settings
+from . import paths, scheduler
+from .result_cache import canonical
+
+MEDIA_TYPES = {
+    "csv": "text/csv",
+    "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+}
+MAX_JOBS = 1000
+
+_pool = ThreadPoolExecutor(max_workers=max(1, settings.EXPORT_WORKERS), thread_name_prefix="export")
+_jobs: dict[str, "ExportJob"] = {}
+_lock = threading.Lock()
+
+
+@dataclass
+class ExportJob:
+    id: str
+    version: str
+    format: str
+    path: str
+    status: str = "queued"  # queued | running | done | error
+    error: str | None = None
+    bytes: int | None = None
+    created_at: float = field(default_factory=time.time)
+    finished_at: float | None = None
+
+    def as_dict(self) -> dict:
+        return {"id": self.id, "version": self.version, "format": self.format, "status": self.status,
+                "error": self.error, "bytes": self.bytes,
+                "seconds": round(self.finished_at - self.created_at, 3) if self.finished_at else None}
+
+
+def export_id(data_version: str, fmt: str, params: dict) -> str:
+    raw = json.dumps([data_version, fmt, canonical(params)], ensure_ascii=False, default=str)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()[:32]
+
+
+def version_dir(data_version: str) -> str:
+    """Carpeta de los artefactos de `data_version` (sin versión archivada: la carpeta publicada)."""
+    return os.path.join(paths.EXPORTS, os.path.basename(os.path.normpath(data_version)))
+
+
+def get(job_id: str) -> ExportJob | None:
+    with _lock:
+        return _jobs.get(job_id)
+
+
+def _prune():
+    # solo se olvidan jobs terminados; el artefacto sigue en disco
+    done = sorted((j for j in _jobs.values() if j.status in ("done", "error")), key=lambda j: j.created_at)
+    for j in done[: max(0, len(_jobs) - MAX_JOBS)]:
+        _jobs.pop(j.id, None)
+
+
+def submit(data_version: str, fmt: str, params: dict, prepare) -> ExportJob:
+    """
+    Encola el export (o devuelve el job/artefacto existente con el mismo id).
+
+    `prepare()` → (cursor, sql, binds) solo se llama si el export corre de verdad,
+    ya dentro del cupo `bulk`; el cursor se cierra al terminar.
+    """
+    job_id = export_id(data_version, fmt, params)
+    path = os.path.join(version_dir(data_version), f"{job_id}.{fmt}")
+    with _lock:
+        job = _jobs.get(job_id)
+        if job is not None and job.status in ("queued", "running"):
+            return job
+        if job is not None and job.status == "done" and os.path.exists(job.path):
+            return job
+        job = ExportJob(id=job_id, version=data_version, format=fmt, path=path)
+        _jobs[job_id] = job
+        _prune()
+        if os.path.exists(path):
+            job.status, job.bytes, job.finished_at = "done", os.path.getsize(path), job.created_at
+            return job
+    _pool.submit(_run, job, prepare)
+    return job
+
+
+def _run(job: ExportJob, prepare):
+    job.status = "running"
+    os.makedirs(os.path.dirname(job.path), exist_ok=True)
+    # temporal con la misma extensión (openpyxl la valida)
+    tmp = f"{job.path[: -len(job.format) - 1]}.{threading.get_ident()}.tmp.{job.format}"
+    try:
+        # comparte el cupo `bulk` con las descargas directas
+        scheduler.run_sync("bulk", _write, job, prepare, tmp)
+        os.replace(tmp, job.path)
+        job.bytes = os.path.getsize(job.path)
+        job.status = "done"
+    except Exception as e:
+        job.status, job.error = "error", str(e)
+        if os.path.exists(tmp):
+            os.remove(tmp)
+    finally:
+        job.finished_at = time.time()
+
+
+def _write(job: ExportJob, prepare, tmp: str):
+    # `cur` es el cursor privado del export (Duck.bulk)
+    cur, sql, binds = prepare()
+    try:
+        if job.format == "csv":
+            # DuckDB escribe el CSV directo a disco (sin pasar por pandas)
+            cur.execute(f"COPY ({sql}) TO '{tmp.replace(chr(39), chr(39) * 2)}' (FORMAT CSV, HEADER)", binds)
+        else:
+            import pandas as pd  # solo xlsx: no se carga en cada worker al arrancar
+
+            df = cur.execute(sql, binds).fetch_df()
+            with pd.ExcelWriter(tmp, engine="openpyxl") as xw:
+                df.to_excel(xw, index=False, sheet_name="ruea")
+    finally:
+        cur.close()
@@ -0,0 +1,75 @@
+"""
+Gazetteer canónico de nombres territoriales (corregimiento/vereda).
+
+En la publicación se toma cada escritura cruda distinta, se normaliza con
+`textnorm` (única fuente de verdad) y se le asigna un id entero. `base_ruea`
+guarda esos ids (`corregimiento_id`, `vereda_id`), así los group-by y filtros
+corren sobre enteros pequeños y la API no repite la normalización en SQL.
+
+Convención de ids: 0 = nombre vacío; 1..n en orden alfabético del nombre
+normalizado, de modo que ordenar por id equivale a ordenar por nombre.
+"""
+from .textnorm import NORMALIZADORES
+
+GAZ_TABLE = "gaz_territorio"     # (tipo, raw, id, nombre): una fila por escritura cruda
+DIM_VIEW = "dim_territorio"      # (tipo, id, nombre): una fila por nombre canónico
+TERRITORIOS = tuple(NORMALIZADORES)
+
+
+def code_col(tipo: str) -> str:
+    return f"{tipo}_id"
+
+
+CODE_COLS = tuple(code_col(t) for t in TERRITORIOS)
+
+def _gazetteer_rows(tipo: str, raws: list[str]) -> list[tuple[str, str, int, str]]:
+    norm = NORMALIZADORES[tipo]
+    nombres = {raw: norm(raw) for raw in raws}
+    ids = {"": 0}
+    for i, nombre in enumerate(sorted(set(nombres.values()) - {""}), start=1):
+        ids[nombre] = i
+    return [(tipo, raw, ids[n], n) for raw, n in nombres.items()]
+
+
+def encode_territorios(con, table: str = "base_ruea") -> list[str]:
+    """
+    Construye `gaz_territorio`/`dim_territorio` y agrega las columnas de código
+    a `table`. Devuelve los tipos codificados (sólo los que existen en la tabla).
+    """
+    import pandas as pd  # solo en la publicación: la API importa este módulo por `code_col`
+
+    cols = set(con.table(table).columns)
+    tipos = [t for t in TERRITORIOS if t in cols]
+
+    rows = []
+    for tipo in tipos:
+        raws = [r[0] for r in con.execute(
+            f"SELECT DISTINCT COALESCE(CAST({tipo} AS VARCHAR), '') FROM {table}"
+        ).fetchall()]
+        rows += _gazetteer_rows(tipo, raws)
+    gaz = pd.DataFrame(rows, columns=["tipo", "raw", "id", "nombre"])
+
+    con.register("df_gaz", gaz)
+    con.execute(f"""
+        CREATE OR REPLACE TABLE {GAZ_TABLE} AS
+        SELECT CAST(tipo AS VARCHAR) AS tipo, CAST(raw AS VARCHAR) AS raw,
+               CAST(id AS INTEGER) AS id, CAST(nombre AS VARCHAR) AS nombre
+        FROM df_gaz ORDER BY tipo, id, raw;
+    """)
+    con.unregister("df_gaz")
+    con.execute(f"""
+        CREATE OR REPLACE VIEW {DIM_VIEW} AS
+        SELECT DISTINCT tipo, id, nombre FROM {GAZ_TABLE};
+    """)
+
+    if tipos:
+        sel = ", ".join(f"g_{t}.id AS {code_col(t)}" for t in tipos)
+        joins = " ".join(
+            f"LEFT JOIN {GAZ_TABLE} g_{t} ON g_{t}.tipo = '{t}' "
+            f"AND g_{t}.raw = COALESCE(CAST(b.{t} AS VARCHAR), '')"
+            for t in tipos
+        )
+        drop = [c for c in CODE_COLS if c in cols]
+        star = f"b.* EXCLUDE ({', '.join(drop)})" if drop else "b.*"
+        con.execute(f"CREATE OR REPLACE TABLE {table} AS SELECT {star}, {sel} FROM {table} b {joins};")
+    return tipos
@@ -1,9 +1,26 @@
 import json, os
 from . import paths
 
-def read_meta():
-    meta_path = os.path.join(paths.CURRENT, "meta.json")
+def read_meta(version: str | None = None):
+    base = os.path.join(paths.ARCHIVE, version) if version else paths.current_dir()
+    meta_path = os.path.join(base, "meta.json")
     if not os.path.exists(meta_path):
         return {"version": None, "created_at": None, "modules": []}
     with open(meta_path, "r", encoding="utf-8") as f:
         return json.load(f)
+
+def read_profile(version: str) -> dict | None:
+    """Perfil del refresh de `version`: el de meta.json más las etapas posteriores al swap (profiles/)."""
+    profile = read_meta(version).get("profile")
+    if profile is None:
+        return None
+    try:
+        with open(os.path.join(paths.PROFILES, f"{version}.json"), "r", encoding="utf-8") as f:
+            post = json.load(f)
+    except (OSError, ValueError):
+        return profile
+    profile["stages"] = {**profile.get("stages", {}), **post.get("stages", {})}
+    profile["total_seconds"] = post.get("total_seconds", profile.get("total_seconds"))
+    peaks = [s["rss_peak_mb"] for s in profile["stages"].values() if s.get("rss_peak_mb") is not None]
+    profile["peak_rss_mb"] = max(peaks) if peaks else None
+    return profile
@@ -0,0 +1,300 @@
+"""
+Métricas en formato de texto Prometheus (`GET /metrics`).
+
+Sin dependencias: contadores, gauges e histogramas con etiquetas, protegidos
+por un lock cada uno (una suma y un `bisect` por observación). Lo que ya se
+cuenta en otro lado (caché de resultados, scheduler, versión publicada) se
+lee al momento del scrape con `collector()`, sin costo por request.
+
+Se registran:
+
+- `http_*`: latencia, tamaño de respuesta y total por ruta (plantilla de la
+  ruta, p. ej. `/api/v1/ruea/stats`), requests en curso (global y por
+  endpoint despachado con `scheduler.offload`);
+- `duckdb_*`: duración de cada consulta (execute + fetch) y filas
+  devueltas, por endpoint (conexiones registradas con `scheduler.track`);
+- cachés, cupos del scheduler y versión de datos publicada con su antigüedad.
+"""
+import bisect
+import contextvars
+import threading
+import time
+from typing import Callable, Iterable
+
+from . import querylog
+
+# endpoint (nombre de la función) que originó la consulta; lo fija `scheduler.offload`
+current_endpoint: contextvars.ContextVar[str] = contextvars.ContextVar("metrics_endpoint", default="-")
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216, 67108864)
+
+
+def _escape(v: str) -> str:
+    return str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(names: tuple, values: tuple, extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _num(v: float) -> str:
+    if v == float("inf"):
+        return "+Inf"
+    return repr(float(v)) if isinstance(v, float) else str(v)
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, doc: str, labels: tuple = ()):
+        self.name, self.doc, self.labelnames = name, doc, tuple(labels)
+        self._lock = threading.Lock()
+        self._values: dict[tuple, object] = {}
+
+    def _header(self) -> list[str]:
+        return [f"# HELP {self.name} {self.doc}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, *labels, amount: float = 1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self) -> list[str]:
+        with self._lock:
+            items = list(self._values.items())
+        return self._header() + [f"{self.name}{_labels(self.labelnames, k)} {_num(v)}" for k, v in items]
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def dec(self, *labels, amount: float = 1):
+        self.inc(*labels, amount=-amount)
+
+    def set(self, *labels, value: float):
+        with self._lock:
+            self._values[labels] = value
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, doc: str, labels: tuple = (), buckets: tuple = LATENCY_BUCKETS):
+        super().__init__(name, doc, labels)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value: float, *labels):
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            st = self._values.get(labels)
+            if st is None:
+                st = self._values[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            st[0][i] += 1
+            st[1] += value
+            st[2] += 1
+
+    def render(self) -> list[str]:
+        with self._lock:
+            items = [(k, (list(c), s, n)) for k, (c, s, n) in self._values.items()]
+        out = self._header()
+        for k, (counts, total, n) in items:
+            acc = 0
+            for le, c in zip((*self.buckets, float("inf")), counts):
+                acc += c
+                le_label = 'le="' + _num(le) + '"'
+                out.append(f"{self.name}_bucket{_labels(self.labelnames, k, le_label)} {acc}")
+            out.append(f"{self.name}_sum{_labels(self.labelnames, k)} {_num(total)}")
+            out.append(f"{self.name}_count{_labels(self.labelnames, k)} {n}")
+        return out
+
+
+# familias leídas al momento del scrape: (nombre, tipo, ayuda, [(etiquetas, valor)])
+Family = tuple[str, str, str, Iterable[tuple[dict, float]]]
+_metrics: list[_Metric] = []
+_collectors: list[Callable[[], Iterable[Family]]] = []
+
+
+def _register(m):
+    _metrics.append(m)
+    return m
+
+
+def collector(fn: Callable[[], Iterable[Family]]):
+    """Registra `fn`, que devuelve familias calculadas en cada scrape."""
+    _collectors.append(fn)
+    return fn
+
+
+http_requests = _register(Counter("http_requests_total", "Requests HTTP por ruta, método y status.",
+                                  ("route", "method", "status")))
+http_latency = _register(Histogram("http_request_duration_seconds", "Latencia por ruta (hasta el último byte).",
+                                   ("route",)))
+http_size = _register(Histogram("http_response_size_bytes", "Tamaño del cuerpo de la respuesta por ruta.",
+                                ("route",), SIZE_BUCKETS))
+http_in_flight = _register(Gauge("http_requests_in_flight", "Requests HTTP en curso."))
+endpoint_in_flight = _register(Gauge("endpoint_requests_in_flight",
+                                     "Requests en curso por endpoint (en cola o ejecutando).", ("endpoint",)))
+duck_latency = _register(Histogram("duckdb_query_duration_seconds", "Duración de cada consulta DuckDB por endpoint.",
+                                   ("endpoint",)))
+duck_rows = _register(Counter("duckdb_rows_returned_total", "Filas devueltas por DuckDB por endpoint.",
+                              ("endpoint",)))
+prerender_hits = _register(Counter("prerender_responses_total", "Respuestas servidas desde prerender.", ("view",)))
+
+
+def render() -> str:
+    lines: list[str] = []
+    for m in _metrics:
+        lines += m.render()
+    for fn in _collectors:
+        try:
+            families = list(fn())
+        except Exception:  # un collector roto no tumba el scrape
+            continue
+        for name, kind, doc, samples in families:
+            lines += [f"# HELP {name} {doc}", f"# TYPE {name} {kind}"]
+            for labels, value in samples:
+                lines.append(f"{name}{_labels(tuple(labels), tuple(labels.values()))} {_num(value)}")
+    return "\n".join(lines) + "\n"
+
+
+# --- conexiones DuckDB instrumentadas ----------------------------------------
+
+class _Instrumented:
+    """
+    Proxy de una conexión/cursor DuckDB. Cada consulta se mide desde `execute`
+    hasta que se consume (`fetch*`, el siguiente `execute` o `flush()` al
+    terminar la request): duración y filas van a `/metrics` y al slow-query
+    log, y con perfil activo se agrega el árbol de operadores de DuckDB.
+    `execute` devuelve el proxy (DuckDB devuelve la conexión), así
+    `con.execute(sql).fetchall()` también se cuenta.
+    """
+    __slots__ = ("_con", "_endpoint", "_pending", "_profiling")
+
+    def __init__(self, con, ep: str):
+        self._con = con
+        self._endpoint = ep
+        self._pending = None  # (sql, params, t0) de la consulta sin consumir
+        self._profiling = False
+
+    def __getattr__(self, name):
+        return getattr(self._con, name)
+
+    def execute(self, query, parameters=None, *args, **kwargs):
+        self._finish()
+        sink = querylog.profiles.get()
+        if sink is not None and not self._profiling:
+            self._con.execute("SET enable_profiling = 'no_output'")
+            self._profiling = True
+        t0 = time.perf_counter()
+        try:
+            self._con.execute(query, parameters, *args, **kwargs)
+        except BaseException:
+            duck_latency.observe(time.perf_counter() - t0, self._endpoint)
+            raise
+        self._pending = (query, parameters or [], t0)
+        return self
+
+    def _finish(self, rows: int = 0):
+        if self._pending is None:
+            return
+        sql, params, t0 = self._pending
+        self._pending = None
+        seconds = time.perf_counter() - t0
+        duck_latency.observe(seconds, self._endpoint)
+        duck_rows.inc(self._endpoint, amount=rows)
+        querylog.observe(self._endpoint, sql, params, seconds, rows)
+        sink = querylog.profiles.get()
+        if sink is not None and self._profiling:
+            try:
+                sink.append(querylog.profile_entry(self._con.get_profiling_information(format="json"),
+                                                   sql, params, seconds))
+            except Exception:  # consulta sin perfil (p. ej. interrumpida)
+                pass
+
+    def flush(self):
+        """Cierra la consulta pendiente y apaga el profiler (fin de la request)."""
+        self._finish()
+        if self._profiling:
+            self._profiling = False
+            self._con.execute("RESET enable_profiling")
+
+    def fetchall(self):
+        rows = self._con.fetchall()
+        self._finish(len(rows))
+        return rows
+
+    def fetchmany(self, *args, **kwargs):
+        rows = self._con.fetchmany(*args, **kwargs)
+        self._finish(len(rows))
+        return rows
+
+    def fetchone(self):
+        row = self._con.fetchone()
+        self._finish(row is not None)
+        return row
+
+    def fetch_df(self, *args, **kwargs):
+        df = self._con.fetch_df(*args, **kwargs)
+        self._finish(len(df))
+        return df
+
+    df = fetchdf = fetch_df
+
+    def fetch_arrow_table(self, *args, **kwargs):
+        tbl = self._con.fetch_arrow_table(*args, **kwargs)
+        self._finish(tbl.num_rows)
+        return tbl
+
+    def cursor(self):
+        return _Instrumented(self._con.cursor(), self._endpoint)
+
+
+def instrument(con):
+    """Envuelve `con` para medir sus consultas bajo el endpoint en curso."""
+    if isinstance(con, _Instrumented):
+        return con
+    return _Instrumented(con, current_endpoint.get())
+
+
+# --- middleware ASGI -----------------------------------------------------------
+
+class MetricsMiddleware:
+    """Latencia, status y bytes por ruta; ASGI puro (no bufferiza streaming)."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        t0 = time.perf_counter()
+        state = {"status": 500, "bytes": 0, "length": None}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                state["status"] = message["status"]
+                for k, v in message.get("headers", ()):
+                    if k == b"content-length":
+                        state["length"] = int(v)
+                        break
+            elif message["type"] == "http.response.body":
+                state["bytes"] += len(message.get("body", b""))
+            await send(message)
+
+        http_in_flight.inc()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            http_in_flight.dec()
+            # plantilla de la ruta (la fija el router): cardinalidad acotada
+            route = getattr(scope.get("route"), "path", "<unmatched>")
+            http_requests.inc(route, scope["method"], str(state["status"]))
+            http_latency.observe(time.perf_counter() - t0, route)
+            http_size.observe(state["length"] if state["length"] is not None else state["bytes"], route)
@@ -2,10 +2,46 @@ import os
 from ..core.config import settings
 
 DATA = settings.DATA_DIR
-CURRENT = os.path.join(DATA, "current")
+CURRENT = os.path.join(DATA, "current")    # puntero (symlink) → archive/<version>
 STAGING = os.path.join(DATA, "staging")
-ARCHIVE = os.path.join(DATA, "archive")
+ARCHIVE = os.path.join(DATA, "archive")    # versiones inmutables, una carpeta por versión
 UPLOADS = os.path.join(DATA, "uploads")
+EXPORTS = os.path.join(DATA, "exports")    # artefactos de exports, una carpeta por versión (fuera del archivo)
+PROFILES = os.path.join(DATA, "profiles")  # etapas del refresh medidas después del swap, <versión>.json
+# puntero en archivo si el SO no permite symlinks; otro nombre que `current`: en FS sin
+# distinción de mayúsculas (Windows, macOS) "CURRENT" y "current" son la misma ruta
+POINTER = os.path.join(DATA, "CURRENT_VERSION")
 
-for p in (DATA, CURRENT, STAGING, ARCHIVE, UPLOADS):
-    os.makedirs(p, exist_ok=True)
+
+
+def ensure_dirs():
+    """Crea las carpetas de datos (al arrancar la app y antes de cada publish, no al importar).
+
+    `current` no se crea aquí: lo crea el primer publish como puntero.
+    """
+    for p in (DATA, STAGING, ARCHIVE, UPLOADS, EXPORTS, PROFILES):
+        os.makedirs(p, exist_ok=True)
+
+
+def is_pointer_file(path: str) -> bool:
+    return os.path.isfile(path) and not os.path.islink(path)
+
+
+def current_dir() -> str:
+    """Carpeta real de la versión publicada. Resolver una vez por request/snapshot."""
+    # `current` como archivo: puntero del layout anterior en un FS sin mayúsculas
+    for pointer in (POINTER, CURRENT):
+        if is_pointer_file(pointer):
+            with open(pointer, "r", encoding="utf-8") as f:
+                name = f.read().strip()
+            if name:
+                return os.path.join(ARCHIVE, name)
+    return os.path.realpath(CURRENT)
+
+
+def current_db_path() -> str:
+    """DB_PATH resuelto contra el puntero (si apunta dentro de `current`)."""
+    db = settings.DB_PATH
+    if os.path.abspath(os.path.dirname(db)) == os.path.abspath(CURRENT):
+        return os.path.join(current_dir(), os.path.basename(db))
+    return db
@@ -0,0 +1,99 @@
+"""
+Respuestas prerenderizadas de las vistas sin filtros (landing del dashboard).
+
+`/ruea/facetas`, `/ruea/summary` y `/ruea/stats?by=<dim>` sin filtros quedan
+determinadas por la versión publicada, así que al publicar se escriben como
+JSON ya serializado y comprimido en `<versión>/prerender/`:
+
+    facetas.json  facetas.json.gz  facetas.json.br
+    summary.json  ...
+    stats-<dim>.json  ...
+
+La API los sirve con `FileResponse` (sin DuckDB ni serialización) eligiendo la
+codificación según `Accept-Encoding`. Brotli es opcional: sin el paquete
+`brotli` solo se escriben `.json` y `.json.gz`.
+"""
+import gzip
+import os
+
+import orjson
+
+from . import views
+from .ruea_query import FILTROS
+
+try:  # opcional
+    import brotli
+except ImportError:  # pragma: no cover
+    brotli = None
+
+DIR = "prerender"
+# mismas opciones que ORJSONResponse: el archivo es byte a byte la respuesta dinámica
+_ORJSON_OPTS = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+
+
+def targets() -> list[tuple[str, str, dict]]:
+    """(archivo, endpoint de `views.RUNNERS`, parámetros) de cada vista prerenderizada."""
+    out = [("facetas", "facetas", {"debug": False}), ("summary", "summary", {})]
+    out += [(f"stats-{by}", "stats", {"by": by, "top": 0}) for by in FILTROS]
+    return out
+
+
+def _write(path: str, data: bytes):
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+def render(con, version_dir: str) -> dict:
+    """Escribe las vistas sin filtros de `version_dir` (con `con` abierta sobre su base)."""
+    out_dir = os.path.join(version_dir, DIR)
+    os.makedirs(out_dir, exist_ok=True)
+    stats = {"files": 0, "bytes": 0, "failed": []}
+    for name, endpoint, params in targets():
+        try:
+            body = orjson.dumps(views.run(endpoint, con, params), option=_ORJSON_OPTS)
+        except Exception:
+            stats["failed"].append(name)
+            continue
+        variants = {"": body, ".gz": gzip.compress(body, compresslevel=9, mtime=0)}
+        if brotli is not None:
+            variants[".br"] = brotli.compress(body, quality=11)
+        for ext, data in variants.items():
+            _write(os.path.join(out_dir, f"{name}.json{ext}"), data)
+            stats["files"] += 1
+            stats["bytes"] += len(data)
+    return stats
+
+
+def _accepted(accept_encoding: str) -> dict[str, float]:
+    """Codificación → q de `Accept-Encoding`; `q=0` (o un q inválido) la descarta."""
+    out = {}
+    for part in accept_encoding.split(","):
+        enc, *params = (p.strip() for p in part.split(";"))
+        q = 1.0
+        for param in params:
+            k, _, v = param.partition("=")
+            if k.strip().lower() == "q":
+                try:
+                    q = float(v)
+                except ValueError:
+                    q = 0.0
+        if enc:
+            out[enc.lower()] = q
+    return out
+
+
+def find(version_dir: str | None, name: str, accept_encoding: str = "") -> tuple[str, str | None] | None:
+    """(ruta, Content-Encoding) de la mejor variante aceptada, o None si no hay prerender."""
+    if not version_dir:
+        return None
+    base = os.path.join(version_dir, DIR, f"{name}.json")
+    accepted = _accepted(accept_encoding)
+    # mayor q primero; a igual q, brotli (más chico) antes que gzip
+    for ext, enc in sorted(((".br", "br"), (".gz", "gzip")), key=lambda v: -accepted.get(v[1], 0.0)):
+        if accepted.get(enc, 0.0) > 0 and os.path.exists(base + ext):
+            return base + ext, enc
+    if os.path.exists(base):
+        return base, None
+    return None
@@ -0,0 +1,90 @@
+"""
+Registro de consultas lentas y perfiles de DuckDB por request.
+
+- Slow-query log (siempre activo): cada consulta de una conexión registrada con
+  `scheduler.track` que tarda más de `SLOW_QUERY_SECONDS` (execute + fetch)
+  se escribe como una línea JSON en `SLOW_QUERY_LOG` (rotativo): endpoint,
+  huella del SQL normalizado, SQL, parámetros, segundos y filas. La huella
+  agrupa las consultas que solo difieren en literales.
+- Perfil (`?profile=true`, solo admin): mientras `profiles` tiene una lista,
+  las conexiones instrumentadas activan el profiler de DuckDB y agregan el
+  árbol de operadores (tiempo, cardinalidad, filas leídas) de cada consulta.
+"""
+import contextvars
+import hashlib
+import json
+import re
+
+from ..core.config import settings
+from ..core.logging import slow_query_logger
+
+# lista donde se acumulan los perfiles de la request en curso (None = sin perfil)
+profiles: contextvars.ContextVar[list | None] = contextvars.ContextVar("query_profiles", default=None)
+
+_COMMENTS = re.compile(r"--[^\n]*|/\*.*?\*/", re.S)
+_STRINGS = re.compile(r"'(?:[^']|'')*'")
+_NUMBERS = re.compile(r"(?<![\w$.])-?\d+(?:\.\d+)?\b")
+_LISTS = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_SPACES = re.compile(r"\s+")
+MAX_PARAM_CHARS = 200
+
+
+def normalize_sql(sql: str) -> str:
+    """SQL sin comentarios, literales reemplazados por `?` y espacios compactados."""
+    s = _COMMENTS.sub(" ", sql)
+    s = _STRINGS.sub("?", s)
+    s = _NUMBERS.sub("?", s)
+    s = _LISTS.sub("(?+)", s)
+    return _SPACES.sub(" ", s).strip().lower()
+
+
+def fingerprint(sql: str) -> str:
+    return hashlib.sha1(normalize_sql(sql).encode("utf-8")).hexdigest()[:16]
+
+
+def _param(v):
+    if isinstance(v, str) and len(v) > MAX_PARAM_CHARS:
+        return v[:MAX_PARAM_CHARS] + "…"
+    return v if isinstance(v, (str, int, float, bool, type(None))) else str(v)
+
+
+def observe(endpoint: str, sql: str, params, seconds: float, rows: int):
+    """Registra la consulta si supera el umbral (llamado por la conexión instrumentada)."""
+    threshold = settings.SLOW_QUERY_SECONDS
+    if threshold <= 0 or seconds < threshold:
+        return
+    slow_query_logger().warning(json.dumps({
+        "endpoint": endpoint,
+        "fingerprint": fingerprint(sql),
+        "sql": normalize_sql(sql),
+        "params": [_param(p) for p in params] if isinstance(params, (list, tuple)) else _param(params),
+        "seconds": round(seconds, 4),
+        "rows": rows,
+    }, ensure_ascii=False, default=str))
+
+
+def _operator(node: dict) -> dict:
+    return {
+        "operator": node.get("operator_name") or node.get("operator_type"),
+        "seconds": round(node.get("operator_timing", 0.0), 6),
+        "cardinality": node.get("operator_cardinality"),
+        "rows_scanned": node.get("operator_rows_scanned"),
+        "extra_info": node.get("extra_info") or {},
+        "children": [_operator(c) for c in node.get("children", [])],
+    }
+
+
+def profile_entry(raw_json: str, sql: str, params, seconds: float) -> dict:
+    """Resumen de `get_profiling_information(format='json')` de una consulta."""
+    info = json.loads(raw_json)
+    return {
+        "fingerprint": fingerprint(sql),
+        "sql": sql,
+        "params": list(params) if isinstance(params, (list, tuple)) else params,
+        "seconds": round(seconds, 6),
+        "latency": info.get("latency"),
+        "cpu_time": info.get("cpu_time"),
+        "rows_returned": info.get("rows_returned"),
+        "rows_scanned": info.get("cumulative_rows_scanned"),
+        "operators": [_operator(c) for c in info.get("children", [])],
+    }
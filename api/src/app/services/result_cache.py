@@ -0,0 +1,68 @@
+"""
+Caché de resultados de consultas agregadas (facetas, stats).
+
+La clave es `(endpoint, versión de datos, parámetros canónicos)`: como cada
+versión publicada es inmutable no hace falta invalidar; las entradas de
+versiones anteriores salen solas del LRU (`RESULT_CACHE_ENTRIES`).
+"""
+import threading
+from collections import OrderedDict
+from typing import Any, Hashable
+
+from ..core.config import settings
+from . import metrics
+
+MISS = object()
+
+
+def canonical(params: dict) -> tuple:
+    # sin vacíos, strings sin espacios al borde, ordenados por nombre
+    return tuple(sorted((k, v.strip() if isinstance(v, str) else v) for k, v in params.items()
+                        if v not in (None, "")))
+
+
+def cache_key(endpoint: str, data_version: str, params: dict | tuple) -> tuple:
+    canon = params if isinstance(params, tuple) else canonical(params)
+    return (endpoint, data_version, canon)
+
+
+class ResultCache:
+    def __init__(self, max_entries: int | None = None):
+        self.max_entries = max_entries or settings.RESULT_CACHE_ENTRIES
+        self._lock = threading.Lock()
+        self._items: "OrderedDict[Hashable, Any]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable) -> Any:
+        with self._lock:
+            if key in self._items:
+                self._items.move_to_end(key)
+                self.hits += 1
+                return self._items[key]
+            self.misses += 1
+            return MISS
+
+    def put(self, key: Hashable, value: Any) -> Any:
+        with self._lock:
+            self._items[key] = value
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_entries:
+                self._items.popitem(last=False)
+        return value
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+
+results = ResultCache()
+
+
+@metrics.collector
+def _families():
+    total = results.hits + results.misses
+    yield ("result_cache_hits_total", "counter", "Aciertos de la caché de resultados.", [({}, results.hits)])
+    yield ("result_cache_misses_total", "counter", "Fallos de la caché de resultados.", [({}, results.misses)])
+    yield ("result_cache_hit_ratio", "gauge", "Aciertos / consultas de la caché de resultados.",
+           [({}, results.hits / total if total else 0.0)])
+    yield ("result_cache_entries", "gauge", "Entradas en la caché de resultados.", [({}, len(results))])
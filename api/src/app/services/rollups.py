@@ -0,0 +1,83 @@
+"""
+Rollups de registros en el tiempo (fecha_registro) construidos al publicar.
+
+`mv_ruea_registros` guarda el conteo por (bucket, periodo, corregimiento_id,
+linea_productiva normalizada) para buckets mensual y semanal. Es diminuta
+frente a `base_ruea`, así /ruea/timeseries agrega y acumula sobre ella sin
+tocar la tabla base.
+"""
+from typing import Any
+
+from .gazetteer import DIM_VIEW, code_col
+from .ruea_query import norm_py, norm_sql_col
+from .textnorm import norm_corregimiento_py
+
+TS_TABLE = "mv_ruea_registros"
+FECHA_COL = "fecha_registro"
+BUCKETS = ("month", "week")
+
+
+def build_timeseries(con, table: str = "base_ruea") -> bool:
+    """Crea `mv_ruea_registros`; False si la tabla no trae fecha_registro."""
+    cols = set(con.table(table).columns)
+    if FECHA_COL not in cols:
+        con.execute(f"DROP TABLE IF EXISTS {TS_TABLE};")
+        return False
+
+    corr = code_col("corregimiento") if code_col("corregimiento") in cols else "0"
+    linea = norm_sql_col("linea_productiva") if "linea_productiva" in cols else "''"
+    fecha = f"TRY_CAST({FECHA_COL} AS DATE)"
+    parts = [
+        f"SELECT '{b}' AS bucket, CAST(date_trunc('{b}', {fecha}) AS DATE) AS periodo, "
+        f"CAST({corr} AS INTEGER) AS corregimiento_id, {linea} AS linea_productiva, COUNT(*) AS total "
+        f"FROM {table} WHERE {fecha} IS NOT NULL GROUP BY ALL"
+        for b in BUCKETS
+    ]
+    con.execute(f"""
+        CREATE OR REPLACE TABLE {TS_TABLE} AS
+        SELECT * FROM ({' UNION ALL '.join(parts)})
+        ORDER BY bucket, periodo, corregimiento_id, linea_productiva;
+    """)
+    return True
+
+
+def timeseries(con, bucket: str, por: str | None, filtros: dict) -> list[dict[str, Any]]:
+    """
+    Series (una por valor de `por`, o una sola) con total y acumulado por
+    periodo, calculadas sobre el rollup. Sólo admite filtros presentes en él.
+    """
+    where, binds = ["r.bucket = ?"], [bucket]
+    if filtros.get("corregimiento"):
+        val = norm_corregimiento_py(filtros["corregimiento"])
+        where.append(f"r.corregimiento_id IN (SELECT id FROM {DIM_VIEW} "
+                     f"WHERE tipo = 'corregimiento' AND (nombre = ? OR nombre LIKE ?))")
+        binds += [val, f"%{val}%"]
+    if filtros.get("linea_productiva"):
+        where.append("r.linea_productiva LIKE ?")
+        binds.append(f"%{norm_py(filtros['linea_productiva'])}%")
+
+    if por == "corregimiento":
+        serie, join = "COALESCE(d.nombre, '')", (f"LEFT JOIN {DIM_VIEW} d "
+                                                  f"ON d.tipo = 'corregimiento' AND d.id = r.corregimiento_id")
+    elif por == "linea_productiva":
+        serie, join = "r.linea_productiva", ""
+    else:
+        serie, join = "'total'", ""
+
+    sql = f"""
+        WITH s AS (
+            SELECT {serie} AS serie, r.periodo, SUM(r.total) AS total
+            FROM {TS_TABLE} r {join}
+            WHERE {' AND '.join(where)}
+            GROUP BY 1, 2
+        )
+        SELECT serie, periodo, total,
+               SUM(total) OVER (PARTITION BY serie ORDER BY periodo) AS acumulado
+        FROM s ORDER BY serie, periodo
+    """
+    series: dict[str, dict[str, Any]] = {}
+    for serie, periodo, total, acumulado in con.execute(sql, binds).fetchall():
+        s = series.setdefault(serie, {"name": serie, "total": 0, "points": []})
+        s["points"].append({"periodo": periodo.isoformat(), "total": int(total), "acumulado": int(acumulado)})
+        s["total"] = int(acumulado)
+    return sorted(series.values(), key=lambda s: -s["total"])
@@ -0,0 +1,326 @@
+"""
+SQL compartido por los endpoints RUEA: columnas, filtros y agregaciones.
+
+Con snapshots publicados con gazetteer (`corregimiento_id`/`vereda_id` en
+`base_ruea`) corregimiento/vereda se filtran y agrupan por id entero contra
+`dim_territorio`. Los snapshots anteriores no traen códigos y caen en las
+expresiones REGEXP_REPLACE heredadas (`_legacy_territorio_sql`).
+"""
+import re
+import unicodedata
+from typing import Any, List
+
+from . import scheduler
+from .gazetteer import CODE_COLS, DIM_VIEW, TERRITORIOS, code_col
+from .sort_index import POS_COLS, pos_col
+from .textnorm import NORMALIZADORES
+
+VIEW = "v_ruea"
+FILTROS = ("corregimiento", "vereda", "linea_productiva", "escolaridad", "sexo")
+
+# columnas técnicas de base_ruea que no se exponen en listados/descargas
+INTERNAL_COLS = frozenset(CODE_COLS) | frozenset(POS_COLS)
+
+
+def safe_columns(con, view_name: str = VIEW) -> List[str]:
+    # 1) Ruta nativa: relación de DuckDB (sirve para tablas/vistas existentes)
+    try:
+        return list(con.table(view_name).columns)
+    except scheduler.Overloaded:
+        raise  # motor de consultas compartido caído (services/engine.py): 503, no "sin columnas"
+    except Exception:
+        pass
+
+    # 2) information_schema: incluye vistas y tablas (orden en posición)
+    try:
+        rows = con.execute(
+            """
+            SELECT column_name
+            FROM information_schema.columns
+            WHERE table_name = ?
+            ORDER BY ordinal_position
+            """,
+            [view_name],
+        ).fetchall()
+        if rows:
+            return [r[0] for r in rows]
+    except Exception:
+        pass
+
+    # 3) Fallback con DESCRIBE (cubre casos donde info_schema no listó la vista)
+    try:
+        safe_ident = view_name.replace('"', '""')
+        rows = con.execute(f'DESCRIBE SELECT * FROM "{safe_ident}"').fetchall()
+        # en DuckDB, la 1ª columna del DESCRIBE es el nombre de columna
+        if rows:
+            return [r[0] for r in rows]
+    except Exception:
+        pass
+
+    # 4) Si no existe la vista o aún no se ha publicado nada
+    return []
+
+
+def public_columns(cols: List[str]) -> List[str]:
+    return [c for c in cols if c not in INTERNAL_COLS]
+
+
+def quote_ident(col: str) -> str:
+    return '"' + col.replace('"', '""') + '"'
+
+
+def select_list(cols: List[str]) -> str:
+    return ", ".join(quote_ident(c) for c in cols)
+
+
+def unaccent_sql(expr: str) -> str:
+    # Quita tildes/diacríticos más comunes en es-ES/es-CO tras LOWER()
+    # REPLACE(REPLACE(...)) anidado porque DuckDB no trae unaccent nativo
+    return (
+        "REPLACE(REPLACE(REPLACE(REPLACE(REPLACE(REPLACE(REPLACE("
+        f"{expr}"
+        ",'á','a'),'é','e'),'í','i'),'ó','o'),'ú','u'),'ü','u'),'ñ','n')"
+    )
+
+
+def norm_sql_col(col: str) -> str:
+    # lower + unaccent + trim + colapso de espacios
+    return (
+        "REGEXP_REPLACE("
+        + unaccent_sql(f"LOWER(TRIM(COALESCE({col},'')))")
+        + ",'\\s+',' '"
+        + ")"
+    )
+
+
+def norm_py(s: str) -> str:
+    # contraparte Python de norm_sql_col (para valores de filtro)
+    s = unicodedata.normalize("NFD", s)
+    s = "".join(ch for ch in s if unicodedata.category(ch) != "Mn")
+    s = re.sub(r"\s+", " ", s.lower()).strip()
+    return s
+
+
+def _legacy_territorio_sql(tipo: str) -> str:
+    # sólo para snapshots publicados antes del gazetteer
+    base = unaccent_sql(f"LOWER(COALESCE({tipo},''))")
+    if tipo == "corregimiento":
+        return (
+            "REGEXP_REPLACE("
+            "REGEXP_REPLACE("
+            f"REGEXP_REPLACE({base},'^\\s*\\d+\\s*-\\s*',''),"
+            "'^\\s*corregimiento(\\s+de)?\\s+',''),"
+            "'\\s+',' '"
+            ")"
+        )
+    return (
+        "REGEXP_REPLACE("
+        "REGEXP_REPLACE("
+        "REGEXP_REPLACE("
+        f"REGEXP_REPLACE({base},'^\\s*\\d+\\s*-\\s*',''),"
+        "'^\\s*veredas?(\\s+de)?\\s+',''),"
+        "'^\\s*area\\s+de\\s+expansion\\s+',''),"
+        "'\\s+',' '"
+        ")"
+    )
+
+
+def is_coded(cols: List[str], tipo: str) -> bool:
+    return tipo in TERRITORIOS and code_col(tipo) in cols
+
+
+def dim_sql(cols: List[str], by: str) -> str | None:
+    """Expresión por fila del valor normalizado de `by` (None si la columna no existe)."""
+    if by not in cols:
+        return None
+    if is_coded(cols, by):
+        return (f"(SELECT d.nombre FROM {DIM_VIEW} d "
+                f"WHERE d.tipo = '{by}' AND d.id = {code_col(by)})")
+    if by in TERRITORIOS:
+        return _legacy_territorio_sql(by)
+    return norm_sql_col(by)
+
+
+def predicados_ruea(cols: List[str], filtros: dict) -> dict[str, tuple[str, list[Any]]]:
+    """Predicado SQL + binds por filtro activo (sólo si existe la columna)."""
+    has = set(cols).__contains__
+    out: dict[str, tuple[str, list[Any]]] = {}
+    for name in FILTROS:
+        value = filtros.get(name)
+        if not value or not has(name):
+            continue
+        if name in TERRITORIOS:
+            val = NORMALIZADORES[name](value)
+            if is_coded(cols, name):
+                sql = (f"{code_col(name)} IN (SELECT id FROM {DIM_VIEW} "
+                       f"WHERE tipo = '{name}' AND (nombre = ? OR nombre LIKE ?))")
+            else:
+                expr = _legacy_territorio_sql(name)
+                sql = f"({expr} = ? OR {expr} LIKE ?)"
+            out[name] = (sql, [val, f"%{val}%"])
+        else:
+            out[name] = (f"{norm_sql_col(name)} LIKE ?", [f"%{norm_py(value)}%"])
+    return out
+
+
+def where_ruea(cols: List[str], filtros: dict, skip: str | None = None) -> tuple[list[str], list[Any]]:
+    """WHERE de los filtros RUEA (sólo si existen las columnas); `skip` omite uno (facetas)."""
+    where: list[str] = []
+    binds: list[Any] = []
+    for name, (sql, b) in predicados_ruea(cols, filtros).items():
+        if name == skip:
+            continue
+        where.append(sql)
+        binds += b
+    return where, binds
+
+
+def where_clause(where: list[str]) -> str:
+    return (" WHERE " + " AND ".join(where)) if where else ""
+
+
+def order_sql(cols: List[str], order_by: str) -> tuple[str, str]:
+    """(expresión de orden, clave que manda nulos/vacíos al final)."""
+    if order_by in TERRITORIOS and is_coded(cols, order_by):
+        # ids asignados en orden alfabético del nombre; 0 = vacío
+        code = code_col(order_by)
+        return code, f"CASE WHEN COALESCE({code}, 0) = 0 THEN 1 ELSE 0 END"
+    if order_by in TERRITORIOS:
+        order_expr = _legacy_territorio_sql(order_by)
+    else:
+        order_expr = quote_ident(order_by)
+    # clave para mandar nulos/vacíos al final sin romper tipos numéricos
+    ord_cast = f"NULLIF(TRIM(CAST({order_expr} AS VARCHAR)), '')"
+    return order_expr, f"CASE WHEN {ord_cast} IS NULL THEN 1 ELSE 0 END"
+
+
+def page_sql(cols: List[str], select: str, where: list[str], order_by: str,
+             direction: str, limit: int, offset: int) -> tuple[str, list[Any]]:
+    """
+    SELECT paginado de /ruea → (sql, binds de paginación).
+    Con posiciones precalculadas (`pos_<col>_<dir>`): sin filtros es un rango
+    sobre la posición (sin sort); con filtros ordena sólo por ese entero.
+    """
+    pos = pos_col(order_by, direction)
+    if pos in cols:
+        if not where:
+            sql = f"{select} WHERE {pos} > ? AND {pos} <= ? ORDER BY {pos}"
+            return sql, [int(offset), int(offset) + int(limit)]
+        sql = f"{select}{where_clause(where)} ORDER BY {pos} LIMIT ? OFFSET ?"
+        return sql, [int(limit), int(offset)]
+
+    order_expr, nulls_key = order_sql(cols, order_by)
+    # consulta final (sin NULLS LAST)
+    sql = (f"{select}{where_clause(where)} ORDER BY {nulls_key} ASC, {order_expr} {direction.upper()} "
+           f"LIMIT ? OFFSET ?")
+    return sql, [int(limit), int(offset)]
+
+
+def key_sql(cols: List[str], by: str) -> str | None:
+    """Clave de agrupación por fila: código del gazetteer o valor normalizado."""
+    if is_coded(cols, by):
+        return code_col(by)
+    return dim_sql(cols, by)
+
+
+def conteo_por(con, cols: List[str], by: str, where: list[str], binds: list[Any],
+               top: int = 0, source: str = VIEW, expr: str | None = None) -> list[tuple[Any, int]]:
+    """
+    Conteo por valor normalizado de `by`, descendente (top>0 limita).
+    `expr` indica que `source` ya trae el valor normalizado en esa columna.
+    """
+    limit = f" LIMIT {int(top)}" if top and top > 0 else ""
+    if is_coded(cols, by):
+        sql = (
+            f"SELECT d.nombre AS name, t.value FROM ("
+            f"SELECT {code_col(by)} AS k, COUNT(*) AS value FROM {source}{where_clause(where)} GROUP BY 1"
+            f") t JOIN {DIM_VIEW} d ON d.tipo = '{by}' AND d.id = t.k "
+            f"ORDER BY 2 DESC, 1{limit}"
+        )
+    else:
+        expr = expr or dim_sql(cols, by)
+        if not expr:
+            return []
+        sql = (f"SELECT {expr} AS name, COUNT(*) AS value FROM {source}{where_clause(where)} "
+               f"GROUP BY 1 ORDER BY 2 DESC, 1{limit}")
+    return con.execute(sql, binds).fetchall() or []
+
+
+def distintos(con, cols: List[str], by: str, where: list[str], binds: list[Any],
+              source: str = VIEW, expr: str | None = None) -> list[str]:
+    """Valores normalizados distintos y no vacíos de `by`, ordenados."""
+    if is_coded(cols, by):
+        sql = (
+            f"SELECT nombre FROM {DIM_VIEW} WHERE tipo = '{by}' AND nombre <> '' "
+            f"AND id IN (SELECT DISTINCT {code_col(by)} FROM {source}{where_clause(where)}) "
+            f"ORDER BY 1"
+        )
+    else:
+        expr = expr or dim_sql(cols, by)
+        if not expr:
+            return []
+        sql = f"SELECT DISTINCT TRIM({expr}) AS v FROM {source}"
+        sql += where_clause(where)
+        sql += (" AND " if where else " WHERE ") + f"TRIM(COALESCE({expr},''))<>''"
+        sql += " ORDER BY 1"
+    rows = con.execute(sql, binds).fetchall()
+    return [r[0] for r in rows] if rows else []
+
+
+# dimensiones permitidas en /ruea/pivot (además de los filtros, el estrato)
+PIVOT_DIMS = FILTROS + ("estrato",)
+
+
+def _pivot_key(cols: List[str], dim: str) -> str | None:
+    if dim not in cols:
+        return None
+    if dim == "estrato":
+        return "TRY_CAST(estrato AS INTEGER)"
+    return key_sql(cols, dim)
+
+
+def pivot(con, cols: List[str], dims: list[str], where: list[str], binds: list[Any],
+          top: int = 0, source: str = VIEW) -> list[dict[str, Any]]:
+    """
+    Crosstab por una o dos dimensiones: conteo, edad (avg/min/max) y
+    distribución de estrato por celda. Territorios agrupan por código.
+    """
+    keys = [_pivot_key(cols, d) for d in dims]
+    if not dims or any(k is None for k in keys):
+        return []
+    has = set(cols).__contains__
+    aggs = ["COUNT(*) AS total"]
+    if has("edad"):
+        edad = "TRY_CAST(edad AS DOUBLE)"
+        aggs += [f"AVG({edad}) AS edad_avg", f"MIN({edad}) AS edad_min", f"MAX({edad}) AS edad_max"]
+    if has("estrato") and "estrato" not in dims:
+        aggs.append("histogram(TRY_CAST(estrato AS INTEGER)) AS estrato")
+
+    inner = (f"SELECT {', '.join(f'{k} AS k{i}' for i, k in enumerate(keys))}, {', '.join(aggs)} "
+             f"FROM {source}{where_clause(where)} GROUP BY ALL")
+    names, joins = [], []
+    for i, d in enumerate(dims):
+        if is_coded(cols, d):
+            joins.append(f"JOIN {DIM_VIEW} d{i} ON d{i}.tipo = '{d}' AND d{i}.id = g.k{i}")
+            names.append(f"d{i}.nombre AS {quote_ident(d)}")
+        else:
+            names.append(f"g.k{i} AS {quote_ident(d)}")
+    metrics = [a.rsplit(" AS ", 1)[1] for a in aggs]
+    order = ", ".join(str(i + 1) for i in range(len(dims)))
+    sql = (f"SELECT {', '.join(names)}, {', '.join('g.' + m for m in metrics)} "
+           f"FROM ({inner}) g {' '.join(joins)} ORDER BY g.total DESC, {order}")
+    if top and top > 0:
+        sql += f" LIMIT {int(top)}"
+
+    res = con.execute(sql, binds)
+    out_cols = [c[0] for c in res.description]
+    items = []
+    for tup in res.fetchall():
+        item = dict(zip(out_cols, tup))
+        if isinstance(item.get("estrato"), dict):
+            # claves JSON como texto; nulos fuera
+            item["estrato"] = {str(k): v for k, v in item["estrato"].items() if k is not None}
+        if item.get("edad_avg") is not None:
+            item["edad_avg"] = round(item["edad_avg"], 2)
+        items.append(item)
+    return items
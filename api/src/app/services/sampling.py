@@ -0,0 +1,77 @@
+"""
+Muestra uniforme de `base_ruea` para respuestas aproximadas (`?approx=true`).
+
+Al publicar se guarda `smp_ruea`: `APPROX_SAMPLE_ROWS` filas elegidas con
+reservoir sampling (uniforme, sin reemplazo), con las mismas columnas que la
+base (incluidos los códigos del gazetteer), así los filtros y agregaciones de
+`ruea_query` corren igual sobre ella. Con la muestra de tamaño fijo,
+`/ruea/stats` y `/ruea/facetas` aproximados cuestan lo mismo con 100k que con
+10M registros.
+
+Cotas (confianza `CONFIDENCE`, 95 %): un conteo con `k` de las `n` filas de la
+muestra se estima como `N·k/n` con el intervalo de Wilson de la proporción
+`k/n`, corregido por población finita (`N` = filas de la base). Si la base
+cabe en la muestra (`n = N`) la respuesta es exacta y las cotas coinciden.
+Un valor con menos de `missing_below` registros puede no aparecer en la
+muestra (con más, aparece con probabilidad >= 95 %).
+"""
+import math
+
+SAMPLE_TABLE = "smp_ruea"
+CONFIDENCE = 0.95
+_Z = 1.959964  # cuantil normal de CONFIDENCE (dos colas)
+
+
+def build_sample(con, rows: int, table: str = "base_ruea") -> bool:
+    """Crea `smp_ruea` con hasta `rows` filas de `table`; False (y sin tabla) si `rows` <= 0."""
+    if rows <= 0:
+        con.execute(f"DROP TABLE IF EXISTS {SAMPLE_TABLE};")
+        return False
+    con.execute(f"""
+        CREATE OR REPLACE TABLE {SAMPLE_TABLE} AS
+        SELECT * FROM {table} USING SAMPLE reservoir({int(rows)} ROWS) REPEATABLE (42);
+    """)
+    return True
+
+
+def has_sample(con) -> bool:
+    return bool(con.execute(
+        "SELECT COUNT(*) FROM duckdb_tables() WHERE database_name = current_database() AND table_name = ?",
+        [SAMPLE_TABLE],
+    ).fetchone()[0])
+
+
+def sizes(con, table: str = "base_ruea") -> tuple[int, int]:
+    """(filas de la muestra, filas de la base); COUNT(*) sin filtro sale de los metadatos."""
+    n = con.execute(f"SELECT COUNT(*) FROM {SAMPLE_TABLE}").fetchone()[0]
+    total = con.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+    return int(n), int(total)
+
+
+def estimate(k: int, n: int, total: int) -> dict:
+    """Conteo estimado en la base y su intervalo para `k` aciertos en la muestra."""
+    if n <= 0:
+        return {"value": 0, "low": 0, "high": 0}
+    p = k / n
+    fpc = (total - n) / (total - 1) if total > 1 else 0.0
+    z2 = _Z * _Z * max(fpc, 0.0)
+    center = (p + z2 / (2 * n)) / (1 + z2 / n)
+    half = math.sqrt(z2 * p * (1 - p) / n + z2 * z2 / (4 * n * n)) / (1 + z2 / n)
+    return {
+        "value": round(total * p),
+        "low": max(math.floor(total * (center - half)), k),
+        "high": min(math.ceil(total * (center + half)), total - (n - k)),
+    }
+
+
+def bounds_info(n: int, total: int) -> dict:
+    """Metadatos de la aproximación que acompañan a la respuesta (`_approx`)."""
+    exact = n >= total
+    return {
+        "sample_rows": n,
+        "total_rows": total,
+        "exact": exact,
+        "confidence": CONFIDENCE,
+        # P(ningún registro de un valor con m filas en la muestra) ≈ exp(-m·n/N) <= 1 - CONFIDENCE
+        "missing_below": 0 if exact or n == 0 else math.ceil(total * math.log(1 / (1 - CONFIDENCE)) / n),
+    }
@@ -0,0 +1,395 @@
+"""
+Ejecución de consultas DuckDB: control de admisión, timeouts y cancelación.
+
+Clases de trabajo, cada una con su propio executor (cupo = hilos) y su propia
+cola acotada:
+
+- `interactive`: listados, facetas, stats, resumen, pivot, series.
+- `bulk`: descargas, exports, diff entre versiones y refrescos (ETL).
+
+Los endpoints son `async` y despachan el trabajo con `@offload(clase)`: el
+event loop no se bloquea y una request en cola no ocupa ningún hilo. Si la
+cola está llena o la espera supera `SCHED_QUEUE_TIMEOUT` se responde 503 +
+Retry-After. Cada ejecución tiene timeout (`QUERY_TIMEOUTS[<endpoint>]` o el
+de su clase); si vence o el cliente se desconecta, las conexiones registradas
+con `track()` reciben `interrupt()` y el hilo queda libre de inmediato.
+
+El trabajo `bulk` corre además sobre una instancia DuckDB aparte con
+`DUCK_THREADS_BULK` hilos (ver `Duck.bulk`). Por clase se mide el tiempo en
+cola (total, máximo, histograma y p50/p99 de las últimas esperas) para
+`GET /api/v1/admin/scheduler`.
+"""
+import asyncio
+import contextlib
+import contextvars
+import functools
+import inspect
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from fastapi import HTTPException, Query, Request
+
+from ..core.config import settings
+from ..core.security import require_admin
+from . import metrics, querylog
+
+log = logging.getLogger(__name__)
+
+CLASSES = ("interactive", "bulk")
+# límites superiores (segundos) del histograma de espera en cola
+WAIT_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 30.0)
+# cada cuánto se revisa si el cliente sigue conectado
+POLL_SECONDS = 0.1
+
+
+class Overloaded(RuntimeError):
+    def __init__(self, cls: str, reason: str):
+        super().__init__(f"{cls}_{reason}")
+        self.cls = cls
+        self.reason = reason
+
+
+class Cancelled(RuntimeError):
+    def __init__(self, reason: str):
+        super().__init__(reason)
+        self.reason = reason
+
+
+class _Budget:
+    def __init__(self, name: str, slots: int, max_queue: int, timeout: float):
+        self.name = name
+        self.slots = max(1, slots)
+        self.max_queue = max(1, max_queue)
+        self.timeout = timeout
+        self.executor = ThreadPoolExecutor(max_workers=self.slots, thread_name_prefix=f"duck-{name}")
+        self.lock = threading.Lock()
+        self.running = 0
+        self.waiting = 0
+        self.admitted = 0
+        self.rejected = 0
+        self.timeouts = 0
+        self.disconnects = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self.buckets = [0] * (len(WAIT_BUCKETS) + 1)
+        self.recent: deque[float] = deque(maxlen=1024)
+
+    def _observe(self, waited: float):
+        self.admitted += 1
+        self.wait_total += waited
+        self.wait_max = max(self.wait_max, waited)
+        self.recent.append(waited)
+        for i, le in enumerate(WAIT_BUCKETS):
+            if waited <= le:
+                self.buckets[i] += 1
+                break
+        else:
+            self.buckets[-1] += 1
+
+    def snapshot(self) -> dict:
+        with self.lock:
+            recent = sorted(self.recent)
+            q = (lambda p: round(recent[min(len(recent) - 1, int(p * len(recent)))], 6)) if recent else (lambda p: None)
+            acc, hist = 0, {}
+            for le, n in zip([*map(str, WAIT_BUCKETS), "+Inf"], self.buckets):
+                acc += n
+                hist[le] = acc
+            return {
+                "slots": self.slots, "max_queue": self.max_queue, "timeout": self.timeout,
+                "running": self.running, "waiting": self.waiting,
+                "admitted": self.admitted, "rejected": self.rejected,
+                "timeouts": self.timeouts, "disconnects": self.disconnects,
+                "wait_seconds_total": round(self.wait_total, 6), "wait_seconds_max": round(self.wait_max, 6),
+                "wait_p50": q(0.50), "wait_p99": q(0.99), "wait_histogram": hist,
+            }
+
+
+_budgets = {
+    "interactive": _Budget("interactive", settings.SCHED_INTERACTIVE_SLOTS, settings.SCHED_INTERACTIVE_QUEUE,
+                           settings.QUERY_TIMEOUT_INTERACTIVE),
+    "bulk": _Budget("bulk", settings.SCHED_BULK_SLOTS, settings.SCHED_BULK_QUEUE, settings.QUERY_TIMEOUT_BULK),
+}
+
+class _Ticket:
+    """
+    Estado de una ejecución compartido entre el event loop y su hilo: conexiones
+    registradas con `track()`, plazo, que corre desde que la ejecución empieza
+    (no desde que entró a la cola), y si fue cancelada.
+    """
+    def __init__(self, timeout: float | None = None):
+        self.tracked: list = []
+        self.timeout = timeout
+        self.deadline: float | None = None
+        self.cancelled = threading.Event()
+        self.reason = ""
+
+    def cancel(self, reason: str):
+        self.reason = reason
+        self.cancelled.set()
+
+    def start(self):
+        if self.timeout and self.timeout > 0:
+            self.deadline = time.monotonic() + self.timeout
+
+    def expired(self) -> bool:
+        return self.deadline is not None and time.monotonic() > self.deadline
+
+
+# ejecución en curso (sus conexiones DuckDB, para interrumpirlas, y su plazo)
+_ticket: contextvars.ContextVar[_Ticket | None] = contextvars.ContextVar("duck_ticket", default=None)
+
+
+def track(con):
+    """
+    Registra `con` (un cursor propio de la request) para poder interrumpirlo y
+    devuelve la conexión instrumentada (duración/filas en `/metrics`).
+    """
+    con = metrics.instrument(con)
+    ticket = _ticket.get()
+    if ticket is not None:
+        ticket.tracked.append(con)
+    return con
+
+
+@contextlib.contextmanager
+def scope(timeout: float | None = None):
+    """
+    Ejecución fuera de `run` (p. ej. un pedido al motor de consultas): el plazo
+    corre desde ya y quien la controle puede cancelarla con `.cancel(reason)`.
+    """
+    t = _Ticket(timeout)
+    t.start()
+    token = _ticket.set(t)
+    try:
+        yield t
+    finally:
+        _ticket.reset(token)
+
+
+def remaining() -> float | None:
+    """Segundos que le quedan a la ejecución en curso (None: sin plazo)."""
+    t = _ticket.get()
+    if t is None or t.deadline is None:
+        return None
+    return max(0.0, t.deadline - time.monotonic())
+
+
+def cancelled() -> bool:
+    """True si la ejecución en curso ya fue cancelada (timeout o cliente desconectado)."""
+    ticket = _ticket.get()
+    return ticket is not None and ticket.cancelled.is_set()
+
+
+def wait(event: threading.Event) -> None:
+    """
+    Espera `event` dentro del plazo de la ejecución en curso. Si el plazo vence o
+    la ejecución se cancela lanza `Cancelled` y el hilo queda libre; fuera de una
+    ejecución (`run`) espera sin límite.
+    """
+    ticket = _ticket.get()
+    if ticket is None:
+        event.wait()
+        return
+    while not event.wait(POLL_SECONDS):
+        if ticket.cancelled.is_set():
+            raise Cancelled(ticket.reason)
+        if ticket.expired():
+            raise Cancelled("query_timeout")
+
+
+def submit(cls: str, fn, *args, **kwargs) -> tuple[Future, threading.Event]:
+    """Encola `fn` en el executor de `cls`; devuelve (future, evento "empezó")."""
+    b = _budgets[cls]
+    t0 = time.perf_counter()
+    started = threading.Event()
+    with b.lock:
+        if b.waiting >= b.max_queue:
+            b.rejected += 1
+            raise Overloaded(cls, "queue_full")
+        b.waiting += 1
+
+    def task():
+        with b.lock:
+            b.waiting -= 1
+            b._observe(time.perf_counter() - t0)
+            b.running += 1
+        ticket = _ticket.get()
+        if ticket is not None:
+            ticket.start()
+        started.set()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            # consultas sin consumir al final (COPY, DDL) también se miden
+            for con in ticket.tracked if ticket is not None else ():
+                try:
+                    con.flush()
+                except Exception:
+                    pass
+            with b.lock:
+                b.running -= 1
+
+    def on_done(f: Future):
+        if f.cancelled():  # cancelada antes de empezar: sale de la cola
+            with b.lock:
+                b.waiting -= 1
+
+    # el contexto (y con él el ticket de `track`) viaja al hilo del executor
+    ctx = contextvars.copy_context()
+    fut = b.executor.submit(ctx.run, task)
+    fut.add_done_callback(on_done)
+    return fut, started
+
+
+def run_sync(cls: str, fn, *args, **kwargs):
+    """Ejecuta `fn` dentro del cupo de `cls` desde un hilo cualquiera (exports, tareas de fondo)."""
+    token = _ticket.set(_Ticket())
+    try:
+        fut, _ = submit(cls, fn, *args, **kwargs)
+    finally:
+        _ticket.reset(token)
+    return fut.result()
+
+
+def _count(b: _Budget, reason: str):
+    with b.lock:
+        if reason == "query_timeout":
+            b.timeouts += 1
+        else:
+            b.disconnects += 1
+
+
+async def run(cls: str, fn, request: Request | None = None, timeout: float | None = None):
+    """
+    Ejecuta `fn` en el executor de `cls` sin bloquear el event loop. Interrumpe las
+    conexiones registradas con `track()` si vence `timeout` (contado desde que la
+    ejecución empieza) o el cliente se desconecta. En cola solo rige `SCHED_QUEUE_TIMEOUT`.
+    """
+    b = _budgets[cls]
+    ticket = _Ticket(b.timeout if timeout is None else timeout)
+    token = _ticket.set(ticket)
+    try:
+        fut, started = submit(cls, fn)
+    finally:
+        _ticket.reset(token)
+    afut = asyncio.wrap_future(fut)
+    t0 = time.monotonic()
+    while True:
+        done, _ = await asyncio.wait({afut}, timeout=POLL_SECONDS)
+        if done:
+            try:
+                return afut.result()
+            except Cancelled as e:  # el propio hilo cortó una espera (`wait`)
+                _count(b, e.reason)
+                raise
+        if not started.is_set():
+            if time.monotonic() - t0 > settings.SCHED_QUEUE_TIMEOUT and fut.cancel():
+                with b.lock:
+                    b.rejected += 1
+                raise Overloaded(cls, "queue_timeout")
+        if request is not None and await request.is_disconnected():
+            reason = "client_disconnected"
+            break
+        if ticket.expired():
+            reason = "query_timeout"
+            break
+
+    _count(b, reason)
+    ticket.cancel(reason)
+    # el resultado (o la InterruptException) ya no le interesa a nadie
+    afut.add_done_callback(lambda f: f.cancelled() or f.exception())
+    if not fut.cancel():
+        for con in ticket.tracked:
+            try:
+                con.interrupt()
+            except Exception:
+                pass
+    raise Cancelled(reason)
+
+
+def offload(cls: str):
+    """
+    Convierte un endpoint sync en `async`: el cuerpo corre en el executor de `cls`
+    con el timeout del endpoint (`QUERY_TIMEOUTS[<nombre de la función>]` o el de la clase).
+    Agrega `?profile=true` (solo admin): perfil DuckDB de cada consulta en `_profile`.
+    """
+    def deco(fn):
+        sig = inspect.signature(fn)
+        req_name = next((n for n, p in sig.parameters.items() if p.annotation is Request), None)
+        params = list(sig.parameters.values())
+        if req_name is None:
+            req_name = "_request"
+            params.append(inspect.Parameter(req_name, inspect.Parameter.KEYWORD_ONLY, annotation=Request))
+        params.append(inspect.Parameter(
+            "profile", inspect.Parameter.KEYWORD_ONLY, annotation=bool,
+            default=Query(False, description="(admin) perfil DuckDB por operador de cada consulta, en `_profile`"),
+        ))
+        timeout = settings.QUERY_TIMEOUTS.get(fn.__name__)
+
+        async def endpoint(**kwargs):
+            request = kwargs[req_name] if req_name in sig.parameters else kwargs.pop(req_name)
+            sink = None
+            if kwargs.pop("profile"):
+                require_admin(request.headers.get("authorization"))
+                sink = []
+            # el contexto (endpoint, perfil) se copia al hilo del executor en `submit`
+            token = metrics.current_endpoint.set(fn.__name__)
+            ptoken = querylog.profiles.set(sink)
+            metrics.endpoint_in_flight.inc(fn.__name__)
+            try:
+                result = await run(cls, functools.partial(fn, **kwargs), request, timeout)
+                if sink is not None and isinstance(result, dict):
+                    result = {**result, "_profile": sink}
+                return result
+            except Overloaded as e:
+                raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"})
+            except Cancelled as e:
+                # 504 si venció el timeout; con el cliente desconectado la respuesta no llega a nadie
+                raise HTTPException(status_code=504 if e.reason == "query_timeout" else 499, detail=e.reason)
+            finally:
+                metrics.endpoint_in_flight.dec(fn.__name__)
+                querylog.profiles.reset(ptoken)
+                metrics.current_endpoint.reset(token)
+
+        # sin functools.wraps: FastAPI desenvuelve `__wrapped__` y lo trataría como sync
+        endpoint.__name__, endpoint.__qualname__, endpoint.__doc__ = fn.__name__, fn.__qualname__, fn.__doc__
+        endpoint.__signature__ = sig.replace(parameters=params)
+        return endpoint
+    return deco
+
+
+@contextlib.contextmanager
+def query_errors(name: str):
+    """
+    Errores de una consulta → 500 `<name>_query_failed`, con el detalle solo en el log.
+    `Overloaded`/`Cancelled` (503, 504/499 en `offload`) y las HTTPException pasan tal cual.
+    """
+    try:
+        yield
+    except (HTTPException, Overloaded, Cancelled):
+        raise
+    except Exception:
+        log.exception("%s_query_failed", name)
+        raise HTTPException(status_code=500, detail=f"{name}_query_failed")
+
+
+def stats() -> dict:
+    return {name: b.snapshot() for name, b in _budgets.items()}
+
+
+@metrics.collector
+def _families():
+    snaps = stats()
+    yield ("scheduler_running", "gauge", "Ejecuciones en curso por clase.",
+           [({"class": c}, s["running"]) for c, s in snaps.items()])
+    yield ("scheduler_waiting", "gauge", "Trabajos en cola por clase.",
+           [({"class": c}, s["waiting"]) for c, s in snaps.items()])
+    for key, doc in (("admitted", "admitidos"), ("rejected", "rechazados (503)"),
+                     ("timeouts", "cancelados por timeout (504)"), ("disconnects", "cancelados por desconexión")):
+        yield (f"scheduler_{key}_total", "counter", f"Trabajos {doc} por clase.",
+               [({"class": c}, s[key]) for c, s in snaps.items()])
+    yield ("scheduler_queue_wait_seconds_sum", "counter", "Segundos totales de espera en cola por clase.",
+           [({"class": c}, s["wait_seconds_total"]) for c, s in snaps.items()])
@@ -0,0 +1,73 @@
+"""
+Coalescencia de consultas idénticas concurrentes ("single-flight").
+
+Tras una publicación o cuando se comparte un enlace del dashboard llegan
+muchas requests iguales a la vez; con `SingleFlight.do(key, fn)` solo la
+primera ejecuta `fn` y las demás esperan y reciben el mismo resultado (o la
+misma excepción). La clave debe incluir la versión de datos y los parámetros
+canónicos; no es una caché: al terminar la ejecución la clave se libera.
+
+Cada espera pasa por `wait(event)`, que puede cortarla (p. ej. al vencer el
+plazo de la request que espera). Si la ejecución del líder falla porque su
+propia request fue cancelada (`abandoned()` verdadero en su hilo: timeout o
+desconexión), los que esperaban no heredan ese error: uno de ellos reintenta
+como líder.
+"""
+import threading
+from typing import Any, Callable, Hashable
+
+
+class _Call:
+    __slots__ = ("done", "value", "error", "abandoned")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value: Any = None
+        self.error: BaseException | None = None
+        self.abandoned = False  # el líder falló por su propia cancelación
+
+
+class SingleFlight:
+    def __init__(self, wait: Callable[[threading.Event], Any] = threading.Event.wait,
+                 abandoned: Callable[[], bool] = lambda: False):
+        self._lock = threading.Lock()
+        self._calls: dict[Hashable, _Call] = {}
+        self._wait = wait
+        self._abandoned = abandoned
+        self.coalesced = 0  # requests que esperaron a otra en vez de ejecutar
+
+    def do(self, key: Hashable, fn: Callable[[], Any]) -> Any:
+        counted = False
+        while True:
+            with self._lock:
+                call = self._calls.get(key)
+                leader = call is None
+                if leader:
+                    call = self._calls[key] = _Call()
+                elif not counted:
+                    self.coalesced += 1
+                    counted = True
+            if leader:
+                break
+            self._wait(call.done)
+            if call.abandoned:
+                continue
+            if call.error is not None:
+                raise call.error
+            return call.value
+
+        try:
+            call.value = fn()
+            return call.value
+        except BaseException as e:
+            call.error = e
+            call.abandoned = self._abandoned()
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.done.set()
+
+    def in_flight(self) -> int:
+        with self._lock:
+            return len(self._calls)
@@ -0,0 +1,61 @@
+"""
+Posiciones de orden precalculadas para /ruea (ORDER BY ... LIMIT/OFFSET).
+
+Para cada columna de orden frecuente se guarda en `base_ruea` la posición de
+la fila en orden ascendente y descendente (`pos_<col>_asc` / `pos_<col>_desc`),
+con nulos/vacíos siempre al final, igual que la clave `nulls_key` de /ruea.
+Así una página sin filtros es un rango sobre un entero (sin ordenar) y una
+página filtrada ordena sobre una sola columna entera en vez de
+`CASE WHEN NULLIF(TRIM(CAST(...)))` + la expresión.
+
+`base_ruea` queda físicamente ordenada por `pos_documento_asc` (el orden por
+defecto del listado), de modo que los zone maps de DuckDB podan el rango.
+"""
+from .gazetteer import code_col
+
+SORT_COLS = ("documento", "corregimiento", "vereda", "fecha_registro")
+DIRS = ("asc", "desc")
+
+
+def pos_col(col: str, direction: str) -> str:
+    return f"pos_{col}_{direction}"
+
+
+POS_COLS = tuple(pos_col(c, d) for c in SORT_COLS for d in DIRS)
+
+
+def _order_terms(col: str, cols: set[str]) -> tuple[str, str]:
+    # (expresión, clave de nulos) con la misma semántica que /ruea
+    if col in ("corregimiento", "vereda") and code_col(col) in cols:
+        # ids del gazetteer en orden alfabético del nombre normalizado; 0 = vacío
+        code = code_col(col)
+        return code, f"CASE WHEN COALESCE({code}, 0) = 0 THEN 1 ELSE 0 END"
+    expr = f'"{col}"'
+    return expr, f"CASE WHEN NULLIF(TRIM(CAST({expr} AS VARCHAR)), '') IS NULL THEN 1 ELSE 0 END"
+
+
+def build_sort_positions(con, table: str = "base_ruea") -> list[str]:
+    """Agrega las columnas `pos_*` a `table`; devuelve las columnas indexadas."""
+    cols = set(con.table(table).columns)
+    indexed = [c for c in SORT_COLS if c in cols]
+    if not indexed:
+        return []
+
+    terms = []
+    for col in indexed:
+        expr, nulls_key = _order_terms(col, cols)
+        for direction in DIRS:
+            terms.append(
+                f"CAST(ROW_NUMBER() OVER (ORDER BY {nulls_key} ASC, {expr} {direction.upper()}) AS INTEGER)"
+                f" AS {pos_col(col, direction)}"
+            )
+
+    drop = [c for c in POS_COLS if c in cols]
+    star = f"* EXCLUDE ({', '.join(drop)})" if drop else "*"
+    order = pos_col(indexed[0], "asc")
+    con.execute(f"""
+        CREATE OR REPLACE TABLE {table} AS
+        SELECT * FROM (SELECT {star}, {', '.join(terms)} FROM {table})
+        ORDER BY {order};
+    """)
+    return indexed
@@ -0,0 +1,102 @@
+"""
+Perfil por etapa del ETL: tiempo de pared y memoria (RSS) de cada paso.
+
+    prof = StageProfile()
+    with prof.stage("read"):
+        ...
+    prof.info["input_bytes"] = len(data)   # datos sueltos del refresh
+    prof.as_dict()  # {**info, "total_seconds", "peak_rss_mb", "stages": {nombre: {...}}}
+
+El pico de RSS de cada etapa se mide con un hilo que muestrea
+`/proc/self/statm` cada `interval` segundos mientras la etapa corre (incluye
+memoria de pandas/Arrow/DuckDB, no solo objetos Python). Fuera de Linux se
+usa `ru_maxrss` (pico del proceso, no de la etapa) o se omite.
+"""
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+try:
+    _PAGE = os.sysconf("SC_PAGE_SIZE")
+except (AttributeError, ValueError, OSError):  # Windows
+    _PAGE = None
+
+
+def rss_bytes() -> int | None:
+    """RSS actual del proceso, o None si el SO no lo expone."""
+    if _PAGE is not None:
+        try:
+            with open("/proc/self/statm", "rb") as f:
+                return int(f.read().split()[1]) * _PAGE
+        except (OSError, ValueError, IndexError):
+            pass
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if os.uname().sysname == "Darwin" else peak * 1024
+
+
+def _mb(n: int | None) -> float | None:
+    return None if n is None else round(n / (1024 * 1024), 1)
+
+
+class _Sampler(threading.Thread):
+    def __init__(self, interval: float):
+        super().__init__(daemon=True, name="rss-sampler")
+        self.interval = interval
+        self.peak = rss_bytes()
+        self._done = threading.Event()
+
+    def run(self):
+        while not self._done.wait(self.interval):
+            v = rss_bytes()
+            if v is not None and (self.peak is None or v > self.peak):
+                self.peak = v
+
+    def stop(self) -> int | None:
+        self._done.set()
+        self.join()
+        v = rss_bytes()
+        if v is not None and (self.peak is None or v > self.peak):
+            self.peak = v
+        return self.peak
+
+
+class StageProfile:
+    def __init__(self, interval: float = 0.02):
+        self.interval = interval
+        self.stages: dict[str, dict] = {}
+        self.info: dict = {}
+        self._t0 = time.perf_counter()
+
+    @contextmanager
+    def stage(self, name: str):
+        """Mide el bloque como la etapa `name` (si se repite, se acumula)."""
+        start = rss_bytes()
+        sampler = _Sampler(self.interval)
+        sampler.start()
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - t0
+            peak = sampler.stop()
+            end = rss_bytes()
+            st = self.stages.setdefault(name, {"seconds": 0.0, "rss_start_mb": _mb(start),
+                                               "rss_peak_mb": None, "rss_end_mb": None})
+            st["seconds"] = round(st["seconds"] + seconds, 4)
+            if peak is not None:
+                st["rss_peak_mb"] = max(st["rss_peak_mb"] or 0.0, _mb(peak))
+            st["rss_end_mb"] = _mb(end)
+
+    def as_dict(self) -> dict:
+        peaks = [s["rss_peak_mb"] for s in self.stages.values() if s["rss_peak_mb"] is not None]
+        return {
+            **self.info,
+            "total_seconds": round(time.perf_counter() - self._t0, 4),
+            "peak_rss_mb": max(peaks) if peaks else None,
+            "stages": self.stages,
+        }
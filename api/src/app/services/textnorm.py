@@ -25,3 +25,9 @@ def norm_vereda_py(value: str) -> str:
     s = re.sub(r"^\s*sector(es)?\s+", "", s)                      # "sector ", opcional
     s = re.sub(r"^\s*zona(s)?\s+", "", s)                         # "zona ", opcional
     return s
+
+# normalizador autoritativo por tipo territorial (lo usa el gazetteer y los filtros)
+NORMALIZADORES = {
+    "corregimiento": norm_corregimiento_py,
+    "vereda": norm_vereda_py,
+}
@@ -0,0 +1,168 @@
+"""
+Vistas agregadas de `/ruea` (resumen, facetas, stats) y su caché.
+
+Lo que calculan no depende del router: la misma función responde la request,
+prerenderiza la vista sin filtros al publicar (`prerender`), re-ejecuta las
+firmas frecuentes contra la versión en staging (`replay`) y atiende la
+operación `cached` del motor de consultas compartido. `run(endpoint, con,
+params)` despacha por nombre de endpoint con los parámetros canónicos que
+guarda el sketch del warm-up.
+
+`cached()` envuelve una ejecución con la caché de resultados por versión de
+datos y el single-flight; solo las consultas a la versión publicada alimentan
+el sketch (`warmup.record`).
+"""
+import logging
+import time
+from typing import Any, Callable, List
+
+from . import archive, metrics, paths, querylog, sampling, scheduler, warmup
+from .result_cache import MISS, cache_key, results
+from .ruea_query import (
+    VIEW, FILTROS, safe_columns, public_columns, where_ruea, where_clause, conteo_por, distintos,
+)
+from .singleflight import SingleFlight
+
+log = logging.getLogger(__name__)
+
+# facetas/stats idénticas y simultáneas se ejecutan una sola vez
+# quien espera a otra request lo hace con su propio plazo; si el líder fue cancelado, reintenta
+_flight = SingleFlight(wait=scheduler.wait, abandoned=scheduler.cancelled)
+metrics.collector(lambda: [("singleflight_coalesced_total", "counter",
+                            "Requests resueltas esperando una consulta idéntica en curso.",
+                            [({}, _flight.coalesced)])])
+
+
+def data_version(version: str | None) -> str:
+    return version or archive.current_version() or paths.current_dir()
+
+
+def cached(endpoint: str, version: str | None, params: dict, run: Callable[[], Any]) -> Any:
+    """Resultado de `run()` desde la caché de `endpoint`/`params` para la versión de datos."""
+    if querylog.profiles.get() is not None:
+        return run()  # perfil: sin caché ni coalescencia
+    if not version:
+        warmup.record(endpoint, params)
+    key = cache_key(endpoint, data_version(version), params)
+    hit = results.get(key)
+    if hit is not MISS:
+        return hit
+    return _flight.do(key, lambda: results.put(key, run()))
+
+
+def _approx_source(con) -> tuple[str, int, int]:
+    # (tabla, filas de la muestra, filas de la base); versiones sin muestra: la base completa (exacto)
+    if sampling.has_sample(con):
+        return (sampling.SAMPLE_TABLE, *sampling.sizes(con))
+    total = con.execute(f"SELECT COUNT(*) FROM {VIEW}").fetchone()[0]
+    return VIEW, total, total
+
+
+def facetas(con, filtros: dict, debug: bool, approx: bool = False) -> dict:
+    view, n, total = _approx_source(con) if approx else (VIEW, 0, 0)
+    cols: List[str] = safe_columns(con, view)
+    if not cols:
+        return {"corregimiento": [], "vereda": [], "linea_productiva": [], "escolaridad": [], "sexo": []}
+
+    def distinct_for(by: str) -> list[str]:
+        # cada faceta ignora su propio filtro
+        where, binds = where_ruea(cols, filtros, skip=by)
+        with scheduler.query_errors("facetas"):
+            return distintos(con, cols, by, where, binds, source=view)
+
+    out = {by: distinct_for(by) for by in ("corregimiento", "vereda", "linea_productiva", "escolaridad", "sexo")}
+    if approx:
+        # valores vistos en la muestra: puede faltar alguno con menos de `missing_below` registros
+        out["_approx"] = sampling.bounds_info(n, total)
+    if debug:
+        out["_debug"] = {"cols": public_columns(cols)}
+    return out
+
+
+def summary(con, filtros: dict) -> dict:
+    view = VIEW
+    cols = safe_columns(con, view)
+    if not cols:
+        return {"total": 0, "top_corregimiento": [], "top_vereda": []}
+
+    where, params = where_ruea(cols, filtros)
+
+    # total
+    count_sql = f"SELECT COUNT(*) FROM {view}" + where_clause(where)
+    row = con.execute(count_sql, params).fetchone()
+    total = int(row[0]) if row else 0
+
+    # top-5 corregimientos / veredas normalizados
+    top_corr = [{"name": r[0] or "", "total": r[1]} for r in conteo_por(con, cols, "corregimiento", where, params, top=5)]
+    top_ver = [{"name": r[0] or "", "total": r[1]} for r in conteo_por(con, cols, "vereda", where, params, top=5)]
+
+    return {"total": int(total), "top_corregimiento": top_corr, "top_vereda": top_ver}
+
+
+def stats_approx(con, by: str, top: int, filtros: dict) -> dict:
+    """Conteos por `by` estimados desde la muestra: value (N·k/n), low/high al 95 %."""
+    view, n, total = _approx_source(con)
+    cols = safe_columns(con, view)
+    info = sampling.bounds_info(n, total)
+    if not cols or by not in cols:
+        return {"items": [], "_approx": info}
+
+    where, binds = where_ruea(cols, filtros)
+    with scheduler.query_errors("stats"):
+        rows = conteo_por(con, cols, by, where, binds, top=top, source=view)
+        matched = con.execute(f"SELECT COUNT(*) FROM {view}" + where_clause(where), binds).fetchone()[0]
+
+    items = [{"name": r[0], **sampling.estimate(r[1], n, total)} for r in rows if r and r[0] is not None]
+    # sin filtros el total es exacto
+    info["matched"] = sampling.estimate(matched, n, total) if where else {"value": total, "low": total, "high": total}
+    return {"items": items, "_approx": info}
+
+
+def stats(con, by: str, top: int, filtros: dict) -> dict:
+    view = VIEW
+    cols = safe_columns(con, view)
+    if not cols or by not in cols:
+        return {"items": []}
+
+    where, binds = where_ruea(cols, filtros)
+
+    with scheduler.query_errors("stats"):
+        rows = conteo_por(con, cols, by, where, binds, top=top, source=view)
+
+    return {"items": [{"name": r[0], "value": r[1]} for r in rows if r and r[0] is not None]}
+
+
+def _filtros(p: dict) -> dict:
+    return {k: p.get(k) for k in FILTROS}
+
+
+# re-ejecución de una firma (parámetros canónicos del endpoint) con otra conexión
+RUNNERS: dict[str, Callable[[Any, dict], Any]] = {
+    "summary": lambda con, p: summary(con, _filtros(p)),
+    "facetas": lambda con, p: facetas(con, _filtros(p), bool(p.get("debug")), bool(p.get("approx"))),
+    "stats": lambda con, p: (stats_approx if p.get("approx") else stats)(
+        con, p["by"], int(p.get("top", 0)), _filtros(p)),
+}
+
+
+def run(endpoint: str, con, params: dict) -> Any:
+    return RUNNERS[endpoint](con, params)
+
+
+def replay(con, data_version: str, n: int | None = None) -> dict:
+    """Re-ejecuta las firmas frecuentes con `con` y guarda los resultados bajo `data_version`."""
+    t0 = time.perf_counter()
+    out = {"replayed": 0, "failed": 0, "seconds": 0.0}
+    for endpoint, sig, _ in warmup.top_signatures(n):
+        if endpoint not in RUNNERS:
+            continue
+        try:
+            value = run(endpoint, con, dict(sig))
+        except Exception as e:
+            log.warning("warmup %s %s failed: %s", endpoint, sig, e)
+            out["failed"] += 1
+            continue
+        results.put(cache_key(endpoint, data_version, sig), value)
+        out["replayed"] += 1
+    out["seconds"] = round(time.perf_counter() - t0, 3)
+    return out
@@ -0,0 +1,102 @@
+"""
+Calentamiento post-publicación a partir de las consultas más frecuentes.
+
+- Cada request cacheable registra su firma normalizada (endpoint + parámetros
+  canónicos) en un sketch "space-saving" por endpoint: memoria acotada a
+  `WARMUP_SKETCH_SIZE` firmas y conteos aproximados de las más frecuentes.
+- Al arrancar un worker (lifespan de la app), `startup()` abre el snapshot
+  publicado y lee todas las columnas de sus tablas (`base_ruea`,
+  `gaz_territorio`, `mv_*`...): la primera request no paga la apertura ni la
+  lectura en frío (ni la carga de pandas que hace DuckDB con el primer
+  parámetro). El sketch arranca vacío, así que no hay nada que re-ejecutar.
+- Al terminar el staging de una versión (antes del swap), `views.replay()`
+  ejecuta las `WARMUP_TOP_N` firmas más frecuentes (`top_signatures()`)
+  contra la base nueva con una conexión read-only: llena la caché de
+  resultados con la clave de la versión nueva y deja calientes los buffers de
+  DuckDB. El ETL entrega luego esa conexión a `Duck` para que las primeras
+  requests la reutilicen.
+"""
+import logging
+import os
+import threading
+import time
+
+from ..core.config import settings
+from . import paths
+from .duck import Duck
+from .result_cache import canonical
+
+log = logging.getLogger(__name__)
+
+class SpaceSaving:
+    """Top-k aproximado (Metwally et al.): a lo sumo `capacity` contadores."""
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.counts: dict[tuple, int] = {}
+
+    def add(self, item: tuple):
+        if item in self.counts:
+            self.counts[item] += 1
+        elif len(self.counts) < self.capacity:
+            self.counts[item] = 1
+        else:
+            # reemplaza el menos frecuente y hereda su conteo (cota superior)
+            victim = min(self.counts, key=self.counts.__getitem__)
+            self.counts[item] = self.counts.pop(victim) + 1
+
+    def top(self, n: int) -> list[tuple[tuple, int]]:
+        return sorted(self.counts.items(), key=lambda kv: -kv[1])[:n]
+
+
+_sketches: dict[str, SpaceSaving] = {}
+_lock = threading.Lock()
+
+
+def record(endpoint: str, params: dict):
+    sig = canonical(params)
+    with _lock:
+        sk = _sketches.get(endpoint)
+        if sk is None:
+            sk = _sketches[endpoint] = SpaceSaving(settings.WARMUP_SKETCH_SIZE)
+        sk.add(sig)
+
+
+def top_signatures(n: int | None = None) -> list[tuple[str, tuple, int]]:
+    """Las `n` firmas más frecuentes entre todos los endpoints: (endpoint, firma, conteo)."""
+    n = settings.WARMUP_TOP_N if n is None else n
+    with _lock:
+        todas = [(ep, sig, c) for ep, sk in _sketches.items() for sig, c in sk.top(n)]
+    return sorted(todas, key=lambda t: -t[2])[:n]
+
+
+def pretouch(con) -> dict:
+    """Lee cada columna de cada tabla del snapshot una vez; devuelve filas por tabla."""
+    tables = [r[0] for r in con.execute(
+        "SELECT table_name FROM duckdb_tables() WHERE database_name = current_database() ORDER BY table_name"
+    ).fetchall()]
+    out = {}
+    for t in tables:
+        cols = con.table(f'"{t}"').columns
+        # hash() obliga a leer los valores (COUNT(col) puede resolverse con estadísticas)
+        aggs = ", ".join(f'SUM(hash("{c}"))' for c in cols)
+        out[t] = con.execute(f'SELECT COUNT(*){", " + aggs if aggs else ""} FROM "{t}"').fetchone()[0]
+    return out
+
+
+def startup() -> dict:
+    """Abre la conexión read-only de la versión publicada y calienta sus tablas (lifespan)."""
+    t0 = time.perf_counter()
+    stats = {"tables": {}, "seconds": 0.0}
+    if not os.path.exists(paths.current_db_path()):
+        return stats  # aún no hay nada publicado
+    try:
+        cur = Duck.ro().cursor()
+        # DuckDB importa pandas/numpy al bindear el primer parámetro: que lo pague el arranque
+        cur.execute("SELECT ?", [0]).fetchall()
+        stats["tables"] = pretouch(cur)
+    except Exception as e:  # un snapshot ilegible no impide arrancar
+        log.warning("startup warm-up failed: %s", e)
+    stats["seconds"] = round(time.perf_counter() - t0, 3)
+    log.info("startup warm-up: %d tablas en %.3f s", len(stats["tables"]), stats["seconds"])
+    return stats
@@ -0,0 +1,250 @@
+"""
+Perfil rápido de un libro Excel para armar `sheet_map`/`header_rows` de
+`/admin/refresh-xlsx` (`POST /admin/inspect` y `inspeccionar_excel.py`).
+
+Cada hoja se lee una sola vez en streaming, directo del XML del xlsx: las
+primeras `SCAN_ROWS` filas pasan por un parser incremental (encabezado). Si
+la hoja declara su dimensión se deja de leer ahí; si no (p. ej. libros
+escritos en modo streaming) o con `exact`, en el mismo recorrido se cuentan
+las filas (`<row>`) del resto de la hoja sin construir celdas. De la tabla de textos compartidos solo se lee hasta el
+último índice que usan esas primeras filas. openpyxl, en cambio, carga la
+tabla completa al abrir el libro (incluso en `read_only`) y `ws.cell()` en
+read-only vuelve a parsear la hoja en cada acceso. Las hojas se procesan en
+paralelo con hilos (la descompresión con zlib libera el GIL).
+
+Sin dependencias de la app (ni settings ni openpyxl): lo importa también el
+script de la raíz.
+"""
+import posixpath
+import re
+import time
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from xml.etree import ElementTree
+
+SCAN_ROWS = 15                 # filas donde se busca el encabezado
+CHUNK = 1 << 20                # bytes descomprimidos por lectura al contar filas
+HEAD_CHUNK = 1 << 16           # lecturas chicas mientras se busca el encabezado
+_NS = "{http://schemas.openxmlformats.org/spreadsheetml/2006/main}"
+_NS_REL = "{http://schemas.openxmlformats.org/officeDocument/2006/relationships}"
+_NS_PKG = "{http://schemas.openxmlformats.org/package/2006/relationships}"
+_ROW_TAG = re.compile(rb"<(?:\w{1,10}:)?row[\s>/]")
+_TAIL = 16                     # > largo máximo de `_ROW_TAG`: una etiqueta cortada entre lecturas
+_CELL_REF = re.compile(r"[A-Z]+")
+_LAST_ROW = re.compile(r"(\d+)$")
+
+
+def normalize(v) -> str:
+    if v is None:
+        return ""
+    return str(v).strip()
+
+
+def guess_header_row(rows: list[tuple], max_scan_rows: int = SCAN_ROWS) -> int:
+    """Primera fila (1-based) con >= 2 celdas no vacías entre `rows` (posible encabezado)."""
+    for r, vals in enumerate(rows[:max_scan_rows], start=1):
+        if sum(normalize(v) != "" for v in vals) >= 2:
+            return r
+    return 1
+
+
+def read_headers(row: tuple) -> list[str]:
+    cols = [normalize(v) for v in row]
+    # recortar vacíos al final
+    while cols and cols[-1] == "":
+        cols.pop()
+    return cols
+
+
+def guess_module(sheet_name: str, headers: list[str]) -> str:
+    s = sheet_name.lower()
+    cols = " ".join(h.lower() for h in headers)
+    if "ruea" in s: return "ruea"
+    if "comer" in s or "comercial" in s: return "comercializacion"
+    if "indic" in s: return "indicadores"
+    if "nodo" in s: return "nodos"
+    if ("anio" in cols and "estrategia" in cols) or "monto" in cols: return "comercializacion"
+    if "cumplimiento" in cols or "indicador" in cols: return "indicadores"
+    if any(k in cols for k in ["corregimiento", "vereda", "linea_productiva", "escolaridad"]): return "ruea"
+    if any(k in cols for k in ["id_nodo", "nombre_nodo", "productor_id"]): return "nodos"
+    return ""
+
+
+# --- lectura del paquete xlsx -------------------------------------------------
+
+class _Shared(int):
+    """Índice en la tabla de textos compartidos (se resuelve al final)."""
+
+
+def sheet_parts(z: zipfile.ZipFile) -> list[tuple[str, str]]:
+    """(nombre, parte del zip) de cada hoja, en el orden del libro."""
+    wb = ElementTree.fromstring(z.read("xl/workbook.xml"))
+    rels = ElementTree.fromstring(z.read("xl/_rels/workbook.xml.rels"))
+    target = {r.get("Id"): r.get("Target") for r in rels.iter(f"{_NS_PKG}Relationship")}
+    out = []
+    for s in wb.iter(f"{_NS}sheet"):
+        t = target.get(s.get(f"{_NS_REL}id"), "")
+        part = t.lstrip("/") if t.startswith("/") else posixpath.normpath(posixpath.join("xl", t))
+        out.append((s.get("name"), part))
+    return out
+
+
+def _col_index(ref: str | None, default: int) -> int:
+    """Columna 0-based de una referencia `AB12` (`default` si la celda no la trae)."""
+    m = _CELL_REF.match(ref or "")
+    if not m:
+        return default
+    col = 0
+    for ch in m.group(0):
+        col = col * 26 + ord(ch) - 64
+    return col - 1
+
+
+def _text(el) -> str:
+    """Texto de un `<si>`/`<is>`: `<t>` directo o las corridas `<r><t>` (sin la fonética `<rPh>`)."""
+    t = el.find(f"{_NS}t")
+    if t is not None:
+        return t.text or ""
+    return "".join(r.findtext(f"{_NS}t") or "" for r in el.findall(f"{_NS}r"))
+
+
+def _cell_value(c):
+    t = c.get("t")
+    if t == "inlineStr":
+        inline = c.find(f"{_NS}is")
+        return None if inline is None else _text(inline)
+    v = c.find(f"{_NS}v")
+    if v is None or v.text is None:
+        return None
+    return _Shared(v.text) if t == "s" else v.text
+
+
+def _scan_sheet(path: str, name: str, part: str, scan_rows: int, exact: bool) -> dict:
+    """
+    Primeras `scan_rows` filas (valores crudos) y filas de la hoja, en una pasada.
+
+    Si la hoja declara su dimensión (`<dimension ref="A1:M5000"/>`, la escribe
+    Excel) y es creíble, se deja de leer apenas se tiene el encabezado; si no,
+    o con `exact`, se recorre la hoja entera contando los `<row>`.
+    """
+    parser = ElementTree.XMLPullParser(events=("end",))
+    head: dict[int, dict[int, object]] = {}
+    parsing, count, tail, seq, declared = True, 0, b"", 0, None
+    with zipfile.ZipFile(path) as z, z.open(part) as f:
+        while chunk := f.read(HEAD_CHUNK if parsing else CHUNK):
+            if parsing:
+                parser.feed(chunk)
+                for _, el in parser.read_events():
+                    if el.tag == f"{_NS}dimension":
+                        m = _LAST_ROW.search(el.get("ref") or "")
+                        declared = int(m.group(1)) if m else None
+                        continue
+                    if el.tag != f"{_NS}row":
+                        continue
+                    seq += 1
+                    r = int(el.get("r") or seq)
+                    seq = r
+                    if r > scan_rows:
+                        parsing = False
+                        break
+                    cells = head.setdefault(r, {})
+                    for i, c in enumerate(el.iter(f"{_NS}c")):
+                        cells[_col_index(c.get("r"), i)] = _cell_value(c)
+                    el.clear()
+                if not parsing and not exact and declared is not None and declared >= seq:
+                    return {"sheet": name, "rows_raw": head, "last_row": declared, "exact": False}
+            buf = tail + chunk
+            last = 0
+            for m in _ROW_TAG.finditer(buf):
+                count += 1
+                last = m.end()
+            tail = buf[max(last, len(buf) - _TAIL):]
+    return {"sheet": name, "rows_raw": head, "row_elements": count, "exact": True}
+
+
+def _shared_strings(path: str, wanted: set[int]) -> dict[int, str]:
+    """Textos compartidos con índice en `wanted`; deja de leer al pasar el mayor."""
+    if not wanted:
+        return {}
+    top, out, i = max(wanted), {}, 0
+    with zipfile.ZipFile(path) as z:
+        if "xl/sharedStrings.xml" not in z.namelist():
+            return {}
+        with z.open("xl/sharedStrings.xml") as f:
+            for _, el in ElementTree.iterparse(f, events=("end",)):
+                if el.tag != f"{_NS}si":
+                    continue
+                if i in wanted:
+                    out[i] = _text(el)
+                el.clear()
+                i += 1
+                if i > top:
+                    break
+    return out
+
+
+def _profile(scan: dict, strings: dict[int, str], scan_rows: int) -> dict:
+    raw = scan["rows_raw"]
+    width = max((max(cells) + 1 for cells in raw.values() if cells), default=0)
+    rows = []
+    for r in range(1, min(max(raw, default=0), scan_rows) + 1):
+        cells = raw.get(r, {})
+        rows.append(tuple(strings.get(v, "") if isinstance(v, _Shared) else v
+                          for v in (cells.get(c) for c in range(width))))
+    header_row = guess_header_row(rows, scan_rows)
+    headers = read_headers(rows[header_row - 1]) if rows else []
+    if scan["exact"]:  # elementos <row> después del encabezado
+        n = max(scan["row_elements"] - sum(1 for r in raw if r <= header_row), 0)
+    else:  # según la dimensión declarada, como `ws.max_row` de openpyxl
+        n = max(scan["last_row"] - header_row, 0)
+    return {"sheet": scan["sheet"], "header_row": header_row, "rows": n, "rows_exact": scan["exact"],
+            "columns": len(headers),
+            "module": guess_module(scan["sheet"], headers), "headers": headers}
+
+
+def suggest(sheets: list[dict]) -> tuple[dict, dict]:
+    """`sheet_map`/`header_rows` sugeridos: por módulo, la hoja con más filas."""
+    sheet_map, header_rows = {}, {}
+    for s in sorted((s for s in sheets if s.get("module")), key=lambda s: -s["rows"]):
+        if s["module"] not in sheet_map:
+            sheet_map[s["module"]] = s["sheet"]
+            header_rows[s["module"]] = s["header_row"]
+    return sheet_map, header_rows
+
+
+def inspect_workbook(path: str, exact: bool = False, workers: int = 4, scan_rows: int = SCAN_ROWS) -> dict:
+    """
+    Perfil de todas las hojas de `path` y la sugerencia para `/admin/refresh-xlsx`.
+
+    `rows` son las filas después del encabezado: según la dimensión declarada
+    o, con `exact` (o sin dimensión), contando las filas del XML (las vacías
+    con formato también cuentan); `rows_exact` indica cuál. Lanza
+    `zipfile.BadZipFile`/`KeyError` si `path` no es un xlsx.
+    """
+    t0 = time.perf_counter()
+    with zipfile.ZipFile(path) as z:
+        parts = sheet_parts(z)
+
+    def scan(item):
+        name, part = item
+        if "/worksheets/" not in f"/{part}":
+            return {"sheet": name, "error": "no es una hoja de datos (gráfico o macro)"}
+        try:
+            return _scan_sheet(path, name, part, scan_rows, exact)
+        except Exception as e:  # XML roto, parte faltante…: se informa y se sigue
+            return {"sheet": name, "error": str(e)}
+
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(parts)))) as pool:
+        scans = list(pool.map(scan, parts))
+
+    wanted = {v for s in scans if "rows_raw" in s
+              for cells in s["rows_raw"].values() for v in cells.values() if isinstance(v, _Shared)}
+    strings = _shared_strings(path, wanted)
+    sheets = [_profile(s, strings, scan_rows) if "rows_raw" in s else s for s in scans]
+    sheet_map, header_rows = suggest(sheets)
+    return {
+        "sheets": sheets,
+        "sheet_map": sheet_map,
+        "header_rows": header_rows,
+        "seconds": round(time.perf_counter() - t0, 3),
+    }
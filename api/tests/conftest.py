@@ -0,0 +1,38 @@
+import os
+import tempfile
+
+import pytest
+
+# la configuración se lee al importar `app`: cada corrida usa su propio DATA_DIR vacío
+_data = tempfile.mkdtemp(prefix="portal-tests-")
+os.environ["DATA_DIR"] = _data
+os.environ["DB_PATH"] = os.path.join(_data, "current", "duckdb.db")
+os.environ.setdefault("METRICS_ENABLED", "false")
+os.environ.pop("QUERY_ENGINE_SOCKET", None)
+
+from sintetico import cambiada, publicar, registros  # noqa: E402
+
+
+@pytest.fixture(scope="session")
+def publicado() -> str:
+    """Versión publicada con el libro sintético (`sintetico.registros()`)."""
+    out = publicar(registros())
+    assert out["prerender"]["failed"] == [] and out["prerender"]["files"] > 0
+    return out["version"]
+
+
+@pytest.fixture(scope="session")
+def versiones(publicado) -> dict:
+    """base → `sintetico.cambiada()` → base otra vez: el archivo conserva una versión no publicada."""
+    out = {"base": publicado, "cambiada": publicar(cambiada())["version"]}
+    out["actual"] = publicar(registros())["version"]
+    return out
+
+
+@pytest.fixture(scope="session")
+def client(publicado):
+    from fastapi.testclient import TestClient
+
+    from app.main import app
+    with TestClient(app) as c:
+        yield c
@@ -0,0 +1,54 @@
+"""Libro RUEA sintético para los tests que necesitan una versión publicada."""
+import io
+import time
+
+import pandas as pd
+
+CORREGIMIENTOS = ["Altavista", "Santa Elena", "San Cristóbal"]
+VEREDAS = ["El Corazón", "  la suiza ", "Travesías"]
+FILAS = 60
+
+
+def registro(i: int, **cambios) -> dict:
+    """Fila `i` del libro (encabezados como en la hoja GENERAL del Excel maestro)."""
+    row = {
+        "Documento": 10_000_000 + i,
+        "Nombres": f"N{i}", "Apellidos": "A",
+        "Sexo": "FMX"[i % 3], "Edad": 20 + i % 50, "Estrato": i % 6,
+        "Escolaridad": ["primaria", "Secundaria", "técnica"][i % 3],
+        "Corregimiento": CORREGIMIENTOS[i % 3], "Vereda": VEREDAS[(i // 3) % 3],
+        "Linea Productiva": ["Agrícola", "Pecuaria"][i % 2],
+        "Fecha de registro": pd.Timestamp("2024-01-01") + pd.Timedelta(days=i),
+        "Telefono": 3_000_000_000 + i, "Email": f"x{i}@example.com",
+    }
+    row.update(cambios)
+    return row
+
+
+def registros(n: int = FILAS) -> list[dict]:
+    return [registro(i) for i in range(n)]
+
+
+def libro(filas: list[dict]) -> bytes:
+    buf = io.BytesIO()
+    with pd.ExcelWriter(buf, engine="openpyxl") as xw:
+        pd.DataFrame(filas).to_excel(xw, index=False, sheet_name="GENERAL")
+    return buf.getvalue()
+
+
+def publicar(filas: list[dict]) -> dict:
+    """Publica `filas` con el ETL y devuelve su resultado (versión, prerender, perfil...)."""
+    from app.services import archive, etl
+
+    # la versión se nombra por segundo: no publicar dos veces en el mismo
+    while etl._ts() in archive.list_versions():
+        time.sleep(0.05)
+    return etl.run_refresh_from_workbook(libro(filas), {"ruea": "GENERAL"})
+
+
+def cambiada() -> list[dict]:
+    """Libro base con 2 registros eliminados, 2 agregados y 2 con cambios (para `?version=` y el diff)."""
+    filas = [registro(i) for i in range(2, FILAS + 2)]  # sin 0 y 1; con FILAS y FILAS + 1
+    filas[3] = registro(5, Vereda="La Palma")
+    filas[4] = registro(6, Edad=99, Escolaridad="universitaria")
+    return filas
@@ -0,0 +1,45 @@
+import logging
+import time
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.core.config import settings
+from app.routers import admin
+
+AUTH = {"Authorization": "Bearer test-token"}
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(settings, "ADMIN_TOKEN", "test-token")
+    app = FastAPI()
+    app.include_router(admin.router)
+    return TestClient(app)
+
+
+def test_refresh_requires_token(client):
+    r = client.post("/api/v1/admin/refresh", files={"ruea": ("ruea.csv", b"x")})
+    assert r.status_code == 401
+    r = client.post("/api/v1/admin/refresh", files={"ruea": ("ruea.csv", b"x")},
+                    headers={"Authorization": "Bearer otro"})
+    assert r.status_code == 401
+
+
+def test_refresh_without_files_is_400(client):
+    assert client.post("/api/v1/admin/refresh", headers=AUTH).status_code == 400
+
+
+def test_failed_background_refresh_is_logged(client, caplog):
+    caplog.set_level(logging.ERROR, logger=admin.log.name)
+    r = client.post("/api/v1/admin/refresh", headers=AUTH,
+                    files={"ruea": ("ruea.xlsx", b"esto no es un libro de Excel")})
+    assert r.status_code == 200
+    assert r.json() == {"status": "scheduled"}
+    t0 = time.monotonic()
+    while not any(rec.message == "refresh falló" for rec in caplog.records):
+        assert time.monotonic() - t0 < 30, "el fallo del ETL no quedó en el log"
+        time.sleep(0.05)
+    rec = next(rec for rec in caplog.records if rec.message == "refresh falló")
+    assert rec.exc_info is not None
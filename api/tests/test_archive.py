@@ -0,0 +1,86 @@
+import json
+import os
+from datetime import datetime, timezone
+
+import pytest
+
+from app.services import archive, paths
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    """Archivo, almacén de objetos, exports y perfiles en un DATA_DIR propio del test."""
+    monkeypatch.setattr(paths, "ARCHIVE", str(tmp_path / "archive"))
+    monkeypatch.setattr(paths, "EXPORTS", str(tmp_path / "exports"))
+    monkeypatch.setattr(paths, "PROFILES", str(tmp_path / "profiles"))
+    monkeypatch.setattr(paths, "POINTER", str(tmp_path / "CURRENT_VERSION"))
+    monkeypatch.setattr(paths, "CURRENT", str(tmp_path / "current"))
+    monkeypatch.setattr(archive, "OBJECTS", str(tmp_path / "archive" / ".objects"))
+    os.makedirs(paths.ARCHIVE)
+    return tmp_path
+
+
+def _version(name: str, files: dict[str, bytes]) -> str:
+    vdir = os.path.join(paths.ARCHIVE, name)
+    for rel, data in files.items():
+        path = os.path.join(vdir, rel)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb") as f:
+            f.write(data)
+    archive.dedupe_artifacts(vdir)
+    return vdir
+
+
+def _objects() -> list[str]:
+    return sorted(name for _, _, files in os.walk(archive.OBJECTS) for name in files)
+
+
+def test_identical_artifacts_share_one_object(store):
+    _version("2026-01-01T00-00-00Z", {"parquet/ruea.parquet": b"same", "q.xlsx": b"v1"})
+    _version("2026-01-02T00-00-00Z", {"parquet/ruea.parquet": b"same", "q.xlsx": b"v2"})
+    assert len(_objects()) == 3
+    a = os.stat(os.path.join(paths.ARCHIVE, "2026-01-01T00-00-00Z", "parquet", "ruea.parquet"))
+    b = os.stat(os.path.join(paths.ARCHIVE, "2026-01-02T00-00-00Z", "parquet", "ruea.parquet"))
+    assert a.st_ino == b.st_ino
+
+
+def test_retention_removes_old_versions_and_unreferenced_objects(store):
+    _version("2026-01-01T00-00-00Z", {"parquet/ruea.parquet": b"shared", "q.xlsx": b"old only"})
+    _version("2026-01-02T00-00-00Z", {"parquet/ruea.parquet": b"shared", "q.xlsx": b"pinned"})
+    archive.set_pinned("2026-01-02T00-00-00Z", True)
+    _version("2026-01-03T00-00-00Z", {"parquet/ruea.parquet": b"shared", "q.xlsx": b"new"})
+    for v in ("2026-01-01T00-00-00Z", "gone"):
+        os.makedirs(os.path.join(paths.EXPORTS, v))
+
+    out = archive.apply_retention(keep_versions=1, keep_days=0)
+
+    assert out["removed"] == ["2026-01-01T00-00-00Z"]
+    assert archive.list_versions() == ["2026-01-02T00-00-00Z", "2026-01-03T00-00-00Z"]
+    # solo el reporte de la versión borrada quedó sin enlaces; el Parquet compartido sigue
+    assert out["objects_removed"] == 1
+    assert len(_objects()) == 3
+    # exports de la versión borrada y de versiones que ya no existen
+    assert out["exports_removed"] == 2
+    assert os.listdir(paths.EXPORTS) == []
+
+
+def test_gc_keeps_objects_still_linked(store):
+    _version("2026-01-01T00-00-00Z", {"parquet/ruea.parquet": b"a"})
+    assert archive.gc_objects() == 0
+    assert len(_objects()) == 1
+
+
+def test_versions_sort_by_date_not_by_name(store):
+    for v in ("2026-01-01T00-00-00Z", "2026-01-03T00-00-00Z", "legacy-2026-01-05T00-00-00Z", "manual"):
+        _version(v, {"q.xlsx": v.encode()})
+    # carpeta heredada sin fecha en el nombre: vale su mtime (anterior a todas)
+    old = datetime(2025, 6, 1, tzinfo=timezone.utc).timestamp()
+    os.utime(os.path.join(paths.ARCHIVE, "legacy-2026-01-05T00-00-00Z"), (old, old))
+    with open(os.path.join(paths.ARCHIVE, "manual", "meta.json"), "w", encoding="utf-8") as f:
+        json.dump({"created_at": "2026-01-02T00-00-00Z"}, f)
+
+    assert archive.list_versions() == ["legacy-2026-01-05T00-00-00Z", "2026-01-01T00-00-00Z",
+                                       "manual", "2026-01-03T00-00-00Z"]
+    out = archive.apply_retention(keep_versions=2, keep_days=0)
+    assert sorted(out["removed"]) == ["2026-01-01T00-00-00Z", "legacy-2026-01-05T00-00-00Z"]
+    assert [v["version"] for v in archive.describe_versions()] == ["2026-01-03T00-00-00Z", "manual"]
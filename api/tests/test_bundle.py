@@ -0,0 +1,36 @@
+import pytest
+
+FILTROS = [
+    {},
+    {"sexo": "F"},
+    {"linea_productiva": "Pecuaria", "vereda": "la suiza"},
+    {"corregimiento": "San Cristóbal", "escolaridad": "tecnica", "sexo": "X"},
+]
+
+
+def _get(client, path, **params):
+    r = client.get(f"/api/v1/ruea{path}", params=params)
+    assert r.status_code == 200, r.text
+    return r.json()
+
+
+@pytest.mark.parametrize("filtros", FILTROS)
+def test_bundle_coincide_con_los_endpoints(client, filtros):
+    orden = {"order_by": "vereda", "order_dir": "desc", "limit": 7, "offset": 3}
+    bundle = _get(client, "/bundle", **filtros, **orden, stats="vereda:2,linea_productiva")
+    assert bundle["ruea"]["total"] > 0 and bundle["ruea"]["items"]
+
+    assert bundle["ruea"] == _get(client, "", **filtros, **orden)
+    assert bundle["facetas"] == _get(client, "/facetas", **filtros)
+    assert bundle["summary"] == _get(client, "/summary", **filtros)
+    assert bundle["stats"]["vereda"] == _get(client, "/stats", by="vereda", top=2, **filtros)["items"]
+    assert bundle["stats"]["linea_productiva"] == _get(client, "/stats", by="linea_productiva", **filtros)["items"]
+
+
+def test_cada_faceta_ignora_su_propio_filtro(client):
+    bundle = _get(client, "/bundle", sexo="F", vereda="la suiza", limit=0)
+    assert bundle["ruea"]["items"] == []
+    # la faceta de sexo no se restringe con sexo=F (ni la de vereda con vereda=...)
+    assert len(bundle["facetas"]["sexo"]) == 3
+    assert bundle["facetas"]["sexo"] == _get(client, "/facetas", vereda="la suiza")["sexo"]
+    assert bundle["facetas"]["vereda"] == _get(client, "/facetas", sexo="F")["vereda"]
@@ -0,0 +1,78 @@
+from collections import OrderedDict
+
+import duckdb
+import pytest
+
+from app.services import diff
+
+
+@pytest.fixture
+def lru(monkeypatch):
+    """LRU de pares vacío y de un solo lugar."""
+    monkeypatch.setattr(diff, "_pairs", OrderedDict())
+    monkeypatch.setattr(diff, "MAX_PAIRS", 1)
+
+
+def _closed(con) -> bool:
+    try:
+        con.execute("SELECT COUNT(*) FROM diff").fetchone()
+        return False
+    except duckdb.ConnectionException:
+        return True
+
+
+def test_evicted_pair_is_closed(versiones, lru):
+    diff.resumen(versiones["base"], versiones["cambiada"])
+    first = diff._pairs[(versiones["base"], versiones["cambiada"])]
+    diff.resumen(versiones["cambiada"], versiones["actual"])
+    assert first.evicted and _closed(first.con)
+
+
+def test_pair_evicted_while_read_closes_after_the_page(versiones, lru):
+    with diff._reading(versiones["base"], versiones["cambiada"]) as pair:
+        diff.resumen(versiones["cambiada"], versiones["actual"])
+        assert pair.evicted and not _closed(pair.con)
+    assert _closed(pair.con)
+    # una página posterior reconstruye el par
+    total, _ = diff.detalle(versiones["base"], versiones["cambiada"])
+    assert total == 6
+
+
+def _diff(client, desde, hasta, **params):
+    r = client.get("/api/v1/ruea/diff", params={"from": desde, "to": hasta, **params})
+    assert r.status_code == 200, r.text
+    return r.json()
+
+
+def test_resumen_y_detalle(client, versiones):
+    out = _diff(client, versiones["base"], versiones["cambiada"])
+    assert (out["added"], out["removed"], out["changed"], out["unchanged"]) == (2, 2, 2, 56)
+    assert out["columnas"] == {"edad": 1, "escolaridad": 1, "vereda": 1}
+    assert out["columnas_agregadas"] == out["columnas_eliminadas"] == []
+    assert out["total"] == 6
+
+    por_doc = {i["documento"]: i for i in out["items"]}
+    assert {d for d, i in por_doc.items() if i["estado"] == "removed"} == {"10000000", "10000001"}
+    assert {d for d, i in por_doc.items() if i["estado"] == "added"} == {"10000060", "10000061"}
+    assert por_doc["10000006"]["cambios"] == ["edad", "escolaridad"]
+    assert por_doc["10000006"]["antes"] == {"edad": 26, "escolaridad": "primaria"}
+    assert por_doc["10000006"]["despues"] == {"edad": 99, "escolaridad": "universitaria"}
+    assert por_doc["10000000"]["despues"] is None and por_doc["10000000"]["antes"]["nombres"] == "N0"
+    assert por_doc["10000060"]["antes"] is None and por_doc["10000060"]["despues"]["nombres"] == "N60"
+
+
+def test_detalle_por_estado_y_paginado(client, versiones):
+    desde, hasta = versiones["base"], versiones["cambiada"]
+    changed = _diff(client, desde, hasta, estado="changed")
+    assert changed["total"] == 2 and {i["estado"] for i in changed["items"]} == {"changed"}
+
+    paginas = [i["documento"] for off in range(3) for i in _diff(client, desde, hasta, limit=2, offset=2 * off)["items"]]
+    assert paginas == [i["documento"] for i in _diff(client, desde, hasta)["items"]]
+
+
+def test_diff_inverso_y_sin_cambios(client, versiones):
+    inverso = _diff(client, versiones["cambiada"], versiones["base"])
+    assert (inverso["added"], inverso["removed"], inverso["changed"]) == (2, 2, 2)
+    igual = _diff(client, versiones["base"], versiones["actual"])
+    assert (igual["added"], igual["removed"], igual["changed"], igual["total"]) == (0, 0, 0, 0)
+    assert client.get("/api/v1/ruea/diff", params={"from": "no-existe", "to": versiones["base"]}).status_code == 404
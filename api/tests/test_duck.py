@@ -0,0 +1,70 @@
+import gc
+from collections import OrderedDict
+
+import duckdb
+import pytest
+
+from app.core.config import settings
+from app.services import paths
+from app.services.duck import Duck
+
+
+@pytest.fixture
+def versiones(tmp_path, monkeypatch):
+    """Tres versiones archivadas mínimas y LRUs de `Duck` vacíos."""
+    monkeypatch.setattr(paths, "ARCHIVE", str(tmp_path))
+    monkeypatch.setattr(Duck, "_versions", OrderedDict())
+    monkeypatch.setattr(Duck, "_bulk", OrderedDict())
+    monkeypatch.setattr(Duck, "_retired", [])
+    names = ["v1", "v2", "v3"]
+    for i, v in enumerate(names):
+        (tmp_path / v).mkdir()
+        con = duckdb.connect(str(tmp_path / v / "duckdb.db"))
+        con.execute(f"CREATE TABLE t AS SELECT {i} AS v")
+        con.close()
+    return names
+
+
+def _closed(con) -> bool:
+    try:
+        con.execute("SELECT 1")
+        return False
+    except duckdb.ConnectionException:
+        return True
+
+
+def test_bulk_evicted_idle_instance_is_closed(versiones):
+    Duck.bulk("v1").close()
+    first = Duck._bulk[next(iter(Duck._bulk))].con
+    gc.collect()
+    Duck.bulk("v2")
+    Duck.bulk("v3")
+    assert len(Duck._bulk) == 2
+    assert _closed(first)
+
+
+def test_bulk_evicted_instance_waits_for_its_cursors(versiones):
+    cur = Duck.bulk("v1")
+    first = Duck._bulk[next(iter(Duck._bulk))].con
+    Duck.bulk("v2")
+    Duck.bulk("v3")
+    # sigue en uso: se retira sin cerrar y el cursor termina su trabajo
+    assert not _closed(first)
+    assert cur.execute("SELECT v FROM t").fetchone() == (0,)
+    del cur
+    gc.collect()
+    assert Duck.sweep() == 1
+    assert _closed(first)
+    assert Duck._retired == []
+
+
+def test_archived_version_expires_when_idle(versiones, monkeypatch):
+    monkeypatch.setattr(settings, "ARCHIVE_CONN_IDLE_SECONDS", 60)
+    cur = Duck.for_version("v1")
+    con = Duck._versions["v1"].con
+    assert Duck.sweep(now=Duck._versions["v1"].used + 120) == 0  # con un cursor vivo no expira
+    del cur
+    gc.collect()
+    Duck.sweep(now=Duck._versions["v1"].used + 120)
+    assert "v1" not in Duck._versions
+    assert _closed(con)
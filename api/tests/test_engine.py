@@ -0,0 +1,104 @@
+import os
+import shutil
+import tempfile
+import threading
+
+import pytest
+
+from app.core.config import settings
+from app.services import engine, scheduler
+from app.services.duck import Duck
+from sintetico import FILAS
+
+
+@pytest.fixture
+def motor(publicado, monkeypatch):
+    """Motor escuchando en un socket temporal, en un hilo de este proceso."""
+    d = tempfile.mkdtemp(prefix="motor-")  # ruta corta: los sockets Unix tienen límite de largo
+    path = os.path.join(d, "engine.sock")
+    server = engine._Server(path, engine._Session)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    monkeypatch.setattr(settings, "QUERY_ENGINE_SOCKET", path)
+    yield path
+    server.shutdown()
+    server.server_close()
+    shutil.rmtree(d, ignore_errors=True)
+
+
+def _local(sql: str) -> list[tuple]:
+    cur = Duck.ro().cursor()
+    try:
+        return cur.execute(sql).fetchall()
+    finally:
+        cur.close()
+
+
+def test_execute_devuelve_lo_mismo_que_duckdb(motor):
+    sql = "SELECT documento, edad, estrato FROM base_ruea ORDER BY documento"
+    cur = engine.cursor()
+    try:
+        assert cur.execute(sql).fetchall() == _local(sql)
+        assert [d[0] for d in cur.description] == ["documento", "edad", "estrato"]
+        cur.execute(sql)
+        assert cur.fetchone() == _local(sql)[0]
+        assert cur.fetchmany(2) == _local(sql)[1:3]
+        assert len(cur.fetch_df()) == FILAS - 3
+        assert cur.table("base_ruea").columns == [c[0] for c in _local("DESCRIBE base_ruea")]
+        # varios record batches en el mismo stream
+        n = engine.BATCH_ROWS * 2 + 5
+        assert len(cur.execute(f"SELECT range FROM range({n})").fetchall()) == n
+    finally:
+        cur.close()
+
+
+def test_error_de_consulta_no_corta_la_sesion(motor):
+    cur = engine.cursor()
+    try:
+        with pytest.raises(engine.EngineError, match="CatalogException"):
+            cur.execute("SELECT * FROM no_existe")
+        assert cur.execute("SELECT 42").fetchone() == (42,)
+    finally:
+        cur.close()
+
+
+def test_interrupt_desde_otra_conexion(motor):
+    cur = engine.cursor()
+    try:
+        cur.execute("SELECT 1")  # abre la sesión
+        threading.Timer(0.3, cur.interrupt).start()
+        with pytest.raises(engine.EngineError, match="Interrupt"):
+            cur.execute("SELECT SUM(hash(range)) FROM range(100000000000)")
+    finally:
+        cur.close()
+
+
+def test_stats_cuenta_sesiones_y_consultas(motor):
+    antes = engine.stats()
+    cur = engine.cursor()
+    try:
+        cur.execute("SELECT 1").fetchall()
+        cur.execute("SELECT 2").fetchall()
+        durante = engine.stats()
+    finally:
+        cur.close()
+    assert durante["sessions_total"] == antes["sessions_total"] + 1
+    assert durante["queries_total"] == antes["queries_total"] + 2
+    assert durante["pid"] == os.getpid()
+
+
+def test_endpoints_por_el_motor(client, motor, monkeypatch):
+    assert engine.enabled()
+    params = {"sexo": "F", "order_by": "vereda", "limit": 5}
+    remoto = client.get("/api/v1/ruea", params=params).json()
+    stats = client.get("/api/v1/ruea/stats", params={"by": "vereda", "sexo": "F"}).json()
+    monkeypatch.setattr(settings, "QUERY_ENGINE_SOCKET", "")
+    assert remoto == client.get("/api/v1/ruea", params=params).json()
+    assert stats == client.get("/api/v1/ruea/stats", params={"by": "vereda", "sexo": "F"}).json()
+
+
+def test_motor_caido(client, monkeypatch):
+    monkeypatch.setattr(settings, "QUERY_ENGINE_SOCKET", os.path.join(tempfile.gettempdir(), "no-hay-motor.sock"))
+    with pytest.raises(scheduler.Overloaded):
+        engine.cursor().execute("SELECT 1")
+    r = client.get("/api/v1/ruea", params={"limit": 1})
+    assert r.status_code == 503
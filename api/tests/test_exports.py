@@ -0,0 +1,77 @@
+import os
+import time
+
+import duckdb
+import pytest
+
+from app.services import paths
+
+
+def _esperar(client, job: dict) -> dict:
+    t0 = time.monotonic()
+    while job["status"] not in ("done", "error"):
+        assert time.monotonic() - t0 < 30
+        time.sleep(0.05)
+        job = client.get(f"/api/v1/ruea/exports/{job['id']}").json()
+    return job
+
+
+def test_export_fuera_del_archivo(client):
+    r = client.post("/api/v1/ruea/exports", json={"format": "csv", "sexo": "X"})
+    assert r.status_code in (200, 202)
+    job = _esperar(client, r.json())
+    assert job["status"] == "done"
+
+    r = client.get(job["download_url"], headers={"Range": "bytes=0-8"})
+    assert r.status_code == 206
+    assert r.content == b"documento"
+    version = os.path.basename(paths.current_dir())
+    assert f"{job['id']}.csv" in os.listdir(os.path.join(paths.EXPORTS, version))
+    assert not os.path.exists(os.path.join(paths.current_dir(), "exports"))
+
+
+def test_export_identico_se_reutiliza(client):
+    body = {"format": "csv", "sexo": "F", "campos": "documento,sexo"}
+    first = _esperar(client, client.post("/api/v1/ruea/exports", json=body).json())
+    r = client.post("/api/v1/ruea/exports", json=body)
+    assert r.status_code == 200
+    assert r.json()["id"] == first["id"] and r.json()["status"] == "done"
+    lines = client.get(first["download_url"]).text.splitlines()
+    assert lines[0] == "documento,sexo"
+    assert {line.split(",")[1] for line in lines[1:]} == {"F"}
+
+
+def test_export_existente_no_abre_cursor(client, monkeypatch):
+    from app.routers import public
+
+    body = {"format": "csv", "sexo": "M", "campos": "documento"}
+    first = _esperar(client, client.post("/api/v1/ruea/exports", json=body).json())
+    assert first["status"] == "done"
+
+    abiertos = []
+    monkeypatch.setattr(public, "_bulk_con", lambda *a: abiertos.append(a))
+    r = client.post("/api/v1/ruea/exports", json=body)
+    assert r.status_code == 200 and r.json()["id"] == first["id"]
+    assert abiertos == []
+
+
+def test_export_cierra_el_cursor(client, monkeypatch):
+    from app.routers import public
+
+    cursores = []
+    bulk_con = public._bulk_con
+
+    def espia(version=None):
+        cursores.append(bulk_con(version))
+        return cursores[-1]
+
+    monkeypatch.setattr(public, "_bulk_con", espia)
+    job = _esperar(client, client.post("/api/v1/ruea/exports", json={"format": "csv", "vereda": "La Suiza"}).json())
+    assert job["status"] == "done" and len(cursores) == 1
+    with pytest.raises(duckdb.ConnectionException):
+        cursores[0].execute("SELECT 1")
+
+
+def test_export_con_version_inexistente(client):
+    r = client.post("/api/v1/ruea/exports", json={"format": "csv", "version": "no-existe"})
+    assert r.status_code == 404
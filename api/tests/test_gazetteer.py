@@ -0,0 +1,42 @@
+from app.services.duck import Duck
+from app.services.gazetteer import DIM_VIEW, GAZ_TABLE, _gazetteer_rows
+from sintetico import FILAS, VEREDAS, registros
+
+
+def test_ids_en_orden_alfabetico_y_variantes_comparten_id():
+    rows = _gazetteer_rows("vereda", ["Vereda La Suiza", "  la suiza ", "El Corazón", "", "80 - Travesías"])
+    ids = {raw: (i, nombre) for _, raw, i, nombre in rows}
+    assert ids[""] == (0, "")
+    assert ids["El Corazón"] == (1, "el corazon")
+    assert ids["Vereda La Suiza"] == ids["  la suiza "] == (2, "la suiza")
+    assert ids["80 - Travesías"] == (3, "travesias")
+
+
+def test_base_publicada_guarda_los_ids(publicado):
+    cur = Duck.ro().cursor()
+    try:
+        dim = cur.execute(f"SELECT id, nombre FROM {DIM_VIEW} WHERE tipo = 'corregimiento' ORDER BY id").fetchall()
+        assert dim == [(1, "altavista"), (2, "san cristobal"), (3, "santa elena")]
+        crudos = cur.execute(f"SELECT DISTINCT id FROM {GAZ_TABLE} WHERE tipo = 'vereda' AND nombre = 'la suiza'")
+        assert crudos.fetchall() == [(2,)]
+        por_id = cur.execute("""
+            SELECT corregimiento_id, COUNT(*) FROM base_ruea GROUP BY 1 ORDER BY 1
+        """).fetchall()
+        assert por_id == [(1, FILAS // 3), (2, FILAS // 3), (3, FILAS // 3)]
+    finally:
+        cur.close()
+
+
+def test_facetas_normalizadas(client):
+    r = client.get("/api/v1/ruea/facetas")
+    assert r.status_code == 200
+    facetas = r.json()
+    assert facetas["corregimiento"] == ["altavista", "san cristobal", "santa elena"]
+    assert facetas["vereda"] == ["el corazon", "la suiza", "travesias"]
+
+
+def test_filtro_por_escritura_cruda(client):
+    crudo = client.get("/api/v1/ruea", params={"vereda": "Vereda LA SUIZA", "limit": 1}).json()
+    normalizado = client.get("/api/v1/ruea", params={"vereda": "la suiza", "limit": 1}).json()
+    esperado = sum(r["Vereda"] == VEREDAS[1] for r in registros())
+    assert crudo["total"] == normalizado["total"] == esperado
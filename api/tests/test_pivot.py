@@ -0,0 +1,51 @@
+import pandas as pd
+
+from app.services.textnorm import _norm_base, norm_corregimiento_py
+from sintetico import FILAS, registros
+
+
+def _libro() -> pd.DataFrame:
+    df = pd.DataFrame(registros())
+    df["corregimiento"] = df["Corregimiento"].map(norm_corregimiento_py)
+    df["linea_productiva"] = df["Linea Productiva"].map(_norm_base)
+    return df
+
+
+def _pivot(client, **params):
+    r = client.get("/api/v1/ruea/pivot", params=params)
+    assert r.status_code == 200, r.text
+    return r.json()
+
+
+def test_pivot_dos_dimensiones(client):
+    out = _pivot(client, rows="corregimiento", cols="linea_productiva")
+    assert out["dims"] == ["corregimiento", "linea_productiva"]
+
+    esperado = {}
+    for (c, l), g in _libro().groupby(["corregimiento", "linea_productiva"]):
+        esperado[(c, l)] = {
+            "total": len(g), "edad_avg": round(g["Edad"].mean(), 2),
+            "edad_min": g["Edad"].min(), "edad_max": g["Edad"].max(),
+            "estrato": {str(k): int(v) for k, v in g["Estrato"].value_counts().items()},
+        }
+    items = {(i.pop("corregimiento"), i.pop("linea_productiva")): i for i in out["items"]}
+    assert items == esperado
+    assert sum(i["total"] for i in out["items"]) == FILAS
+
+
+def test_pivot_filtrado_top_y_sin_histograma_de_su_dimension(client):
+    out = _pivot(client, rows="estrato", top=2, sexo="F")
+    assert len(out["items"]) == 2
+    assert all("estrato" in i and isinstance(i["estrato"], int) for i in out["items"])
+    totales = [i["total"] for i in out["items"]]
+    assert totales == sorted(totales, reverse=True)
+
+    df = _libro()
+    por_estrato = df[df["Sexo"] == "F"].groupby("Estrato").size()
+    assert all(por_estrato[i["estrato"]] == i["total"] for i in out["items"])
+
+
+def test_pivot_misma_dimension_y_dimension_invalida(client):
+    assert _pivot(client, rows="sexo", cols="sexo")["dims"] == ["sexo"]
+    r = client.get("/api/v1/ruea/pivot", params={"rows": "edad"})
+    assert r.status_code == 422
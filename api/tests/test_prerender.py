@@ -0,0 +1,47 @@
+import gzip
+import os
+
+from app.services import paths, prerender
+from sintetico import FILAS
+
+
+def test_vistas_sin_filtros_salen_del_prerender(client):
+    r = client.get("/api/v1/ruea/summary", headers={"Accept-Encoding": "gzip"})
+    assert r.status_code == 200
+    assert r.headers.get("content-encoding") == "gzip"
+    assert r.json()["total"] == FILAS
+    assert os.path.exists(os.path.join(paths.current_dir(), prerender.DIR, "summary.json"))
+
+
+def test_prerender_es_la_respuesta_dinamica(client):
+    vdir = os.path.join(paths.current_dir(), prerender.DIR)
+    with open(os.path.join(vdir, "stats-sexo.json.gz"), "rb") as f:
+        stored = gzip.decompress(f.read())
+    dinamica = client.get("/api/v1/ruea/stats", params={"by": "sexo", "top": 1000}).json()
+    assert client.get("/api/v1/ruea/stats", params={"by": "sexo"}).content == stored
+    assert sorted(i["value"] for i in dinamica["items"]) == [FILAS // 3] * 3
+
+
+def test_sin_accept_encoding_se_sirve_sin_comprimir(client):
+    r = client.get("/api/v1/ruea/facetas", headers={"Accept-Encoding": "identity"})
+    assert "content-encoding" not in r.headers
+    assert "Accept-Encoding" in r.headers["vary"]
+
+
+def test_q_cero_descarta_la_codificacion(client):
+    vdir = paths.current_dir()
+    assert prerender.find(vdir, "summary", "gzip;q=0") == (os.path.join(vdir, prerender.DIR, "summary.json"), None)
+    r = client.get("/api/v1/ruea/summary", headers={"Accept-Encoding": "br;q=0, gzip;q=0"})
+    assert "content-encoding" not in r.headers
+    assert r.json()["total"] == FILAS
+
+
+def test_se_prefiere_el_mayor_q(tmp_path):
+    out = tmp_path / prerender.DIR
+    out.mkdir()
+    for ext in ("", ".gz", ".br"):
+        (out / f"summary.json{ext}").write_bytes(b"{}")
+    assert prerender.find(str(tmp_path), "summary", "gzip, br")[1] == "br"
+    assert prerender.find(str(tmp_path), "summary", "gzip;q=1.0, br;q=0.5")[1] == "gzip"
+    assert prerender.find(str(tmp_path), "summary", "br;q=0, gzip;q=0.1")[1] == "gzip"
+    assert prerender.find(str(tmp_path), "summary", "GZIP; Q=0")[1] is None
@@ -0,0 +1,68 @@
+import json
+import os
+
+import pytest
+
+from app.core.config import settings
+from app.services import archive, etl, paths
+from sintetico import publicar, registro, registros
+
+
+@pytest.fixture(scope="module")
+def monkeypatch_module():
+    with pytest.MonkeyPatch.context() as m:
+        yield m
+
+
+@pytest.fixture(scope="module")
+def refresh(client, monkeypatch_module):
+    """Publica el libro con una edad fuera de rango y guarda el meta.json que había en staging al hacer el swap."""
+    en_staging = {}
+    swap = etl._atomic_swap
+
+    def spy(stg_dir):
+        with open(os.path.join(stg_dir, "meta.json"), "rb") as f:
+            en_staging["meta"] = f.read()
+        swap(stg_dir)
+
+    monkeypatch_module.setattr(etl, "_atomic_swap", spy)
+    out = publicar([registro(0, Edad=150)] + registros()[1:])
+    monkeypatch_module.setattr(etl, "_atomic_swap", swap)
+    yield out, en_staging["meta"]
+    publicar(registros())
+
+
+def test_meta_json_se_escribe_antes_del_swap(refresh):
+    out, staged = refresh
+    with open(os.path.join(paths.ARCHIVE, out["version"], "meta.json"), "rb") as f:
+        assert f.read() == staged  # la versión publicada no se reescribió
+    profile = json.loads(staged)["profile"]
+    assert {"read", "validate", "duckdb_build", "prerender", "warmup"} <= set(profile["stages"])
+    assert not set(etl.POST_SWAP_STAGES) & set(profile["stages"])
+    assert profile["outputs"]["duckdb.db"] > 0
+    assert "prerender/summary.json" in profile["outputs"]
+    assert profile["validation_errors"]["ruea"] == {"total": 1, "by_column": {"edad": 1}}
+
+
+def test_etapas_posteriores_al_swap_en_el_sidecar(refresh):
+    out, _ = refresh
+    with open(os.path.join(paths.PROFILES, f"{out['version']}.json"), encoding="utf-8") as f:
+        post = json.load(f)
+    assert set(post["stages"]) == set(etl.POST_SWAP_STAGES)
+    assert set(out["profile"]["stages"]) >= set(etl.POST_SWAP_STAGES)
+
+
+def test_admin_lista_el_perfil_completo(client, refresh, monkeypatch):
+    out, _ = refresh
+    monkeypatch.setattr(settings, "ADMIN_TOKEN", "test-token")
+    items = client.get("/api/v1/admin/profiles", headers={"Authorization": "Bearer test-token"}).json()["items"]
+    item = next(i for i in items if i["version"] == out["version"])
+    assert {"validate", "swap", "retention"} <= set(item["profile"]["stages"])
+    assert item["profile"]["total_seconds"] == out["profile"]["total_seconds"]
+
+
+def test_retencion_borra_perfiles_huerfanos(refresh):
+    with open(os.path.join(paths.PROFILES, "2000-01-01T00-00-00Z.json"), "w", encoding="utf-8") as f:
+        f.write("{}")
+    assert archive.gc_profiles() == 1
+    assert set(archive.list_versions()) >= {n[:-5] for n in os.listdir(paths.PROFILES)}
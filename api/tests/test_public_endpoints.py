@@ -0,0 +1,21 @@
+import os
+
+from app.services import archive, paths
+from sintetico import FILAS
+
+
+def test_publicar_mueve_el_puntero_a_la_version_archivada(client):
+    version = archive.current_version()
+    assert version in archive.list_versions()
+    assert os.path.islink(paths.CURRENT)
+    assert os.path.realpath(paths.CURRENT) == os.path.realpath(os.path.join(paths.ARCHIVE, version))
+    assert version not in os.listdir(paths.STAGING)
+    assert client.get("/api/v1/meta").json()["version"] == version
+
+
+def test_listado(client):
+    r = client.get("/api/v1/ruea", params={"limit": 5, "sexo": "F"})
+    assert r.status_code == 200
+    body = r.json()
+    assert body["total"] == FILAS // 3
+    assert len(body["items"]) == 5
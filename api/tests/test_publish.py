@@ -0,0 +1,62 @@
+import os
+
+import pytest
+
+from app.services import etl, paths
+
+
+@pytest.fixture
+def data(tmp_path, monkeypatch):
+    """DATA_DIR propio del test (el swap solo toca `paths`)."""
+    for name, rel in (("DATA", ""), ("CURRENT", "current"), ("STAGING", "staging"),
+                      ("ARCHIVE", "archive"), ("POINTER", "CURRENT_VERSION")):
+        monkeypatch.setattr(paths, name, str(tmp_path / rel))
+    os.makedirs(paths.STAGING)
+    os.makedirs(paths.ARCHIVE)
+    return tmp_path
+
+
+def _staged(version: str) -> str:
+    stg = os.path.join(paths.STAGING, version)
+    os.makedirs(stg)
+    with open(os.path.join(stg, "meta.json"), "w", encoding="utf-8") as f:
+        f.write("{}")
+    return stg
+
+
+def _sin_symlinks(*args, **kwargs):
+    raise OSError("symlinks no permitidos")
+
+
+def test_pointer_file_does_not_collide_with_current():
+    # en FS sin distinción de mayúsculas ambos nombres serían el mismo archivo
+    assert os.path.basename(paths.POINTER).lower() != os.path.basename(paths.CURRENT).lower()
+
+
+def test_swap_without_symlinks_uses_the_pointer_file(data, monkeypatch):
+    monkeypatch.setattr(os, "symlink", _sin_symlinks)
+    etl._atomic_swap(_staged("2026-01-01T00-00-00Z"))
+    assert paths.is_pointer_file(paths.POINTER)
+    assert not os.path.lexists(paths.CURRENT)
+    assert paths.current_dir() == os.path.join(paths.ARCHIVE, "2026-01-01T00-00-00Z")
+
+
+def test_symlink_swap_removes_only_a_pointer_file(data, monkeypatch):
+    with monkeypatch.context() as m:
+        m.setattr(os, "symlink", _sin_symlinks)
+        etl._atomic_swap(_staged("2026-01-01T00-00-00Z"))
+    etl._atomic_swap(_staged("2026-01-02T00-00-00Z"))
+    assert not os.path.lexists(paths.POINTER)
+    assert os.path.islink(paths.CURRENT)
+    assert paths.current_dir() == os.path.realpath(os.path.join(paths.ARCHIVE, "2026-01-02T00-00-00Z"))
+
+    etl._atomic_swap(_staged("2026-01-03T00-00-00Z"))
+    assert os.path.islink(paths.CURRENT)
+    assert paths.current_dir() == os.path.realpath(os.path.join(paths.ARCHIVE, "2026-01-03T00-00-00Z"))
+
+
+def test_current_as_a_file_is_the_old_pointer(data):
+    os.makedirs(os.path.join(paths.ARCHIVE, "2026-01-01T00-00-00Z"))
+    with open(paths.CURRENT, "w", encoding="utf-8") as f:
+        f.write("2026-01-01T00-00-00Z\n")
+    assert paths.current_dir() == os.path.join(paths.ARCHIVE, "2026-01-01T00-00-00Z")
@@ -0,0 +1,50 @@
+import duckdb
+import pytest
+
+from app.routers import public
+from app.services import scheduler
+
+
+def _falla(exc):
+    def fn(*args, **kwargs):
+        raise exc
+    return fn
+
+
+@pytest.mark.parametrize("url, target", [
+    ("/api/v1/ruea/bundle?sexo=F", "predicados_ruea"),
+    ("/api/v1/ruea/pivot?rows=sexo", "pivot"),
+    ("/api/v1/ruea/timeseries", "timeseries"),
+])
+def test_errores_del_scheduler_no_se_vuelven_500(client, monkeypatch, url, target):
+    monkeypatch.setattr(public, target, _falla(scheduler.Overloaded("query_engine", "unavailable")))
+    r = client.get(url)
+    assert r.status_code == 503
+    assert r.headers["retry-after"] == "1"
+
+    monkeypatch.setattr(public, target, _falla(scheduler.Cancelled("query_timeout")))
+    r = client.get(url)
+    assert r.status_code == 504
+    assert r.json()["detail"] == "query_timeout"
+
+
+@pytest.mark.parametrize("url, target, name", [
+    ("/api/v1/ruea/bundle?sexo=F", "predicados_ruea", "bundle"),
+    ("/api/v1/ruea/pivot?rows=sexo", "pivot", "pivot"),
+    ("/api/v1/ruea/timeseries", "timeseries", "timeseries"),
+])
+def test_error_de_duckdb_es_500_sin_detalle(client, monkeypatch, url, target, name):
+    monkeypatch.setattr(public, target, _falla(duckdb.CatalogException("Table with name secreta does not exist")))
+    r = client.get(url)
+    assert r.status_code == 500
+    assert r.json()["detail"] == f"{name}_query_failed"
+
+
+def test_diff_cancelado_es_504_y_sin_documento_es_422(client, versiones, monkeypatch):
+    params = {"from": versiones["base"], "to": versiones["cambiada"]}
+    monkeypatch.setattr(public.diff, "resumen", _falla(scheduler.Cancelled("query_timeout")))
+    assert client.get("/api/v1/ruea/diff", params=params).status_code == 504
+    monkeypatch.setattr(public.diff, "resumen", _falla(ValueError("missing_column: documento")))
+    r = client.get("/api/v1/ruea/diff", params=params)
+    assert r.status_code == 422
+    assert r.json()["detail"] == "missing_column: documento"
@@ -0,0 +1,69 @@
+import random
+
+import duckdb
+
+from app.services import sampling
+from sintetico import FILAS
+
+
+def test_estimate_exact_when_sample_is_the_whole_base():
+    assert sampling.estimate(37, 500, 500) == {"value": 37, "low": 37, "high": 37}
+    assert sampling.bounds_info(500, 500)["exact"] is True
+    assert sampling.bounds_info(500, 500)["missing_below"] == 0
+
+
+def test_estimate_without_sample():
+    assert sampling.estimate(0, 0, 1000) == {"value": 0, "low": 0, "high": 0}
+
+
+def test_estimate_bounds_are_consistent():
+    n, total = 1000, 100_000
+    for k in (0, 1, 10, 250, 500, 999, 1000):
+        e = sampling.estimate(k, n, total)
+        assert e["value"] == round(total * k / n)
+        assert k <= e["low"] <= e["value"] <= e["high"] <= total - (n - k)
+
+
+def test_estimate_interval_covers_the_true_count():
+    # muestras sin reemplazo de una base con `true` aciertos: ~95 % de los intervalos lo contienen
+    rng = random.Random(7)
+    total, n, true = 20_000, 500, 3_000
+    base = [1] * true + [0] * (total - true)
+    trials = 400
+    covered = 0
+    for _ in range(trials):
+        k = sum(rng.sample(base, n))
+        e = sampling.estimate(k, n, total)
+        covered += e["low"] <= true <= e["high"]
+    assert covered / trials >= 0.92
+
+
+def test_build_sample_is_fixed_size_and_repeatable():
+    con = duckdb.connect()
+    con.execute("CREATE TABLE base_ruea AS SELECT range AS i FROM range(10000)")
+    assert sampling.build_sample(con, 200)
+    assert sampling.has_sample(con)
+    assert sampling.sizes(con) == (200, 10000)
+    first = con.execute("SELECT list(i ORDER BY i) FROM smp_ruea").fetchone()[0]
+    sampling.build_sample(con, 200)
+    assert con.execute("SELECT list(i ORDER BY i) FROM smp_ruea").fetchone()[0] == first
+    assert not sampling.build_sample(con, 0)
+    assert not sampling.has_sample(con)
+
+
+def test_stats_aproximadas_con_la_base_entera_son_exactas(client):
+    exacto = client.get("/api/v1/ruea/stats", params={"by": "corregimiento", "sexo": "M"}).json()
+    assert sum(i["value"] for i in exacto["items"]) == FILAS // 3
+
+    approx = client.get("/api/v1/ruea/stats", params={"by": "corregimiento", "sexo": "M", "approx": "true"}).json()
+    # la muestra contiene toda la base: la aproximación es exacta
+    assert approx["_approx"]["exact"] is True
+    assert {i["name"]: i["value"] for i in approx["items"]} == {i["name"]: i["value"] for i in exacto["items"]}
+    assert all(i["low"] == i["value"] == i["high"] for i in approx["items"])
+    assert approx["_approx"]["matched"]["value"] == FILAS // 3
+
+
+def test_facetas_aproximadas_traen_sus_cotas(client):
+    r = client.get("/api/v1/ruea/facetas", params={"approx": "true"}).json()
+    assert r["_approx"]["exact"] is True
+    assert r["corregimiento"] == client.get("/api/v1/ruea/facetas").json()["corregimiento"]
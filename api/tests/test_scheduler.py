@@ -0,0 +1,117 @@
+import asyncio
+import threading
+import time
+
+import duckdb
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.services import scheduler
+
+SLOW_SQL = "SELECT sum(a.range * b.range) FROM range(100000) a, range(100000) b"
+
+
+@pytest.fixture
+def budget(monkeypatch):
+    """Clase `interactive` con 1 hilo, cola de 1 y timeout de 0,5 s."""
+    b = scheduler._Budget("interactive", slots=1, max_queue=1, timeout=0.5)
+    monkeypatch.setitem(scheduler._budgets, "interactive", b)
+    yield b
+    b.executor.shutdown(wait=True, cancel_futures=True)
+
+
+def _until(cond, timeout: float = 5.0):
+    t0 = time.monotonic()
+    while not cond():
+        assert time.monotonic() - t0 < timeout, "condición no alcanzada"
+        time.sleep(0.01)
+
+
+def _app(gate: threading.Event) -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/blocked")
+    @scheduler.offload("interactive")
+    def blocked():
+        gate.wait(10)
+        return {"ok": True}
+
+    @app.get("/slow")
+    @scheduler.offload("interactive")
+    def slow():
+        con = scheduler.track(duckdb.connect().cursor())
+        return {"value": con.execute(SLOW_SQL).fetchone()[0]}
+
+    @app.get("/export")
+    @scheduler.offload("bulk")
+    def export():
+        return {"ok": True}
+
+    return app
+
+
+def test_queue_full_returns_503(budget):
+    budget.timeout = 30
+    gate = threading.Event()
+    client = TestClient(_app(gate))
+    codes = []
+    threads = [threading.Thread(target=lambda: codes.append(client.get("/blocked").status_code)) for _ in range(2)]
+    try:
+        threads[0].start()
+        _until(lambda: budget.running == 1)
+        threads[1].start()
+        _until(lambda: budget.waiting == 1)
+        r = client.get("/blocked")
+        assert r.status_code == 503
+        assert r.json()["detail"] == "interactive_queue_full"
+        assert r.headers["retry-after"] == "1"
+        assert budget.rejected == 1
+    finally:
+        gate.set()
+        for t in threads:
+            if t.is_alive():
+                t.join()
+    assert codes == [200, 200]
+
+
+
+def test_bulk_does_not_queue_behind_interactive(budget):
+    budget.timeout = 30
+    gate = threading.Event()
+    client = TestClient(_app(gate))
+    t = threading.Thread(target=lambda: client.get("/blocked"))
+    try:
+        t.start()
+        _until(lambda: budget.running == 1)
+        r = client.get("/export")
+        assert r.status_code == 200
+        assert budget.waiting == 0
+    finally:
+        gate.set()
+        t.join()
+
+
+def test_timeout_returns_504_and_interrupts_the_query(budget):
+    client = TestClient(_app(threading.Event()))
+    t0 = time.monotonic()
+    r = client.get("/slow")
+    assert r.status_code == 504
+    assert r.json()["detail"] == "query_timeout"
+    assert time.monotonic() - t0 < 5
+    assert budget.timeouts == 1
+    # la consulta interrumpida libera el hilo del executor
+    _until(lambda: budget.running == 0, timeout=3)
+
+
+def test_queue_wait_does_not_count_against_the_timeout(budget):
+    """Una request que espera en cola más que su timeout igual se ejecuta (el plazo corre al empezar)."""
+    async def main():
+        first = asyncio.ensure_future(scheduler.run("interactive", lambda: time.sleep(1.0), timeout=5))
+        await asyncio.sleep(0.05)
+        second = await scheduler.run("interactive", lambda: "ok", timeout=0.3)
+        await first
+        return second
+
+    assert asyncio.run(main()) == "ok"
+    assert budget.timeouts == 0
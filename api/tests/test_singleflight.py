@@ -0,0 +1,108 @@
+import asyncio
+import threading
+import time
+
+import duckdb
+import pytest
+
+from app.services import scheduler
+from app.services.singleflight import SingleFlight
+
+# ~10^10 filas: solo termina si se la interrumpe
+SLOW_SQL = "SELECT sum(a.range * b.range) FROM range(100000) a, range(100000) b"
+
+
+def _flight() -> SingleFlight:
+    return SingleFlight(wait=scheduler.wait, abandoned=scheduler.cancelled)
+
+
+def test_waiters_share_the_leader_result():
+    flight, gate, calls = SingleFlight(), threading.Event(), []
+
+    def fn():
+        calls.append(1)
+        gate.wait()
+        return 42
+
+    out = []
+    threads = [threading.Thread(target=lambda: out.append(flight.do("k", fn))) for _ in range(5)]
+    for t in threads:
+        t.start()
+    while flight.coalesced < 4:
+        time.sleep(0.01)
+    gate.set()
+    for t in threads:
+        t.join()
+    assert out == [42] * 5
+    assert len(calls) == 1
+    assert flight.in_flight() == 0
+
+
+def test_waiters_share_the_leader_error():
+    flight, gate = SingleFlight(), threading.Event()
+
+    def fn():
+        gate.wait()
+        raise ValueError("boom")
+
+    errors = []
+
+    def call():
+        try:
+            flight.do("k", fn)
+        except ValueError as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=call) for _ in range(3)]
+    for t in threads:
+        t.start()
+    while flight.coalesced < 2:
+        time.sleep(0.01)
+    gate.set()
+    for t in threads:
+        t.join()
+    assert len(errors) == 3
+
+
+def test_cancelled_leader_does_not_fail_its_waiters():
+    """El líder vence su timeout (su cursor se interrumpe); quien esperaba reintenta y responde."""
+    flight = _flight()
+    db = duckdb.connect()
+
+    def leader():
+        con = scheduler.track(db.cursor())
+        return flight.do("k", lambda: con.execute(SLOW_SQL).fetchone())
+
+    def waiter():
+        return flight.do("k", lambda: "ok")
+
+    async def main():
+        first = asyncio.ensure_future(scheduler.run("interactive", leader, timeout=0.5))
+        while flight.in_flight() == 0:
+            await asyncio.sleep(0.01)
+        second = asyncio.ensure_future(scheduler.run("interactive", waiter, timeout=10))
+        return await asyncio.gather(first, second, return_exceptions=True)
+
+    t0 = time.monotonic()
+    first, second = asyncio.run(main())
+    assert isinstance(first, scheduler.Cancelled) and first.reason == "query_timeout"
+    assert second == "ok"
+    assert flight.coalesced == 1
+    assert time.monotonic() - t0 < 5
+
+
+def test_waiter_gives_up_at_its_own_deadline():
+    flight, gate = _flight(), threading.Event()
+    leader = threading.Thread(target=lambda: flight.do("k", gate.wait))
+    leader.start()
+    while flight.in_flight() == 0:
+        time.sleep(0.01)
+    try:
+        t0 = time.monotonic()
+        with pytest.raises(scheduler.Cancelled) as exc:
+            asyncio.run(scheduler.run("interactive", lambda: flight.do("k", lambda: "never"), timeout=0.3))
+        assert exc.value.reason == "query_timeout"
+        assert time.monotonic() - t0 < 2
+    finally:
+        gate.set()
+        leader.join()
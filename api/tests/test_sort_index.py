@@ -0,0 +1,65 @@
+import duckdb
+
+from app.services.ruea_query import page_sql
+from app.services.sort_index import POS_COLS, build_sort_positions, pos_col
+from sintetico import FILAS
+
+
+def _tabla():
+    con = duckdb.connect()
+    con.execute("""
+        CREATE TABLE base_ruea AS SELECT * FROM (VALUES
+            ('3', 'b'), ('1', NULL), ('2', 'a'), ('4', '  '), ('5', 'c')
+        ) t(documento, vereda)
+    """)
+    return con
+
+
+def test_posiciones_con_vacios_al_final():
+    con = _tabla()
+    assert build_sort_positions(con) == ["documento", "vereda"]
+    pos = {d: (a, z) for d, a, z in con.execute(
+        "SELECT documento, pos_vereda_asc, pos_vereda_desc FROM base_ruea").fetchall()}
+    assert [d for d, _ in sorted(pos.items(), key=lambda x: x[1][0])][:3] == ["2", "3", "5"]
+    assert [d for d, _ in sorted(pos.items(), key=lambda x: x[1][1])][:3] == ["5", "3", "2"]
+    # nulos y vacíos quedan al final en las dos direcciones
+    assert {pos["1"][0], pos["4"][0]} == {pos["1"][1], pos["4"][1]} == {4, 5}
+    # la tabla queda ordenada físicamente por el orden por defecto
+    assert [r[0] for r in con.execute("SELECT documento FROM base_ruea").fetchall()] == ["1", "2", "3", "4", "5"]
+
+
+def test_pagina_sin_filtros_es_un_rango():
+    cols = ["documento", pos_col("documento", "asc")]
+    sql, binds = page_sql(cols, "SELECT documento FROM t", [], "documento", "asc", 10, 20)
+    assert "pos_documento_asc > ? AND pos_documento_asc <= ?" in sql and binds == [20, 30]
+    sql, binds = page_sql(cols, "SELECT documento FROM t", ["sexo = ?"], "documento", "asc", 10, 20)
+    assert "ORDER BY pos_documento_asc LIMIT ? OFFSET ?" in sql and binds == [10, 20]
+    sql, _ = page_sql(["documento"], "SELECT documento FROM t", [], "documento", "desc", 10, 0)
+    assert "pos_" not in sql and "DESC" in sql
+
+
+def _docs(client, **params):
+    r = client.get("/api/v1/ruea", params={"limit": 1000, **params})
+    assert r.status_code == 200
+    return [i["documento"] for i in r.json()["items"]]
+
+
+def test_listado_usa_las_posiciones(client):
+    items = client.get("/api/v1/ruea", params={"limit": 1}).json()["items"]
+    assert not set(items[0]) & set(POS_COLS)  # las posiciones no se exponen
+
+    # fecha de registro crece con el documento
+    desc = _docs(client, order_by="fecha_registro", order_dir="desc")
+    assert len(desc) == FILAS and desc == sorted(desc, reverse=True)
+
+    paginas = [d for off in range(0, FILAS, 7)
+               for d in _docs(client, order_by="vereda", order_dir="desc", limit=7, offset=off)]
+    assert paginas == _docs(client, order_by="vereda", order_dir="desc")
+
+
+def test_listado_filtrado_ordenado_por_territorio(client):
+    params = {"linea_productiva": "Pecuaria", "order_by": "corregimiento", "order_dir": "desc", "limit": 1000}
+    items = client.get("/api/v1/ruea", params=params).json()
+    nombres = [i["corregimiento"] for i in items["items"]]
+    assert items["total"] == len(nombres) == FILAS // 2
+    assert nombres == sorted(nombres, reverse=True) and len(set(nombres)) == 3
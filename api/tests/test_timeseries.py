@@ -0,0 +1,55 @@
+import pandas as pd
+
+from app.services.duck import Duck
+from app.services.rollups import TS_TABLE
+from app.services.textnorm import norm_corregimiento_py
+from sintetico import FILAS, registros
+
+
+def _libro() -> pd.DataFrame:
+    df = pd.DataFrame(registros())
+    df["corregimiento"] = df["Corregimiento"].map(norm_corregimiento_py)
+    df["month"] = df["Fecha de registro"].dt.to_period("M").dt.start_time
+    df["week"] = df["Fecha de registro"].dt.to_period("W-SUN").dt.start_time  # semanas desde el lunes
+    return df
+
+
+def _serie(g: pd.DataFrame, bucket: str) -> list[dict]:
+    por_periodo = g.groupby(bucket).size()
+    return [{"periodo": p.date().isoformat(), "total": int(n), "acumulado": int(a)}
+            for (p, n), a in zip(por_periodo.items(), por_periodo.cumsum())]
+
+
+def _series(client, **params):
+    r = client.get("/api/v1/ruea/timeseries", params=params)
+    assert r.status_code == 200, r.text
+    return r.json()["series"]
+
+
+def test_serie_total_por_mes_y_semana(client):
+    df = _libro()
+    for bucket in ("month", "week"):
+        (serie,) = _series(client, bucket=bucket)
+        assert serie["name"] == "total" and serie["total"] == FILAS
+        assert serie["points"] == _serie(df, bucket)
+
+
+def test_series_por_corregimiento_y_filtro(client):
+    df = _libro()
+    series = _series(client, por="corregimiento")
+    assert {s["name"]: s["points"] for s in series} == {c: _serie(g, "month") for c, g in df.groupby("corregimiento")}
+
+    (serie,) = _series(client, bucket="week", corregimiento="Santa Elena", linea_productiva="agricola")
+    sel = df[(df["corregimiento"] == "santa elena") & (df["Linea Productiva"] == "Agrícola")]
+    assert serie["total"] == len(sel) > 0
+    assert serie["points"] == _serie(sel, "week")
+
+
+def test_rollup_es_mas_chico_que_la_base(publicado):
+    cur = Duck.ro().cursor()
+    try:
+        filas = cur.execute(f"SELECT COUNT(*) FROM {TS_TABLE} WHERE bucket = 'month'").fetchone()[0]
+        por_mes = cur.execute(f"SELECT SUM(total) FROM {TS_TABLE} WHERE bucket = 'month'").fetchone()[0]
+    finally:
+        cur.close()
+    assert filas < FILAS and por_mes == FILAS
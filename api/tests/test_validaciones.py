@@ -0,0 +1,35 @@
+import pandas as pd
+
+from app.services.validators import validate_df, validate_ruea
+
+
+def _ruea(**over) -> pd.DataFrame:
+    row = {"documento": "10000001", "nombres": "Ana", "apellidos": "Pérez", "sexo": "F", "edad": 34,
+           "estrato": 2, "escolaridad": "primaria", "corregimiento": "altavista", "vereda": "el corazon",
+           "linea_productiva": "agricola", "fecha_registro": "2024-01-15", "telefono": "3000000000",
+           "email": "ana@example.com"}
+    return pd.DataFrame([{**row, **over}])
+
+
+def test_filas_validas_sin_errores():
+    df, errores = validate_ruea(_ruea())
+    assert errores is None
+    assert df["edad"].iloc[0] == 34
+
+
+def test_fuera_de_rango_se_reporta_sin_descartar_la_fila():
+    df, errores = validate_ruea(_ruea(edad=150, estrato=9, sexo="Z"))
+    assert len(df) == 1
+    assert set(errores["column"]) == {"edad", "estrato", "sexo"}
+    assert (errores["schema"] == "ruea").all()
+
+
+def test_numeros_ilegibles_quedan_nulos():
+    df, _ = validate_ruea(_ruea(edad="treinta"))
+    assert pd.isna(df["edad"].iloc[0])
+
+
+def test_otros_modulos_no_se_validan():
+    df = pd.DataFrame({"anio": [2024]})
+    out, errores = validate_df("indicadores", df)
+    assert out is df and errores is None
@@ -0,0 +1,22 @@
+from app.services import archive
+from sintetico import FILAS
+
+
+def test_version_inexistente_es_404(client):
+    assert client.get("/api/v1/ruea", params={"version": "nope"}).status_code == 404
+    assert client.get("/api/v1/meta", params={"version": "../current"}).status_code == 404
+
+
+def test_version_archivada_se_sirve_despues_de_publicar_otra(client, versiones):
+    assert archive.current_version() != versiones["cambiada"]
+    params = {"vereda": "la palma"}
+    assert client.get("/api/v1/ruea", params=params).json()["total"] == 0
+    r = client.get("/api/v1/ruea", params={**params, "version": versiones["cambiada"]})
+    assert r.status_code == 200
+    assert [i["documento"] for i in r.json()["items"]] == ["10000005"]
+    assert client.get("/api/v1/meta", params={"version": versiones["cambiada"]}).json()["version"] == versiones["cambiada"]
+
+
+def test_version_publicada_por_nombre_usa_el_snapshot_actual(client, versiones):
+    r = client.get("/api/v1/ruea", params={"version": archive.current_version(), "limit": 1})
+    assert r.json()["total"] == FILAS
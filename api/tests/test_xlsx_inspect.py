@@ -0,0 +1,87 @@
+import io
+import zipfile
+
+import openpyxl
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.core.config import settings
+from app.routers import admin
+from app.services.xlsx_inspect import inspect_workbook
+from sintetico import FILAS, libro, registros
+
+AUTH = {"Authorization": "Bearer test-token"}
+
+
+def _libro_varias_hojas(path, write_only: bool = False):
+    wb = openpyxl.Workbook(write_only=write_only)
+    if not write_only:
+        wb.remove(wb.active)
+    general = wb.create_sheet("GENERAL")
+    general.append(["Registro único de economía agrícola"])
+    general.append([])
+    general.append(["Documento", "Corregimiento", "Vereda", "Escolaridad"])
+    for i in range(40):
+        general.append([i, "Altavista", "El Corazón", "primaria"])
+    viejo = wb.create_sheet("ruea 2019")
+    viejo.append(["documento", "vereda"])
+    for i in range(5):
+        viejo.append([i, "La Suiza"])
+    indic = wb.create_sheet("Indicadores")
+    indic.append(["anio", "indicador", "cumplimiento"])
+    indic.append([2024, "x", 0.5])
+    wb.save(path)
+
+
+@pytest.mark.parametrize("write_only", [False, True])
+def test_perfil_de_hojas(tmp_path, write_only):
+    path = tmp_path / "libro.xlsx"
+    _libro_varias_hojas(path, write_only)
+    out = inspect_workbook(str(path))
+    hojas = {s["sheet"]: s for s in out["sheets"]}
+    assert list(hojas) == ["GENERAL", "ruea 2019", "Indicadores"]
+
+    general = hojas["GENERAL"]
+    assert general["header_row"] == 3
+    assert general["headers"] == ["Documento", "Corregimiento", "Vereda", "Escolaridad"]
+    assert (general["rows"], general["columns"], general["module"]) == (40, 4, "ruea")
+    assert hojas["Indicadores"]["module"] == "indicadores"
+    # sin dimensión declarada (modo streaming) se cuentan las filas
+    assert general["rows_exact"] is write_only
+
+    # por módulo, la hoja con más filas
+    assert out["sheet_map"] == {"ruea": "GENERAL", "indicadores": "Indicadores"}
+    assert out["header_rows"] == {"ruea": 3, "indicadores": 1}
+
+
+def test_exact_cuenta_las_filas(tmp_path):
+    path = tmp_path / "general.xlsx"
+    path.write_bytes(libro(registros()))
+    declarada = inspect_workbook(str(path))["sheets"][0]
+    exacta = inspect_workbook(str(path), exact=True)["sheets"][0]
+    assert declarada["rows"] == exacta["rows"] == FILAS
+    assert exacta["rows_exact"] and declarada["headers"][:2] == ["Documento", "Nombres"]
+
+
+def test_no_es_xlsx(tmp_path):
+    path = tmp_path / "x.xlsx"
+    path.write_bytes(b"no es un zip")
+    with pytest.raises(zipfile.BadZipFile):
+        inspect_workbook(str(path))
+
+
+def test_endpoint_inspect(monkeypatch):
+    monkeypatch.setattr(settings, "ADMIN_TOKEN", "test-token")
+    app = FastAPI()
+    app.include_router(admin.router)
+    client = TestClient(app)
+
+    archivo = ("libro.xlsx", io.BytesIO(libro(registros(5))))
+    r = client.post("/api/v1/admin/inspect", headers=AUTH, files={"file": archivo})
+    assert r.status_code == 200, r.text
+    assert r.json()["sheet_map"] == {"ruea": "GENERAL"}
+    assert r.json()["sheets"][0]["rows"] == 5
+
+    r = client.post("/api/v1/admin/inspect", headers=AUTH, files={"file": ("x.xlsx", b"roto")})
+    assert r.status_code == 400
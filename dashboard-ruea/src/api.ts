@@ -114,3 +114,53 @@ export async function getRueaStats(
   // reutilizamos http()
   return http<{ items: StatItem[] }>("/ruea/stats", params);
 }
+
+export type RueaSummary = {
+  total: number;
+  top_corregimiento: { name: string; total: number }[];
+  top_vereda: { name: string; total: number }[];
+};
+
+export type RueaBundle = {
+  ruea: RueaRespA;
+  facetas: Facetas;
+  summary: RueaSummary;
+  stats: Record<string, StatItem[]>;
+};
+
+// Listado + facetas + summary + stats en una sola ida (un solo filtrado en backend)
+export async function getRueaBundle(
+  q: RueaQuery,
+  stats?: string // p. ej. "vereda:10,linea_productiva,corregimiento"
+) {
+  return http<RueaBundle>("/ruea/bundle", { ...q, stats });
+}
+
+export type PivotDim = "corregimiento" | "vereda" | "linea_productiva" | "escolaridad" | "sexo" | "estrato";
+
+export type PivotItem = Record<string, any> & {
+  total: number;
+  edad_avg?: number | null;
+  edad_min?: number | null;
+  edad_max?: number | null;
+  estrato?: Record<string, number>;
+};
+
+// Crosstab server-side (1 o 2 dimensiones) → nunca hay que bajar filas crudas
+export async function getRueaPivot(
+  rows: PivotDim,
+  filters: FiltersState,
+  opts?: { cols?: PivotDim; top?: number }
+) {
+  return http<{ dims: string[]; items: PivotItem[] }>("/ruea/pivot", { ...filters, rows, cols: opts?.cols, top: opts?.top });
+}
+
+export type TimeseriesPoint = { periodo: string; total: number; acumulado: number };
+export type TimeseriesSerie = { name: string; total: number; points: TimeseriesPoint[] };
+
+// Registros por mes/semana (fecha_registro), desde el rollup de publicación
+export async function getRueaTimeseries(
+  opts: { bucket?: "month" | "week"; por?: "corregimiento" | "linea_productiva" } & Pick<FiltersState, "corregimiento" | "linea_productiva">
+) {
+  return http<{ bucket: string; por: string | null; series: TimeseriesSerie[] }>("/ruea/timeseries", opts);
+}
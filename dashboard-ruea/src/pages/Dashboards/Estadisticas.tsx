@@ -1,7 +1,7 @@
 // src/pages/Dashboards/Estadisticas.tsx
 import React, { useEffect, useState } from "react";
 import Filters from "../../components/Filters";
-import { getRuea, getRueaStats, type FiltersState, type RueaItem, type StatItem } from "../../api";
+import { getRueaBundle, getRueaPivot, type FiltersState, type PivotDim, type StatItem } from "../../api";
 import {
   BarChart, Bar, XAxis, YAxis, Tooltip, ResponsiveContainer,
   PieChart, Pie, Cell, LineChart, Line, CartesianGrid, Legend
@@ -9,47 +9,12 @@ import {
 
 const COLORS = ["#0057B8","#0bb3b3","#ff7a00","#6e7bf2","#8ac926","#ff595e","#1982c4","#6a4c93","#ffd166"];
 
-// ===== Normalizadores (idénticos a la idea del backend) =====
-const unaccent = (s: string) => s.normalize("NFD").replace(/[\u0300-\u036f]/g, "");
-const collapse = (s: string) => s.toLowerCase().trim().replace(/\s+/g, " ");
-const normCorreg = (s: string) => {
-  s = unaccent(String(s ?? ""));
-  s = s.replace(/^\s*\d+\s*-\s*/, "");
-  s = s.replace(/^\s*corregimiento(\s+de)?\s+/i, "");
-  return collapse(s);
-};
-const normVereda = (s: string) => {
-  s = unaccent(String(s ?? ""));
-  s = s.replace(/^\s*\d+\s*-\s*/, "");
-  s = s.replace(/^\s*veredas?(\s+de)?\s+/i, "");
-  s = s.replace(/^\s*area\s+de\s+expansion\s+/i, "");
-  return collapse(s);
-};
-const normSimple = (s: string) => collapse(unaccent(String(s ?? "")));
-
-function countByNorm(rows: any[], key: string, normFn: (s: string)=>string): StatItem[] {
-  const m = new Map<string, number>();
-  for (const r of rows) {
-    const k = normFn(r?.[key] ?? "");
-    if (!k) continue;
-    m.set(k, (m.get(k) || 0) + 1);
-  }
-  return Array.from(m, ([name, value]) => ({ name, value })).sort((a,b)=>b.value-a.value);
-}
-
-// Paginación segura del endpoint /ruea (respeta limit<=1000)
-async function fetchAllRuea(filters: FiltersState, pageSize = 1000, max = 20000): Promise<RueaItem[]> {
-  const all: RueaItem[] = [];
-  let off = 0;
-  while (off < max) {
-    const res = await getRuea({ ...filters, limit: pageSize, offset: off, order_by: "documento", order_dir: "asc" });
-    // @ts-ignore
-    const chunk: RueaItem[] = (res as any).items ?? [];
-    all.push(...chunk);
-    if (chunk.length < pageSize) break;
-    off += pageSize;
-  }
-  return all;
+// Fallback server-side: /ruea/pivot por una dimensión (sin bajar filas crudas)
+async function pivotStats(by: PivotDim, filters: FiltersState, top?: number): Promise<StatItem[]> {
+  const res = await getRueaPivot(by, filters, { top });
+  return (res.items ?? [])
+    .map((it) => ({ name: String(it[by] ?? ""), value: Number(it.total ?? 0) }))
+    .filter((it) => it.name !== "");
 }
 
 export default function Estadisticas() {
@@ -64,12 +29,14 @@ export default function Estadisticas() {
       try {
         setError("");
 
-        // 1) Intento ligero: stats en backend
-        const [ver, lin, corr] = await Promise.all([
-          getRueaStats("vereda",           filters, 10),
-          getRueaStats("linea_productiva", filters),
-          getRueaStats("corregimiento",    filters),
-        ]);
+        // 1) Intento ligero: stats en backend (una sola ida con /ruea/bundle)
+        const bundle = await getRueaBundle(
+          { ...filters, limit: 0 },
+          "vereda:10,linea_productiva,corregimiento"
+        );
+        const ver  = { items: bundle.stats?.vereda ?? [] };
+        const lin  = { items: bundle.stats?.linea_productiva ?? [] };
+        const corr = { items: bundle.stats?.corregimiento ?? [] };
 
         const haveData =
           (ver.items?.length ?? 0) + (lin.items?.length ?? 0) + (corr.items?.length ?? 0) > 0;
@@ -81,11 +48,15 @@ export default function Estadisticas() {
           return;
         }
 
-        // 2) Fallback: agregamos en el front con normalización
-        const rows = await fetchAllRuea(filters);
-        setTopVeredas(countByNorm(rows, "vereda", normVereda).slice(0, 10));
-        setPorLinea(countByNorm(rows, "linea_productiva", normSimple));
-        setPorCorreg(countByNorm(rows, "corregimiento", normCorreg).sort((a,b)=>a.name.localeCompare(b.name,"es")));
+        // 2) Fallback: agregados de /ruea/pivot (el navegador no cuenta filas)
+        const [pv, pl, pc] = await Promise.all([
+          pivotStats("vereda",           filters, 10),
+          pivotStats("linea_productiva", filters),
+          pivotStats("corregimiento",    filters),
+        ]);
+        setTopVeredas(pv);
+        setPorLinea(pl);
+        setPorCorreg(pc.sort((a,b)=>a.name.localeCompare(b.name,"es")));
       } catch (e:any) {
         setError(e?.message || "Error cargando estadísticas");
         // Último intento: dejar todo vacío para que la UI no reviente
@@ -1,75 +1,45 @@
 # inspeccionar_excel.py
-# Uso: python inspeccionar_excel.py "D:/ruta/MACRO MADRE SDR.xlsx"
+# Uso: python inspeccionar_excel.py "D:/ruta/MACRO MADRE SDR.xlsx" [--exacto]
+#
+# El perfil lo calcula api/src/app/services/xlsx_inspect.py (el mismo de POST /api/v1/admin/inspect):
+# lee cada hoja en streaming, sin openpyxl. Con --exacto cuenta las filas aunque la hoja declare su dimensión.
 
+import json
 import sys
 from pathlib import Path
 
-try:
-    from openpyxl import load_workbook
-except Exception as e:
-    print("Necesitas instalar openpyxl:  pip install openpyxl")
-    sys.exit(1)
+sys.path.insert(0, str(Path(__file__).resolve().parent / "api" / "src"))
+from app.services.xlsx_inspect import inspect_workbook  # noqa: E402
 
-def normalize(v):
-    if v is None:
-        return ""
-    return str(v).strip()
 
-def guess_header_row(ws, max_scan_rows=15):
-    # Busca la primera fila con >= 2 celdas no vacías (posible encabezado)
-    for r in range(1, min(ws.max_row, max_scan_rows) + 1):
-        vals = [normalize(ws.cell(row=r, column=c).value) for c in range(1, ws.max_column + 1)]
-        if sum(v != "" for v in vals) >= 2:
-            return r
-    return 1
-
-def read_headers(ws, header_row):
-    cols = [normalize(ws.cell(row=header_row, column=c).value) for c in range(1, ws.max_column + 1)]
-    # recortar vacíos al final
-    while cols and cols[-1] == "":
-        cols.pop()
-    return cols
-
-def guess_module(sheet_name, headers):
-    s = sheet_name.lower()
-    cols = " ".join(h.lower() for h in headers)
-    if "ruea" in s: return "ruea"
-    if "comer" in s or "comercial" in s: return "comercializacion"
-    if "indic" in s: return "indicadores"
-    if "nodo" in s: return "nodos"
-    if ("anio" in cols and "estrategia" in cols) or "monto" in cols: return "comercializacion"
-    if "cumplimiento" in cols or "indicador" in cols: return "indicadores"
-    if any(k in cols for k in ["corregimiento", "vereda", "linea_productiva", "escolaridad"]): return "ruea"
-    if any(k in cols for k in ["id_nodo", "nombre_nodo", "productor_id"]): return "nodos"
-    return ""
-
-def main(xlsx_path:str):
+def main(xlsx_path: str, exact: bool = False):
     p = Path(xlsx_path)
     if not p.exists():
         print("No se encontró el archivo:", p)
         sys.exit(1)
 
-    wb = load_workbook(p, read_only=True, data_only=True)
+    res = inspect_workbook(str(p), exact=exact)
     print(f"Archivo: {p}")
-    print("Hojas:", [ws.title for ws in wb.worksheets])
+    print("Hojas:", [s["sheet"] for s in res["sheets"]])
     print("-" * 80)
 
     out_lines = ["hoja,fila_encabezado,filas_aprox,num_columnas,modulo_probable,primeras_columnas"]
-    for ws in wb.worksheets:
-        try:
-            header_row = guess_header_row(ws)
-            headers = read_headers(ws, header_row)
-            n_rows_est = max(ws.max_row - header_row, 0)
-            modulo = guess_module(ws.title, headers)
-            primeras = "; ".join(headers[:25])
-            print(f"[{ws.title}] encabezado≈fila {header_row} | filas≈{n_rows_est} | cols={len(headers)} | módulo≈{modulo}")
-            print("  columnas:", primeras)
-            print("-" * 80)
-            # CSV
-            out_lines.append(f"{ws.title},{header_row},{n_rows_est},{len(headers)},{modulo},\"{primeras}\"")
-        except Exception as e:
-            print(f"[{ws.title}] Error leyendo: {e}")
+    for s in res["sheets"]:
+        if "error" in s:
+            print(f"[{s['sheet']}] Error leyendo: {s['error']}")
             print("-" * 80)
+            continue
+        primeras = "; ".join(s["headers"][:25])
+        filas = s["rows"] if s["rows_exact"] else f"≈{s['rows']}"
+        print(f"[{s['sheet']}] encabezado≈fila {s['header_row']} | filas={filas} | cols={s['columns']} | módulo≈{s['module']}")
+        print("  columnas:", primeras)
+        print("-" * 80)
+        # CSV
+        out_lines.append(f"{s['sheet']},{s['header_row']},{s['rows']},{s['columns']},{s['module']},\"{primeras}\"")
+
+    print("sheet_map sugerido:  ", json.dumps(res["sheet_map"], ensure_ascii=False))
+    print("header_rows sugerido:", json.dumps(res["header_rows"]))
+    print(f"({res['seconds']} s)")
 
     # Guardar un CSV resumen al lado del Excel
     csv_path = p.with_name(p.stem + "_resumen_hojas.csv")
@@ -78,7 +48,8 @@ def main(xlsx_path:str):
     print("Resumen guardado en:", csv_path)
 
 if __name__ == "__main__":
-    if len(sys.argv) < 2:
-        print('Uso: python inspeccionar_excel.py "D:/ruta/MACRO MADRE SDR.xlsx"')
+    args = [a for a in sys.argv[1:] if a != "--exacto"]
+    if not args:
+        print('Uso: python inspeccionar_excel.py "D:/ruta/MACRO MADRE SDR.xlsx" [--exacto]')
         sys.exit(1)
-    main(sys.argv[1])
+    main(args[0], exact="--exacto" in sys.argv[1:])